@@ -5,8 +5,15 @@ from ..auth.utils import verify_token
 from ..database import get_db
 import logging
 from ..routes.reviews import require_reviewer_or_admin
-from collections import defaultdict
 from ..socketio_instance import socketio
+from ..pagination import list_page
+from ..response_cache import cache_key, get_cache
+from ..user_loader import load_users
+from ..models.dashboard import get_dashboard_stats as compute_dashboard_stats
+from ..models.message import (
+    CONVERSATION_LIST_PROJECTION, CONVERSATION_PROJECTION, DEFAULT_MESSAGE_PAGE,
+    MAX_MESSAGE_PAGE, get_message_page, get_messages, message_counts_for
+)
 
 admin_bp = Blueprint("admin", __name__)
 
@@ -47,134 +54,15 @@ def admin_required(f):
 @admin_bp.route("/dashboard", methods=["GET"])
 @admin_required
 def get_dashboard_stats(admin_user_id):
-    """Get dashboard statistics"""
+    """Get dashboard statistics (aggregated in Mongo, see models/dashboard.py)"""
     try:
-        db = get_db()
-        users = db["users"]
-        conversations = db["conversations"]
-        notifications = db["notifications"]
-        
-        # Get date ranges
-        today = datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0)
-        week_ago = today - timedelta(days=7)
-        month_ago = today - timedelta(days=30)
-        ninety_days_ago = today - timedelta(days=90)
-        
-        # User statistics
-        total_users = users.count_documents({})
-        new_users_today = users.count_documents({"created_at": {"$gte": today.timestamp()}})
-        new_users_week = users.count_documents({"created_at": {"$gte": week_ago.timestamp()}})
-        new_users_month = users.count_documents({"created_at": {"$gte": month_ago.timestamp()}})
-        new_users_ninety_days = users.count_documents(
-            {"created_at": {"$gte": ninety_days_ago.timestamp()}}
+        # Polled by every open admin tab: served stale-while-revalidate
+        stats, cache_status = get_cache("admin_dashboard").get(
+            cache_key("admin_dashboard", {}), compute_dashboard_stats
         )
-        # Conversation statistics
-        total_conversations = conversations.count_documents({})
-        conversations_today = conversations.count_documents({"created_at": {"$gte": today}})
-        conversations_week = conversations.count_documents({"created_at": {"$gte": week_ago}})
-        conversations_month = conversations.count_documents({"created_at": {"$gte": month_ago}})
-        conversations_ninety_days = conversations.count_documents({"created_at": {"$gte": ninety_days_ago}})
-        # Message statistics
-        total_messages = 0
-        messages_today = 0
-        messages_week = 0
-        messages_month = 0
-        messages_ninety_days = 0
-        
-        # Growth maps for charting
-        conversation_growth_map = defaultdict(int)
-        message_growth_map = defaultdict(int)
-                
-        for conv in conversations.find({}):
-            # Conversation growth (based on created_at)
-            conv_time = conv.get("created_at")
-            if isinstance(conv_time, datetime) and conv_time >= ninety_days_ago:
-                date_key = conv_time.strftime("%Y-%m-%d")
-                conversation_growth_map[date_key] += 1
-                
-            messages = conv.get("messages", [])
-            total_messages += len(messages)
-            
-            for msg in messages:
-                msg_time = msg.get("timestamp", datetime.utcnow())
-                if isinstance(msg_time, str):
-                    continue
-                date_key = msg_time.strftime("%Y-%m-%d")   
-                if msg_time >= today:
-                    messages_today += 1
-                if msg_time >= week_ago:
-                    messages_week += 1
-                if msg_time >= month_ago:
-                    messages_month += 1
-                if msg_time >= ninety_days_ago:
-                    messages_ninety_days += 1
-                    message_growth_map[date_key] += 1
-
-        # Notification statistics
-        total_notifications = notifications.count_documents({})
-        unread_notifications = notifications.count_documents({"read": False})
-        
-        # User growth data for chart (last 90 days)
-        user_growth = []
-        for i in range(90):
-            date = today - timedelta(days=i)
-            count = users.count_documents({"created_at": {"$gte": date.timestamp(), "$lt": (date + timedelta(days=1)).timestamp()}})
-            user_growth.append({
-                "date": date.strftime("%Y-%m-%d"),
-                "count": count
-            })
-        user_growth.reverse()
-        
-        conversation_growth = []
-        for i in range(90):
-            date = today - timedelta(days=i)
-            date_str = date.strftime("%Y-%m-%d")
-            conversation_growth.append(
-                {"date": date_str, "count": conversation_growth_map.get(date_str, 0)}
-            )
-        conversation_growth.reverse()
-        
-        # Message growth for last 90 days
-        message_growth = []
-        for i in range(90):
-            date = today - timedelta(days=i)
-            date_str = date.strftime("%Y-%m-%d")
-            message_growth.append(
-                {"date": date_str, "count": message_growth_map.get(date_str, 0)}
-            )
-        message_growth.reverse()
-        
-        return jsonify({
-            "users": {
-                "total": total_users,
-                "today": new_users_today,
-                "week": new_users_week,
-                "month": new_users_month,
-                "ninety_days": new_users_ninety_days,
-                "growth": user_growth
-            },
-            "conversations": {
-                "total": total_conversations,
-                "today": conversations_today,
-                "week": conversations_week,
-                "month": conversations_month,
-                "ninety_days": conversations_ninety_days,
-                "growth": conversation_growth
-            },
-            "messages": {
-                "total": total_messages,
-                "today": messages_today,
-                "week": messages_week,
-                "month": messages_month,
-                "ninety_days": messages_ninety_days,
-                "growth": message_growth
-            },
-            "notifications": {
-                "total": total_notifications,
-                "unread": unread_notifications
-
-            }
-        })
+        response = jsonify(stats)
+        response.headers["X-Cache"] = cache_status.upper()
+        return response
     except Exception as e:
         logging.error(f"Dashboard stats error: {e}")
         return jsonify({"error": "Failed to fetch dashboard stats"}), 500
@@ -182,10 +70,8 @@ def get_dashboard_stats(admin_user_id):
 @admin_bp.route("/users", methods=["GET"])
 @require_reviewer_or_admin
 def get_users(admin_user_id):
-    """Get all users with pagination"""
+    """Get all users with pagination (?cursor= keyset paging, see pagination.py)"""
     try:
-        page = int(request.args.get("page", 1))
-        limit = int(request.args.get("limit", 20))
         search = request.args.get("search", "")
         
         db = get_db()
@@ -199,12 +85,8 @@ def get_users(admin_user_id):
                 {"name": {"$regex": search, "$options": "i"}}
             ]
         
-        # Get total count
-        total = users.count_documents(query)
-        
         # Get users with pagination
-        skip = (page - 1) * limit
-        user_list = list(users.find(query, {"password": 0}).sort("created_at", -1).skip(skip).limit(limit))
+        user_list, pagination = list_page(users, query, "created_at", request.args, {"password": 0})
         
         # Convert ObjectId to string and format dates
         for user in user_list:
@@ -216,10 +98,10 @@ def get_users(admin_user_id):
         
         return jsonify({
             "users": user_list,
-            "total": total,
-            "page": page,
-            "pages": (total + limit - 1) // limit
+            **pagination
         })
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
     except Exception as e:
         logging.error(f"Get users error: {e}")
         return jsonify({"error": "Failed to fetch users"}), 500
@@ -241,13 +123,12 @@ def get_user_details(admin_user_id, user_id):
         # Get user's conversations
         user_conversations = list(conversations.find(
             {"user_id": ObjectId(user_id)},
-            {"messages": 0}
+            CONVERSATION_LIST_PROJECTION
         ).sort("updated_at", -1))
         
-        # Count messages
-        total_messages = 0
-        for conv in conversations.find({"user_id": ObjectId(user_id)}):
-            total_messages += len(conv.get("messages", []))
+        # Count messages (maintained per conversation, see models/message.py)
+        message_counts = message_counts_for(user_conversations)
+        total_messages = sum(message_counts.values())
         
         # Format data
         user["_id"] = str(user["_id"])
@@ -257,6 +138,8 @@ def get_user_details(admin_user_id, user_id):
             user["updated_at"] = user["updated_at"]
         
         for conv in user_conversations:
+            conv["message_count"] = message_counts.get(conv["_id"], 0)
+            conv.pop("messages_migrated", None)
             conv["_id"] = str(conv["_id"])
             conv["user_id"] = str(conv["user_id"])
             if "created_at" in conv:
@@ -292,15 +175,12 @@ def get_conversations():
         if user_role not in ["admin", "reviewer"]:
             return jsonify({"error": "Admin or reviewer access required"}), 403
         
-        page = int(request.args.get("page", 1))
-        limit = int(request.args.get("limit", 20))
         user_id_filter = request.args.get("user_id")
         date_filter = request.args.get("date")
         search = request.args.get("search", "")
         
         db = get_db()
         conversations = db["conversations"]
-        users = db["users"]
         
         # Build query
         query = {}
@@ -315,28 +195,26 @@ def get_conversations():
         if search:
             query["title"] = {"$regex": search, "$options": "i"}
         
-        # Get total count
-        total = conversations.count_documents(query)
-        
-        # Get conversations with pagination
-        skip = (page - 1) * limit
-        conv_list = list(conversations.find(query).sort("updated_at", -1).skip(skip).limit(limit))
+        # Get conversations with pagination (?cursor= keyset paging, see pagination.py)
+        conv_list, pagination = list_page(conversations, query, "updated_at", request.args, CONVERSATION_LIST_PROJECTION)
+        message_counts = message_counts_for(conv_list)
+        owners = load_users(conv["user_id"] for conv in conv_list)
         
         # Enrich with user data
         for conv in conv_list:
-            user = users.find_one({"_id": conv["user_id"]})
+            user = owners.get(conv["user_id"])
+            message_count = message_counts.get(conv["_id"], 0)
             conv["_id"] = str(conv["_id"])
             conv["user_id"] = str(conv["user_id"])
             
             # Get user info
-            print("USER",user)
             conv["user"] = {
                 # "email": user.get("email", "Unknown") if user else "Unknown",
                 "name": user.get("name", "Unknown") if user else "Unknown",
             }
             
             # Count messages
-            conv["message_count"] = len(conv.get("messages", []))
+            conv["message_count"] = message_count
             
             # Format dates
             if "created_at" in conv:
@@ -344,15 +222,15 @@ def get_conversations():
             if "updated_at" in conv:
                 conv["updated_at"] = conv["updated_at"].isoformat()
             
-            # Remove messages for list view
-            conv.pop("messages", None)
+            # Internal field not needed in the list view
+            conv.pop("messages_migrated", None)
         
         return jsonify({
             "conversations": conv_list,
-            "total": total,
-            "page": page,
-            "pages": (total + limit - 1) // limit
+            **pagination
         })
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
     except Exception as e:
         logging.error(f"Get conversations error: {e}")
         return jsonify({"error": "Failed to fetch conversations"}), 500
@@ -380,9 +258,21 @@ def get_conversation_details(conversation_id):
         users = db["users"]
         
         # Get conversation
-        conv = conversations.find_one({"_id": ObjectId(conversation_id)})
+        conv = conversations.find_one({"_id": ObjectId(conversation_id)}, CONVERSATION_PROJECTION)
         if not conv:
             return jsonify({"error": "Conversation not found"}), 404
+        # ?before=<message id>&limit=N returns one page of older messages
+        before = request.args.get("before")
+        if before or "limit" in request.args:
+            try:
+                limit = min(max(int(request.args.get("limit", DEFAULT_MESSAGE_PAGE)), 1), MAX_MESSAGE_PAGE)
+                conv["messages"], has_more = get_message_page(conv, before, limit)
+            except ValueError as e:
+                return jsonify({"error": str(e)}), 400
+            conv["has_more"] = has_more
+            conv["next_before"] = conv["messages"][0].get("id") if has_more and conv["messages"] else None
+        else:
+            conv["messages"] = get_messages(conv)
         
         # Get user info
         user = users.find_one({"_id": conv["user_id"]}, {"email": 1, "name": 1, "created_at": 1})
@@ -510,14 +400,11 @@ def send_notification(admin_user_id):
 def get_notifications(admin_user_id):
     """Fetch notifications with pagination and optional filters."""
     try:
-        page = int(request.args.get("page", 1))
-        limit = int(request.args.get("limit", 20))
         filter_user_id = request.args.get("user_id", "")
         notif_type = request.args.get("type", "")
 
         db = get_db()
         notifications = db["notifications"]
-        users = db["users"]
 
         query = {}
 
@@ -533,13 +420,15 @@ def get_notifications(admin_user_id):
         if notif_type:
             query["type"] = notif_type
 
-        skip = (page - 1) * limit
-        notif_cursor = (
-            notifications.find(query).sort("created_at", -1).skip(skip).limit(limit)
-        )
-        notif_list = list(notif_cursor)
+        # ?cursor= keyset paging, see pagination.py
+        notif_list, pagination = list_page(notifications, query, "created_at", request.args)
 
-        total = notifications.count_documents(query)
+        # Everyone the page refers to, fetched in one query
+        referenced = load_users(
+            user_id
+            for notif in notif_list
+            for user_id in [notif.get("created_by"), notif.get("user_id")] + notif.get("user_ids", [])
+        )
 
         # Enhance each notification
         for notif in notif_list:
@@ -553,34 +442,30 @@ def get_notifications(admin_user_id):
                 notif["created_at"] = notif["created_at"].isoformat()
 
             # Add creator info
-            creator = users.find_one(
-                {"_id": ObjectId(notif["created_by"])}, {"email": 1, "name": 1}
-            )
+            creator = referenced.get(ObjectId(notif["created_by"])) if ObjectId.is_valid(notif["created_by"]) else None
             notif["creator"] = {
                 "email": creator.get("email", "Unknown") if creator else "Unknown",
                 "name": creator.get("name", "") if creator else "",
             }
             # Add target user(s) info
             if notif["target"] == "user" and notif.get("user_id"):
-                user = users.find_one(
-                    {"_id": ObjectId(notif["user_id"])}, {"name": 1}
-                )
-                notif["user"] = user["name"] if user else "Unknown"
+                user = referenced.get(ObjectId(notif["user_id"]))
+                notif["user"] = user.get("name") if user else "Unknown"
 
             elif notif["target"] == "multiple" and notif.get("user_ids"):
-                user_objs = users.find({"_id": {"$in": [ObjectId(uid) for uid in notif["user_ids"]]}}, {"name": 1})
+                user_objs = [referenced[ObjectId(uid)] for uid in notif["user_ids"] if ObjectId(uid) in referenced]
                 notif["users"] = [u.get("name", "Unknown") for u in user_objs]
 
         print("Notification",notif)
         return jsonify(
             {
                 "notifications": notif_list,
-                "total": total,
-                "page": page,
-                "pages": (total + limit - 1) // limit,
+                **pagination,
             }
         )
 
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
     except Exception as e:
         logging.error(f"Get notifications error: {e}")
         return jsonify({"error": "Failed to fetch notifications"}), 500
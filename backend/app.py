@@ -10,7 +10,11 @@ from .routes.analytics import analytics_bp
 from .routes.prompts import prompts_bp
 import os
 from dotenv import load_dotenv
-from .socketio_instance import socketio
+from .socketio_instance import socketio, start_emit_relay
+from .indexes import ensure_indexes
+from .chat import embeddings
+import logging
+import threading
 
 # after registering all blueprints
 
@@ -19,6 +23,8 @@ load_dotenv()
 app = Flask(__name__)
 # Initialize socketio with app
 socketio.init_app(app)
+# Relays socket events emitted from background threads (see socketio_instance.py)
+start_emit_relay()
 
 # Fixed CORS configuration - no wildcards when using credentials
 CORS(
@@ -46,6 +52,25 @@ app.register_blueprint(analytics_bp, url_prefix=os.getenv("BASE_URL"))
 app.register_blueprint(prompts_bp, url_prefix=os.getenv("BASE_URL"))
 
 
+# Create any missing indexes (idempotent; see indexes.py)
+try:
+    ensure_indexes()
+except Exception as e:
+    logging.error(f"Could not create indexes: {e}")
+
+
+# Build the dense pathway block index if it is missing or stale (no-op without
+# the optional dependencies; see chat/embeddings.py). A real thread, not a
+# greenthread: embedding is CPU-bound and would stall the eventlet hub.
+def _ensure_dense_index():
+    try:
+        embeddings.ensure_index()
+    except Exception as e:
+        logging.error(f"Could not build the dense block index: {e}")
+
+threading.Thread(target=_ensure_dense_index, name="dense-index", daemon=True).start()
+
+
 # Health check route
 @app.route(os.getenv("BASE_URL") + "/health", methods=["GET"])
 def check_health():
@@ -3,6 +3,7 @@ from ..models.user import create_user, get_user_by_email, verify_password, creat
 from ..auth.utils import generate_token
 from ..auth.utils import verify_token
 from ..admin.routes import get_user_role
+from ..user_loader import forget_user
 from ..config import SECRET_KEY
 import jwt
 from jwt import ExpiredSignatureError, InvalidTokenError
@@ -384,6 +385,7 @@ def get_or_update_user_details(user_id):
         db = get_db()
         users_collection = db["users"]
         users_collection.update_one({"_id": ObjectId(user_id)}, {"$set": db_update_fields})
+        forget_user(user_id)
         user = get_user_by_id(user_id)
         user.pop("password", None)
         if "_id" in user:
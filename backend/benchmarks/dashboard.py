@@ -0,0 +1,99 @@
+from ..database import client
+from ..indexes import ensure_indexes
+from ..models.dashboard import get_dashboard_stats
+from ..models.daily_stats import rebuild_daily_stats
+from bson import ObjectId
+from datetime import datetime, timedelta
+import argparse
+import random
+import statistics
+import time
+
+# Times the admin dashboard statistics on generated data of increasing size:
+#
+#     python -m backend.benchmarks.dashboard --sizes 1000,10000,100000
+#
+# Each size is the number of conversations; users, messages and notifications
+# scale with it. Every size is timed twice: aggregating the raw collections,
+# then reading the daily_stats rollup after rebuilding it. The data goes to a
+# separate database (dropped before each size) on the configured MONGO_URI,
+# so point it at a local mongod.
+
+TEXT = "Patient presents with fever and cough for three days. " * 8
+BATCH = 10000
+
+def _random_time(now, days):
+    return now - timedelta(seconds=random.randint(0, days * 86400))
+
+def _insert(collection, docs):
+    for i in range(0, len(docs), BATCH):
+        collection.insert_many(docs[i:i + BATCH], ordered=False)
+
+def seed(db, conversations, messages_per_conversation, days=180):
+    """Fill `db` with `conversations` conversations and proportional other data"""
+    now = datetime.utcnow()
+    users = [
+        {"_id": ObjectId(), "email": f"user{i}@example.com", "name": f"User {i}",
+         "role": "user", "created_at": _random_time(now, days).timestamp()}
+        for i in range(max(conversations // 5, 1))
+    ]
+    _insert(db["users"], users)
+
+    convs, messages = [], []
+    for i in range(conversations):
+        created = _random_time(now, days)
+        conv_id = ObjectId()
+        convs.append({"_id": conv_id, "user_id": random.choice(users)["_id"], "title": f"Chat {i}",
+                      "messages_migrated": True, "created_at": created, "updated_at": created})
+        for j in range(messages_per_conversation):
+            messages.append({"conversation_id": conv_id, "id": str(ObjectId()),
+                             "sender": "user" if j % 2 == 0 else "bot", "text": TEXT,
+                             "timestamp": created + timedelta(seconds=30 * j)})
+        if len(messages) >= BATCH:
+            _insert(db["messages"], messages)
+            messages = []
+    _insert(db["conversations"], convs)
+    if messages:
+        _insert(db["messages"], messages)
+
+    _insert(db["notifications"], [
+        {"title": f"Notice {i}", "target": "all", "read": random.random() < 0.5,
+         "created_at": _random_time(now, days)}
+        for i in range(max(conversations // 50, 1))
+    ])
+    return {"users": len(users), "conversations": conversations,
+            "messages": conversations * messages_per_conversation}
+
+def time_stats(db, runs):
+    """Median and max wall time (ms) of get_dashboard_stats over `runs` runs"""
+    timings = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        get_dashboard_stats(db)
+        timings.append((time.perf_counter() - started) * 1000)
+    return statistics.median(timings), max(timings)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the admin dashboard statistics")
+    parser.add_argument("--sizes", default="1000,10000,50000", help="comma-separated conversation counts")
+    parser.add_argument("--messages-per-conversation", type=int, default=10)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--database", default="Fingertips_dashboard_bench")
+    parser.add_argument("--keep", action="store_true", help="keep the generated database afterwards")
+    args = parser.parse_args()
+
+    random.seed(42)
+    db = client[args.database]
+    print(f"{'conversations':>14} {'messages':>10} {'users':>8} {'source':>12} {'median ms':>10} {'max ms':>8}")
+    for size in [int(s) for s in args.sizes.split(",")]:
+        client.drop_database(args.database)
+        counts = seed(db, size, args.messages_per_conversation)
+        ensure_indexes(db=db)
+        for source in ("aggregation", "daily_stats"):
+            if source == "daily_stats":
+                rebuild_daily_stats(db)
+            get_dashboard_stats(db)  # warm up
+            median, worst = time_stats(db, args.runs)
+            print(f"{size:>14} {counts['messages']:>10} {counts['users']:>8} {source:>12} {median:>10.1f} {worst:>8.1f}")
+    if not args.keep:
+        client.drop_database(args.database)
@@ -0,0 +1,349 @@
+import math
+import os
+import random
+import re
+import threading
+from collections import Counter
+from typing import Dict, List, Optional, Set, Tuple
+
+from .corpus import get_pathway, list_diseases
+from .retrieval import STOPWORDS, tokenize
+
+# ─── Local Disease Classifier ──────────────────────────────────────────────────
+#
+# Fast path in front of the LLM classifier (`classify_query_to_diseases`). Each
+# disease is scored from a keyword lexicon (disease names, synonyms and the
+# hallmark findings used in the LLM prompt examples) plus TF-IDF similarity to a
+# profile built from its pathway and those examples. Scores are mapped to
+# per-disease probabilities with a logistic curve.
+#
+# The decision is confident only when every selected disease is clearly in
+# and the rest are clearly out. "Out" needs positive evidence, not just a
+# missing keyword: the query's findings must be accounted for by the selected
+# diseases' keywords (or explicitly negated, "no fever"), otherwise a finding
+# the lexicon does not know ("breathless on lying down") could belong to a
+# disease that scored nothing. Ambiguous queries go to the LLM. Fallback and
+# agreement rates are tracked so the thresholds below can be tuned against the
+# LLM's own labels; tests/test_classifier.py checks them on the prompt examples.
+
+LOCAL_CLASSIFIER = os.getenv("LOCAL_CLASSIFIER", "true").lower() == "true"
+# Minimum certainty to skip the LLM: p for every selected disease, 1 - p for
+# every other one.
+CLASSIFIER_MIN_CONFIDENCE = float(os.getenv("CLASSIFIER_MIN_CONFIDENCE", "0.85"))
+# Minimum share of the query's findings explained by the selected diseases'
+# keywords (or negated) before the unselected diseases count as absent.
+CLASSIFIER_MIN_COVERAGE = float(os.getenv("CLASSIFIER_MIN_COVERAGE", "0.6"))
+# Fraction of fast-path answers re-checked by the LLM in the background.
+CLASSIFIER_SHADOW_RATE = float(os.getenv("CLASSIFIER_SHADOW_RATE", "0.1"))
+
+# Logistic calibration: one strong keyword (weight 1.0) gives p ~ 0.92,
+# no evidence gives p ~ 0.08.
+CALIBRATION_SLOPE = 5.0
+CALIBRATION_MIDPOINT = 0.5
+TFIDF_WEIGHT = 1.5
+
+KEYWORDS: Dict[str, Dict[str, float]] = {
+    "anaemia": {
+        "anaemia": 1.0, "anemia": 1.0, "anaemic": 1.0, "anemic": 1.0, "pallor": 0.8,
+        "haemoglobin": 0.8, "hemoglobin": 0.8, "hb": 0.6, "iron deficiency": 1.0,
+        "ferritin": 0.8, "iron": 0.6, "blood transfusion": 0.6, "pale": 0.5,
+    },
+    "asthma": {
+        "asthma": 1.0, "asthmatic": 1.0, "wheeze": 0.8, "wheezing": 0.8,
+        "salbutamol": 0.8, "inhaler": 0.6, "bronchospasm": 0.8, "peak flow": 0.7,
+        "nebulisation": 0.5, "nebulization": 0.5,
+    },
+    "copd": {
+        "copd": 1.0, "emphysema": 1.0, "chronic bronchitis": 1.0,
+        "chronic obstructive": 1.0, "smoker": 0.4, "biomass": 0.6, "tiotropium": 0.8,
+        "spirometry": 0.5,
+    },
+    "diabetic_foot_ulcer": {
+        "diabetic foot": 1.0, "foot ulcer": 1.0, "dfu": 1.0, "ulcer": 0.6,
+        "gangrene": 0.8, "offloading": 0.8, "debridement": 0.7, "wound": 0.5,
+        "amputation": 0.6, "neuropathy": 0.4,
+    },
+    "diarrhoea": {
+        "diarrhoea": 1.0, "diarrhea": 1.0, "loose stool": 1.0, "loose motion": 1.0,
+        "watery stool": 1.0, "dysentery": 0.8, "ors": 0.8, "gastroenteritis": 0.9,
+        "vomiting": 0.4, "dehydration": 0.5,
+    },
+    "fever": {
+        "fever": 1.0, "febrile": 1.0, "pyrexia": 1.0, "malaria": 0.9, "dengue": 0.9,
+        "typhoid": 0.9, "enteric fever": 0.9, "leptospirosis": 0.9, "scrub typhus": 0.9,
+        "chikungunya": 0.9, "chills": 0.5, "rigors": 0.6, "sepsis": 0.5,
+    },
+    "heart_failure": {
+        "heart failure": 1.0, "cardiac failure": 1.0, "orthopnea": 1.0, "orthopnoea": 1.0,
+        "pnd": 0.8, "paroxysmal nocturnal": 0.8, "pedal oedema": 0.8, "pedal edema": 0.8,
+        "swelling of both feet": 0.8, "leg swelling": 0.6, "furosemide": 0.7,
+        "ejection fraction": 0.9, "hfref": 1.0, "hfpef": 1.0, "raised jvp": 0.8,
+    },
+    "pneumonia": {
+        "pneumonia": 1.0, "crackles": 0.7, "crepitations": 0.7, "consolidation": 0.8,
+        "productive cough": 0.7, "sputum": 0.5, "lobar": 0.6, "lower respiratory": 0.7,
+    },
+    "stroke": {
+        "stroke": 1.0, "hemiparesis": 1.0, "hemiplegia": 1.0, "one-sided weakness": 1.0,
+        "one sided weakness": 1.0, "facial droop": 1.0, "slurred speech": 0.9,
+        "aphasia": 0.9, "tia": 0.9, "transient ischaemic": 1.0, "transient ischemic": 1.0,
+        "sudden weakness": 0.8,
+    },
+    "chestpain": {
+        "chest pain": 1.0, "chest discomfort": 1.0, "chest tightness": 0.8,
+        "angina": 1.0, "acs": 0.9, "myocardial infarction": 1.0, "heart attack": 1.0,
+        "troponin": 0.8, "stemi": 1.0, "nstemi": 1.0, "ecg": 0.4, "retrosternal": 0.8,
+    },
+}
+
+# The labelled examples from the LLM classifier prompt.
+EXAMPLES = [
+    ("44F with 2 days of frequent loose stools, crampy abdominal pain, intermittent central "
+     "chest discomfort. No fever or vomiting. HR 115, BP 100/70, RR 22, SpO2 96. Need low-cost "
+     "diagnostic approach for chest pain differential and management plan for both.",
+     ["diarrhoea", "chestpain", "heart_failure"]),
+    ("Teen with cough, wheeze, increased work of breathing; O2 sat 91%. No fever.", ["asthma"]),
+    ("Elderly man with swelling of both feet, shortness of breath on exertion, orthopnea. "
+     "BP 130/90, HR 92, O2 sat 97%.", ["heart_failure"]),
+    ("Adult with fever, severe calf ulcer, and diabetes.", ["fever", "diabetic_foot_ulcer"]),
+    ("Male with severe headache, one-sided weakness, sudden onset.", ["stroke"]),
+    ("Adult with diarrhoea and vomiting, HR 110, BP 90/60.", ["diarrhoea"]),
+]
+
+NEGATION_WORDS = frozenset(["no", "not", "without", "denies", "absent"])
+NEGATION = re.compile(r"\b(" + "|".join(NEGATION_WORDS) + r")\s+(?:\w+\s+){0,1}$")
+
+# Words that describe the patient or qualify a finding rather than being a
+# finding themselves; they never need a disease to explain them. Numbers
+# (vitals, ages, durations) are skipped as well.
+CONTEXT_WORDS = frozenset("""
+adult child teen teenager infant elderly old year yr month week day hour man male woman female
+boy girl mother father age aged history known case presenting present presents complaint
+hr bp rr spo2 o2 sat saturation pulse temp temperature vital vitals
+severe mild moderate acute chronic sudden onset frequent intermittent increasing
+worsening recurrent since last past new
+""".split())
+
+_lock = threading.Lock()
+_profiles: Optional[dict] = None
+_metrics = Counter()
+
+
+def _words(text: str) -> List[str]:
+    """Lowercase words with the same light plural strip as retrieval.tokenize."""
+    words = []
+    for word in re.findall(r"[a-z0-9]+", text.lower()):
+        if len(word) > 4 and word.endswith("es") and not word.endswith("ses"):
+            word = word[:-2]
+        elif len(word) > 3 and word.endswith("s") and not word.endswith("ss"):
+            word = word[:-1]
+        words.append(word)
+    return words
+
+
+def _match_keywords(query: str) -> Tuple[Dict[str, float], Dict[str, Set[int]], Set[int]]:
+    """
+    Keyword evidence in `query`: (sum of lexicon weights per disease, word
+    positions matched per disease, word positions of negated mentions).
+    A negated mention ("no fever") adds no weight.
+    """
+    words = _words(query)
+    text = " " + " ".join(words) + " "
+    # Character offset of each word in `text`, to map matches back to words.
+    offsets, pos = [], 1
+    for word in words:
+        offsets.append(pos)
+        pos += len(word) + 1
+
+    scores, matched, negated = {}, {}, set()
+    for disease, terms in KEYWORDS.items():
+        total, positions = 0.0, set()
+        for term, weight in terms.items():
+            needle = " " + " ".join(_words(term)) + " "
+            counted = False
+            start = text.find(needle)
+            while start != -1:
+                first = offsets.index(start + 1)
+                span = range(first, first + len(needle.split()))
+                if NEGATION.search(text[:start + 1]):
+                    negated.update(span)
+                else:
+                    positions.update(span)
+                    if not counted:
+                        total += weight
+                        counted = True
+                start = text.find(needle, start + 1)
+        scores[disease] = total
+        matched[disease] = positions
+    return scores, matched, negated
+
+
+def _keyword_scores(query: str) -> Dict[str, float]:
+    """Sum of lexicon weights per disease, ignoring simply negated mentions ("no fever")."""
+    return _match_keywords(query)[0]
+
+
+def _coverage(query: str, explained: Set[int]) -> float:
+    """Share of the query's finding words whose positions are in `explained`."""
+    findings = [
+        i for i, word in enumerate(_words(query))
+        if word not in STOPWORDS and word not in CONTEXT_WORDS and not word[0].isdigit()
+        and word not in NEGATION_WORDS
+    ]
+    if not findings:
+        return 1.0
+    return sum(1 for i in findings if i in explained) / len(findings)
+
+
+def _build_profiles() -> dict:
+    """TF-IDF profile per disease from its pathway text plus the labelled examples."""
+    docs = {}
+    for disease in list_diseases():
+        entry = get_pathway(disease)
+        docs[disease] = Counter(tokenize(entry["content"]))
+    for text, labels in EXAMPLES:
+        for label in labels:
+            if label in docs:
+                # Examples are short; weight them so they register against a whole pathway.
+                docs[label].update({t: 5 for t in tokenize(text)})
+
+    n = len(docs)
+    df = Counter()
+    for tf in docs.values():
+        df.update(tf.keys())
+    idf = {t: math.log((1 + n) / (1 + f)) + 1 for t, f in df.items()}
+
+    vectors = {}
+    for disease, tf in docs.items():
+        vec = {t: (1 + math.log(c)) * idf[t] for t, c in tf.items()}
+        norm = math.sqrt(sum(v * v for v in vec.values())) or 1.0
+        vectors[disease] = {t: v / norm for t, v in vec.items()}
+    return {"idf": idf, "vectors": vectors}
+
+
+def _get_profiles() -> dict:
+    """Profiles are built once and rebuilt only when a pathway's content changes."""
+    global _profiles
+    signature = tuple(get_pathway(d)["hash"] for d in list_diseases())
+    if _profiles is None or _profiles["signature"] != signature:
+        with _lock:
+            if _profiles is None or _profiles["signature"] != signature:
+                _profiles = dict(_build_profiles(), signature=signature)
+    return _profiles
+
+
+def _tfidf_scores(query: str) -> Dict[str, float]:
+    profiles = _get_profiles()
+    tf = Counter(t for t in tokenize(query) if t in profiles["idf"])
+    if not tf:
+        return {d: 0.0 for d in profiles["vectors"]}
+    vec = {t: (1 + math.log(c)) * profiles["idf"][t] for t, c in tf.items()}
+    norm = math.sqrt(sum(v * v for v in vec.values())) or 1.0
+    return {
+        disease: sum(w / norm * profile.get(t, 0.0) for t, w in vec.items())
+        for disease, profile in profiles["vectors"].items()
+    }
+
+
+def predict(query: str, diseases: List[str]) -> dict:
+    """
+    Score every disease for `query`. Returns {"diseases": [...],
+    "probabilities": {...}, "presence": float, "absence": float,
+    "coverage": float, "confidence": float, "confident": bool}.
+
+    presence is the lowest probability among the selected diseases, absence
+    the lowest 1 - p among the others, and coverage the share of the query's
+    findings explained by the selected diseases' keywords or negated.
+    """
+    keywords, matched, negated = _match_keywords(query)
+    tfidf = _tfidf_scores(query)
+    # Pathways share a lot of vocabulary, so only similarity above the mean counts.
+    mean_tfidf = sum(tfidf.values()) / len(tfidf) if tfidf else 0.0
+
+    probabilities = {}
+    for disease in diseases:
+        score = keywords.get(disease, 0.0) + TFIDF_WEIGHT * max(tfidf.get(disease, 0.0) - mean_tfidf, 0.0)
+        probabilities[disease] = 1 / (1 + math.exp(-CALIBRATION_SLOPE * (score - CALIBRATION_MIDPOINT)))
+
+    selected = sorted(
+        (d for d, p in probabilities.items() if p >= 0.5),
+        key=lambda d: probabilities[d],
+        reverse=True,
+    )
+    presence = min((probabilities[d] for d in selected), default=0.0)
+    absence = min((1 - p for d, p in probabilities.items() if d not in selected), default=1.0)
+    explained = set(negated)
+    for disease in selected:
+        explained |= matched.get(disease, set())
+    coverage = _coverage(query, explained)
+    confidence = min(presence, absence)
+    return {
+        "diseases": selected,
+        "probabilities": probabilities,
+        "presence": presence,
+        "absence": absence,
+        "coverage": coverage,
+        "confidence": confidence,
+        "confident": bool(selected) and confidence >= CLASSIFIER_MIN_CONFIDENCE
+                     and coverage >= CLASSIFIER_MIN_COVERAGE,
+    }
+
+
+# ─── Metrics ───────────────────────────────────────────────────────────────────
+
+def should_shadow() -> bool:
+    return random.random() < CLASSIFIER_SHADOW_RATE
+
+
+def _record_agreement(prefix: str, local: List[str], llm: List[str]) -> None:
+    local_set, llm_set = set(local), set(llm)
+    union = local_set | llm_set
+    _metrics[f"{prefix}_compared"] += 1
+    _metrics[f"{prefix}_exact"] += int(local_set == llm_set)
+    _metrics[f"{prefix}_jaccard"] += (len(local_set & llm_set) / len(union)) if union else 1.0
+
+
+def record_fast_path() -> None:
+    with _lock:
+        _metrics["queries"] += 1
+        _metrics["fast_path"] += 1
+
+
+def record_fallback(local: List[str], llm: List[str]) -> None:
+    with _lock:
+        _metrics["queries"] += 1
+        _metrics["fallback"] += 1
+        _record_agreement("fallback", local, llm)
+
+
+def record_shadow(local: List[str], llm: List[str]) -> None:
+    """Compare a fast-path answer with the LLM's answer for the same query."""
+    with _lock:
+        _record_agreement("shadow", local, llm)
+
+
+def get_metrics() -> dict:
+    """Fallback rate and agreement with the LLM since process start."""
+    with _lock:
+        m = dict(_metrics)
+
+    def rate(num, den):
+        return round(m.get(num, 0) / m[den], 4) if m.get(den) else None
+
+    return {
+        "enabled": LOCAL_CLASSIFIER,
+        "min_confidence": CLASSIFIER_MIN_CONFIDENCE,
+        "min_coverage": CLASSIFIER_MIN_COVERAGE,
+        "shadow_rate": CLASSIFIER_SHADOW_RATE,
+        "queries": m.get("queries", 0),
+        "fast_path": m.get("fast_path", 0),
+        "fallback": m.get("fallback", 0),
+        "fallback_rate": rate("fallback", "queries"),
+        # Fast-path answers re-checked by the LLM: how often they match.
+        "shadow_compared": m.get("shadow_compared", 0),
+        "shadow_agreement": rate("shadow_exact", "shadow_compared"),
+        "shadow_jaccard": rate("shadow_jaccard", "shadow_compared"),
+        # Low-confidence local guesses vs the LLM answer that replaced them.
+        "fallback_agreement": rate("fallback_exact", "fallback_compared"),
+        "fallback_jaccard": rate("fallback_jaccard", "fallback_compared"),
+    }
@@ -0,0 +1,125 @@
+import hashlib
+import logging
+import threading
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+# ─── Pathway Corpus Store ──────────────────────────────────────────────────────
+#
+# Process-wide, in-memory store for the disease pathway markdowns. Files are read
+# once and served from memory afterwards; a file is only re-read when its mtime
+# changes, and the parsed entry is only replaced when the content hash differs.
+
+DEFAULT_FOLDER = "./disease_markdown"
+
+_lock = threading.RLock()
+_stores: Dict[Path, Dict[str, dict]] = {}
+
+
+def resolve_folder(folder: str) -> Path:
+    """Resolve `folder` relative to this script's directory if not absolute."""
+    md_path = Path(folder)
+    if not md_path.is_absolute():
+        md_path = Path(__file__).resolve().parent / folder
+    return md_path
+
+
+def disease_key(filename: str) -> str:
+    """Map a pathway filename (e.g. 'Diarrhoea.md') to its disease key ('diarrhoea')."""
+    return Path(filename).stem.lower()
+
+
+def content_hash(content: str) -> str:
+    return hashlib.sha256(content.encode("utf-8")).hexdigest()
+
+
+def _read_entry(path: Path) -> dict:
+    content = path.read_text(encoding="utf-8")
+    return {
+        "disease": disease_key(path.name),
+        "filename": path.name,
+        "path": path,
+        "content": content,
+        "hash": content_hash(content),
+        "mtime": path.stat().st_mtime_ns,
+    }
+
+
+def load_corpus(folder: str = DEFAULT_FOLDER) -> Dict[str, dict]:
+    """
+    Scan `folder` and (re)load every pathway markdown into the process-wide store.
+    Called once at startup; safe to call again to pick up added or removed files.
+    """
+    md_path = resolve_folder(folder)
+    if not md_path.exists() or not md_path.is_dir():
+        logging.error("Tried to load markdowns from %s (cwd=%s)", md_path, Path.cwd())
+        raise FileNotFoundError(f"Folder not found: {md_path}")
+
+    with _lock:
+        previous = _stores.get(md_path, {})
+        store = {}
+        for p in sorted(md_path.glob("*.md")):
+            key = disease_key(p.name)
+            old = previous.get(key)
+            if old and old["mtime"] == p.stat().st_mtime_ns:
+                store[key] = old
+            else:
+                store[key] = _read_entry(p)
+        _stores[md_path] = store
+        logging.info("Loaded %d pathway markdowns from %s", len(store), md_path)
+        return store
+
+
+def _get_store(folder: str) -> Dict[str, dict]:
+    md_path = resolve_folder(folder)
+    store = _stores.get(md_path)
+    if store is None:
+        store = load_corpus(folder)
+    return store
+
+
+def _refresh_entry(store: Dict[str, dict], key: str) -> Optional[dict]:
+    """Return the entry for `key`, re-reading the file only if its mtime changed."""
+    entry = store.get(key)
+    if entry is None:
+        return None
+    try:
+        mtime = entry["path"].stat().st_mtime_ns
+    except FileNotFoundError:
+        with _lock:
+            store.pop(key, None)
+        logging.warning("Pathway file removed: %s", entry["path"])
+        return None
+    if mtime == entry["mtime"]:
+        return entry
+
+    with _lock:
+        fresh = _read_entry(entry["path"])
+        if fresh["hash"] == entry["hash"]:
+            # Touched but unchanged: keep the parsed entry, remember the new mtime.
+            entry["mtime"] = fresh["mtime"]
+            return entry
+        logging.info("Pathway %s changed on disk; reloaded", entry["filename"])
+        store[key] = fresh
+        return fresh
+
+
+def get_pathway(disease: str, folder: str = DEFAULT_FOLDER) -> Optional[dict]:
+    """Return the corpus entry for a disease key, or None if there is no such pathway."""
+    return _refresh_entry(_get_store(folder), disease.lower())
+
+
+def get_pathways(diseases: List[str], folder: str = DEFAULT_FOLDER) -> List[dict]:
+    """Return the corpus entries for the given disease keys, skipping unknown ones."""
+    store = _get_store(folder)
+    entries = [_refresh_entry(store, d.lower()) for d in diseases]
+    return [e for e in entries if e is not None]
+
+
+def list_diseases(folder: str = DEFAULT_FOLDER) -> List[str]:
+    return sorted(_get_store(folder).keys())
+
+
+def get_markdowns(diseases: List[str], folder: str = DEFAULT_FOLDER) -> List[Tuple[str, str]]:
+    """Same (content, filename) shape as `load_markdowns`, restricted to `diseases`."""
+    return [(e["content"], e["filename"]) for e in get_pathways(diseases, folder)]
@@ -0,0 +1,212 @@
+import logging
+import os
+import sys
+import threading
+from functools import lru_cache
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from .corpus import DEFAULT_FOLDER, get_pathway, list_diseases, resolve_folder
+
+# ─── Dense Block Index ─────────────────────────────────────────────────────────
+#
+# Offline-built embedding index over the #L/#I/#T pathway blocks, used together
+# with BM25 (see retrieval.py) so that paraphrased questions ("breathless on
+# lying down") still reach the right blocks ("orthopnea").
+#
+# The index is a float32 matrix of L2-normalised vectors saved next to the corpus
+# and searched with a single dot product per query. Building it and embedding
+# queries uses a local CPU sentence-transformers model. numpy and
+# sentence-transformers are optional dependencies (backend/requirements-dense.txt);
+# without them retrieval stays lexical-only.
+#
+#     pip install -r backend/requirements-dense.txt
+#     python -m backend.chat.embeddings [folder]    # build or rebuild the index
+#
+# With the dependencies installed, app.py also calls ensure_index() at startup,
+# which builds the index in the background when it is missing or stale (a
+# pathway was edited since it was built). Until then each pathway without a
+# current index is ranked lexically.
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - optional dependency
+    np = None
+
+DENSE_RETRIEVAL = os.getenv("DENSE_RETRIEVAL", "true").lower() == "true"
+EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL", "sentence-transformers/all-MiniLM-L6-v2")
+INDEX_FILENAME = "block_embeddings.npz"
+# Line blocks are embedded together with this many neighbouring lines per side,
+# since a single wrapped #L line is rarely a complete sentence.
+EMBED_CONTEXT_LINES = 1
+
+_lock = threading.Lock()
+_model = None
+_indexes: Dict[Path, Optional[dict]] = {}   # corpus folder -> loaded index (None if unusable)
+_stale_warned = set()
+
+
+def _index_path(folder: str = DEFAULT_FOLDER) -> Path:
+    return resolve_folder(folder) / INDEX_FILENAME
+
+
+def available() -> bool:
+    """True when dense retrieval is enabled and its optional dependencies are installed."""
+    if not DENSE_RETRIEVAL or np is None:
+        return False
+    try:
+        import sentence_transformers  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def _get_model():
+    global _model
+    if _model is None:
+        with _lock:
+            if _model is None:
+                from sentence_transformers import SentenceTransformer
+                _model = SentenceTransformer(EMBEDDING_MODEL, device="cpu")
+    return _model
+
+
+def _block_texts(blocks: List[Dict[str, str]]) -> List[str]:
+    texts = []
+    for i, block in enumerate(blocks):
+        if block["type"] != "L":
+            texts.append(block["text"])
+            continue
+        lo, hi = max(0, i - EMBED_CONTEXT_LINES), min(len(blocks), i + EMBED_CONTEXT_LINES + 1)
+        texts.append(" ".join(b["text"] for b in blocks[lo:hi] if b["type"] == "L"))
+    return texts
+
+
+def build_index(folder: str = DEFAULT_FOLDER, batch_size: int = 64) -> Path:
+    """Embed every block of every pathway and save the normalised matrix next to the corpus."""
+    from .retrieval import parse_blocks
+
+    model = _get_model()
+    vectors, diseases, block_ids, hashes = [], [], [], {}
+    for disease in list_diseases(folder):
+        entry = get_pathway(disease, folder)
+        blocks = parse_blocks(entry["content"])
+        embedded = model.encode(
+            _block_texts(blocks),
+            batch_size=batch_size,
+            normalize_embeddings=True,
+            convert_to_numpy=True,
+        )
+        vectors.append(embedded.astype(np.float32))
+        diseases.extend([disease] * len(blocks))
+        block_ids.extend(b["id"] for b in blocks)
+        hashes[disease] = entry["hash"]
+        logging.info("Embedded %d blocks for %s", len(blocks), disease)
+
+    path = _index_path(folder)
+    np.savez(
+        path,
+        vectors=np.vstack(vectors),
+        diseases=np.array(diseases),
+        block_ids=np.array(block_ids),
+        hash_keys=np.array(list(hashes.keys())),
+        hash_values=np.array(list(hashes.values())),
+        model=np.array(EMBEDDING_MODEL),
+    )
+    logging.info("Saved %d block vectors to %s", sum(len(v) for v in vectors), path)
+    with _lock:
+        _indexes.pop(resolve_folder(folder), None)
+        _query_scores.cache_clear()
+    _stale_warned.clear()
+    return path
+
+
+def ensure_index(folder: str = DEFAULT_FOLDER) -> Optional[Path]:
+    """
+    Build the index of `folder` if it is missing, stale or built with another
+    model. Returns the path when it (re)built the index, None otherwise
+    (current index, or dense retrieval unavailable).
+    """
+    if not available():
+        return None
+    index = load_index(folder)
+    current = {d: get_pathway(d, folder)["hash"] for d in list_diseases(folder)}
+    if index is not None and index["hashes"] == current:
+        return None
+    logging.info("Dense block index for %s is missing or stale; building it", resolve_folder(folder))
+    return build_index(folder)
+
+
+def load_index(folder: str = DEFAULT_FOLDER) -> Optional[dict]:
+    """Load the saved index of `folder` once per process; None if dense retrieval is unavailable."""
+    key = resolve_folder(folder)
+    if key in _indexes:
+        return _indexes[key]
+    with _lock:
+        if key in _indexes:
+            return _indexes[key]
+        _indexes[key] = index = _read_index(key / INDEX_FILENAME)
+        return index
+
+
+def _read_index(path: Path) -> Optional[dict]:
+    if not DENSE_RETRIEVAL or np is None or not path.exists():
+        logging.info("Dense block index %s not available; using lexical retrieval only", path)
+        return None
+    data = np.load(path)
+    if str(data["model"]) != EMBEDDING_MODEL:
+        logging.warning("Dense index %s was built with %s, not %s; ignoring it",
+                        path, data["model"], EMBEDDING_MODEL)
+        return None
+
+    diseases = data["diseases"]
+    ranges = {}
+    for disease in np.unique(diseases):
+        rows = np.flatnonzero(diseases == disease)
+        ranges[str(disease)] = (int(rows[0]), int(rows[-1]) + 1)
+    index = {
+        "vectors": data["vectors"],
+        "block_ids": [str(b) for b in data["block_ids"]],
+        "ranges": ranges,
+        "hashes": dict(zip(map(str, data["hash_keys"]), map(str, data["hash_values"]))),
+    }
+    logging.info("Loaded dense block index %s with %d vectors", path, len(index["block_ids"]))
+    return index
+
+
+@lru_cache(maxsize=256)
+def _query_scores(query: str, folder: Path):
+    """Cosine similarity of `query` against every block indexed for `folder` (one batched dot product)."""
+    index = load_index(folder)
+    vector = _get_model().encode([query], normalize_embeddings=True, convert_to_numpy=True)[0]
+    return index["vectors"] @ vector.astype(np.float32)
+
+
+def dense_scores(query: str, entry: dict) -> Optional[Dict[str, float]]:
+    """
+    Similarity of `query` to each block of the pathway in `entry`, keyed by block ID.
+    Returns None when there is no usable index for this pathway (missing or stale).
+    """
+    folder = entry["path"].parent
+    index = load_index(folder)
+    if index is None:
+        return None
+    disease = entry["disease"]
+    if index["hashes"].get(disease) != entry["hash"]:
+        if disease not in _stale_warned:
+            _stale_warned.add(disease)
+            logging.warning("Dense index is stale for %s; rebuild with "
+                            "`python -m backend.chat.embeddings`", disease)
+        return None
+    start, end = index["ranges"][disease]
+    try:
+        scores = _query_scores(query, folder)[start:end]
+    except Exception:
+        logging.exception("Query embedding failed; falling back to lexical retrieval")
+        return None
+    return dict(zip(index["block_ids"][start:end], scores.tolist()))
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    build_index(sys.argv[1] if len(sys.argv) > 1 else DEFAULT_FOLDER)
@@ -0,0 +1,111 @@
+import hashlib
+import logging
+import os
+import re
+import threading
+from collections import OrderedDict
+from datetime import datetime
+from typing import Dict, Optional
+
+from ..database import get_db
+
+# ─── Extraction Result Cache ───────────────────────────────────────────────────
+#
+# Two-tier cache for `get_relevant_info` results: an in-process LRU in front of
+# a Mongo collection with a TTL index. The key is the normalised query, the
+# disease name, the model and hashes of the markdown and system prompt sent to
+# it, so editing a pathway file, switching PATHWAY_MODEL or changing the
+# extraction prompt changes the key and old entries simply stop being hit (and
+# expire from Mongo after EXTRACTION_CACHE_TTL seconds). Bump
+# EXTRACTION_CACHE_VERSION when the stored result format changes.
+
+EXTRACTION_CACHE = os.getenv("EXTRACTION_CACHE", "true").lower() == "true"
+EXTRACTION_CACHE_SIZE = int(os.getenv("EXTRACTION_CACHE_SIZE", "512"))
+EXTRACTION_CACHE_TTL = int(os.getenv("EXTRACTION_CACHE_TTL", str(7 * 24 * 3600)))
+
+EXTRACTION_CACHE_VERSION = "1"
+COLLECTION = "extraction_cache"
+
+_lock = threading.Lock()
+_lru: "OrderedDict[str, dict]" = OrderedDict()
+_index_ready = False
+
+
+def normalize_query(query: str) -> str:
+    """Case, whitespace and trailing punctuation do not change the extraction."""
+    return re.sub(r"\s+", " ", query.lower()).strip().rstrip("?.! ")
+
+
+def _sha256(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def cache_key(query: str, markdown: str, disease_name: str, model: str, prompt: str) -> str:
+    raw = "\0".join([
+        EXTRACTION_CACHE_VERSION, normalize_query(query), disease_name.lower(),
+        model, _sha256(prompt), _sha256(markdown),
+    ])
+    return _sha256(raw)
+
+
+def _collection():
+    global _index_ready
+    collection = get_db()[COLLECTION]
+    if not _index_ready:
+        collection.create_index("created_at", expireAfterSeconds=EXTRACTION_CACHE_TTL)
+        _index_ready = True
+    return collection
+
+
+def _remember(key: str, result: dict) -> None:
+    with _lock:
+        _lru[key] = result
+        _lru.move_to_end(key)
+        while len(_lru) > EXTRACTION_CACHE_SIZE:
+            _lru.popitem(last=False)
+
+
+def get_cached_extraction(query: str, markdown: str, disease_name: str, model: str, prompt: str) -> Optional[Dict]:
+    """
+    Return the cached result of extracting `query` from `markdown` with `model`
+    and system prompt `prompt`, or None on a miss (or if caching is disabled).
+    """
+    if not EXTRACTION_CACHE:
+        return None
+    key = cache_key(query, markdown, disease_name, model, prompt)
+    with _lock:
+        result = _lru.get(key)
+        if result is not None:
+            _lru.move_to_end(key)
+            return dict(result)
+    try:
+        doc = _collection().find_one({"_id": key}, {"result": 1})
+    except Exception as e:
+        logging.warning(f"Extraction cache lookup failed: {e}")
+        return None
+    if not doc:
+        return None
+    _remember(key, doc["result"])
+    return dict(doc["result"])
+
+
+def set_cached_extraction(query: str, markdown: str, disease_name: str, model: str, prompt: str, result: Dict) -> None:
+    if not EXTRACTION_CACHE:
+        return
+    key = cache_key(query, markdown, disease_name, model, prompt)
+    _remember(key, result)
+    try:
+        _collection().replace_one(
+            {"_id": key},
+            {
+                "_id": key,
+                "disease": disease_name,
+                "query": normalize_query(query),
+                "model": model,
+                "result": result,
+                "created_at": datetime.utcnow(),
+            },
+            upsert=True,
+        )
+    except Exception as e:
+        logging.warning(f"Extraction cache write failed: {e}")
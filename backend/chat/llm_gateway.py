@@ -0,0 +1,256 @@
+import asyncio
+import logging
+import os
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import AsyncIterator, Awaitable, Iterator, List, Optional, TypeVar
+
+from dotenv import load_dotenv
+import httpx
+import openai
+
+from . import rate_limiter, telemetry
+from .rate_limiter import PRIORITY_PIPELINE
+
+# ─── Shared Async LLM Gateway ──────────────────────────────────────────────────
+#
+# One process-wide asyncio loop (on a daemon thread) owns a single AsyncOpenAI
+# client with a pooled HTTP connection set, and a semaphore caps the number of
+# model calls in flight across all requests. Async code awaits `acall_model`;
+# synchronous Flask handlers use `run` / `submit` / `iterate` to hand coroutines
+# to the loop instead of spinning up thread pools per request.
+#
+# Every call is first admitted by the RPM/TPM limiter (rate_limiter.py), then
+# takes a concurrency slot. Calls carry a `stage` tag, and their reported token
+# usage is added to the current request's trace (telemetry.py).
+
+load_dotenv()
+
+API_KEY = os.getenv("OPENAI_API_KEY")
+if not API_KEY:
+    raise RuntimeError("Please set the OPENAI_API_KEY environment variable (in your .env or shell)")
+
+PATHWAY_MODEL = os.getenv("PATHWAY_MODEL", "gpt-4.1-mini-2025-04-14")
+SUMMARIZATION_MODEL = os.getenv("SUMMARIZATION_MODEL", "o4-mini-2025-04-16")
+
+# Maximum model calls in flight across the whole process.
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "32"))
+# Pooled HTTP connections to the API (kept alive between calls).
+LLM_MAX_CONNECTIONS = int(os.getenv("LLM_MAX_CONNECTIONS", "64"))
+# Per-call timeout (seconds); without it a hung connection blocks a chat forever.
+LLM_CALL_TIMEOUT = float(os.getenv("LLM_CALL_TIMEOUT", "60"))
+# Threads for blocking work (Mongo, CPU-bound retrieval) offloaded from the loop.
+LLM_BLOCKING_WORKERS = int(os.getenv("LLM_BLOCKING_WORKERS", "16"))
+
+T = TypeVar("T")
+
+_lock = threading.Lock()
+_loop: Optional[asyncio.AbstractEventLoop] = None
+_client: Optional[openai.AsyncOpenAI] = None
+_semaphore: Optional[asyncio.Semaphore] = None
+
+
+def _start_loop() -> asyncio.AbstractEventLoop:
+    global _loop
+    with _lock:
+        if _loop is not None:
+            return _loop
+        loop = asyncio.new_event_loop()
+        loop.set_default_executor(
+            ThreadPoolExecutor(max_workers=LLM_BLOCKING_WORKERS, thread_name_prefix="llm-blocking")
+        )
+        threading.Thread(target=loop.run_forever, name="llm-gateway", daemon=True).start()
+
+        async def init():
+            global _client, _semaphore
+            _client = openai.AsyncOpenAI(
+                api_key=API_KEY,
+                max_retries=0,  # retries are handled in acall_model
+                timeout=LLM_CALL_TIMEOUT,
+                http_client=openai.DefaultAsyncHttpxClient(
+                    limits=httpx.Limits(
+                        max_connections=LLM_MAX_CONNECTIONS,
+                        max_keepalive_connections=LLM_MAX_CONNECTIONS,
+                    )
+                ),
+            )
+            _semaphore = asyncio.Semaphore(LLM_MAX_CONCURRENCY)
+
+        asyncio.run_coroutine_threadsafe(init(), loop).result()
+        _loop = loop
+        logging.info("LLM gateway started (max %d concurrent calls)", LLM_MAX_CONCURRENCY)
+        return loop
+
+
+def get_loop() -> asyncio.AbstractEventLoop:
+    return _loop or _start_loop()
+
+
+# ─── Bridging from synchronous code ────────────────────────────────────────────
+
+def submit(coro: Awaitable[T]) -> "Future[T]":
+    """Schedule a coroutine on the gateway loop; returns a concurrent.futures.Future."""
+    return asyncio.run_coroutine_threadsafe(coro, get_loop())
+
+
+def run(coro: Awaitable[T], timeout: Optional[float] = None) -> T:
+    """Run a coroutine on the gateway loop and block the calling thread for its result."""
+    future = submit(coro)
+    try:
+        return future.result(timeout)
+    except BaseException:
+        future.cancel()
+        raise
+
+
+def iterate(agen: AsyncIterator[T]) -> Iterator[T]:
+    """Consume an async iterator running on the gateway loop from synchronous code."""
+    sentinel = object()
+
+    async def step():
+        try:
+            return await agen.__anext__()
+        except StopAsyncIteration:
+            return sentinel
+
+    try:
+        while True:
+            item = run(step())
+            if item is sentinel:
+                return
+            yield item
+    finally:
+        submit(agen.aclose())
+
+
+# ─── Model Calls ───────────────────────────────────────────────────────────────
+
+def _call_args(model: str, messages: List[dict], **kwargs) -> dict:
+    call_args = {
+        "model": model,
+        "messages": messages,
+        **kwargs
+    }
+    # Only use temperature if model is not summarization model
+    if model != SUMMARIZATION_MODEL:
+        call_args["temperature"] = kwargs.get("temperature", 0.2)
+    return call_args
+
+
+def _estimate(messages: List[dict], kwargs: dict) -> int:
+    return rate_limiter.estimate_tokens(
+        messages, kwargs.get("max_tokens") or kwargs.get("max_completion_tokens")
+    )
+
+
+async def acall_model(
+    model: str,
+    messages: List[dict],
+    max_retries: int = 3,
+    backoff_factor: float = 2.0,
+    priority: int = PRIORITY_PIPELINE,
+    stage: Optional[str] = None,
+    **kwargs
+) -> str:
+    """
+    Call OpenAI ChatCompletion with a simple retry loop on rate limits.
+    Uses temperature ONLY if not summarization model.
+    `priority` orders the call in the rate limiter queue (see rate_limiter.py);
+    `stage` tags its usage record (see telemetry.py).
+    """
+    get_loop()
+    call_args = _call_args(model, messages, **kwargs)
+    estimated = _estimate(messages, kwargs)
+    for attempt in range(1, max_retries + 1):
+        try:
+            await rate_limiter.acquire(model, estimated, priority)
+            async with _semaphore:
+                started = time.perf_counter()
+                try:
+                    resp = await _client.chat.completions.create(**call_args)
+                except asyncio.CancelledError:
+                    # Already sent, so billed even though no usage comes back
+                    telemetry.record_call(
+                        stage, model, telemetry.cancelled_usage(rate_limiter.estimate_prompt_tokens(messages)),
+                        (time.perf_counter() - started) * 1000, cancelled=True
+                    )
+                    raise
+            usage = telemetry.usage_from_response(resp.usage)
+            telemetry.record_call(stage, model, usage, (time.perf_counter() - started) * 1000)
+            rate_limiter.settle(model, estimated, usage and usage["total_tokens"])
+            return resp.choices[0].message.content
+
+        except openai.RateLimitError:
+            if attempt == max_retries:
+                logging.error("Rate limit reached; no more retries left.")
+                raise
+            wait_time = backoff_factor ** (attempt - 1)
+            logging.warning(
+                f"Rate limited. Retrying in {wait_time:.1f}s "
+                f"(attempt {attempt}/{max_retries})"
+            )
+            # Hold other callers of this model too; the limiter then sees the
+            # pause over by the time this call retries.
+            rate_limiter.pause(model, wait_time)
+            await asyncio.sleep(wait_time)
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            logging.exception("OpenAI API call failed unexpectedly:")
+            raise
+
+
+async def acall_model_stream(
+    model: str,
+    messages: List[dict],
+    max_retries: int = 3,
+    backoff_factor: float = 2.0,
+    priority: int = PRIORITY_PIPELINE,
+    stage: Optional[str] = None,
+    **kwargs
+) -> AsyncIterator[str]:
+    """
+    Stream a ChatCompletion, yielding content deltas as they arrive.
+    Rate limits are retried like `acall_model`, but only before the first delta.
+    """
+    get_loop()
+    call_args = _call_args(model, messages, stream=True, stream_options={"include_usage": True}, **kwargs)
+    estimated = _estimate(messages, kwargs)
+    for attempt in range(1, max_retries + 1):
+        await rate_limiter.acquire(model, estimated, priority)
+        await _semaphore.acquire()
+        started = time.perf_counter()
+        try:
+            stream = await _client.chat.completions.create(**call_args)
+            break
+        except openai.RateLimitError:
+            _semaphore.release()
+            if attempt == max_retries:
+                logging.error("Rate limit reached; no more retries left.")
+                raise
+            wait_time = backoff_factor ** (attempt - 1)
+            logging.warning(
+                f"Rate limited. Retrying in {wait_time:.1f}s "
+                f"(attempt {attempt}/{max_retries})"
+            )
+            # Hold other callers of this model too; the limiter then sees the
+            # pause over by the time this call retries.
+            rate_limiter.pause(model, wait_time)
+            await asyncio.sleep(wait_time)
+        except BaseException:
+            _semaphore.release()
+            raise
+
+    usage = None
+    try:
+        async for chunk in stream:
+            if chunk.usage:
+                # Sent as a final chunk with no choices when include_usage is set.
+                usage = telemetry.usage_from_response(chunk.usage)
+            if chunk.choices and chunk.choices[0].delta.content:
+                yield chunk.choices[0].delta.content
+    finally:
+        _semaphore.release()
+        telemetry.record_call(stage, model, usage, (time.perf_counter() - started) * 1000)
+        rate_limiter.settle(model, estimated, usage and usage["total_tokens"])
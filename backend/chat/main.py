@@ -1,14 +1,21 @@
 import os
 import json
 import logging
+import queue
 import time
-from pathlib import Path
-from typing import List, Dict, Optional, Tuple
-from .utils import call_model
-from concurrent.futures import ThreadPoolExecutor
+import asyncio
+from collections import deque
+from typing import Awaitable, Callable, Deque, Iterator, List, Dict, Optional, Tuple, TypeVar
+from . import llm_gateway
+from .llm_gateway import PATHWAY_MODEL, SUMMARIZATION_MODEL, acall_model, acall_model_stream
+from .rate_limiter import PRIORITY_BACKGROUND, PRIORITY_INTERACTIVE, PRIORITY_PIPELINE
+from .corpus import disease_key, load_corpus, get_markdowns, get_pathways, list_diseases
+from .retrieval import select_relevant_blocks, tokenize
+from . import classifier, telemetry
+from .extraction_cache import get_cached_extraction, set_cached_extraction
+from ..models.analytics import percentile
 
 from dotenv import load_dotenv      
-import openai
 
 # ─── Load .env ────────────────────────────────────────────────────────────────
 load_dotenv()  # now os.getenv will see values from your .env file
@@ -19,32 +26,17 @@ logging.basicConfig(
     format="%(asctime)s %(levelname)s %(message)s"
 )
 
-API_KEY = os.getenv("OPENAI_API_KEY")
-if not API_KEY:
-    raise RuntimeError("Please set the OPENAI_API_KEY environment variable (in your .env or shell)")
-
-client = openai.OpenAI(api_key=API_KEY)
-
-PATHWAY_MODEL = os.getenv("PATHWAY_MODEL", "gpt-4.1-mini-2025-04-14")
-SUMMARIZATION_MODEL = os.getenv("SUMMARIZATION_MODEL", "o4-mini-2025-04-16")
+# Read and parse the pathway corpus once per process; requests are served from memory.
+load_corpus()
 
 # ─── Utility Functions ─────────────────────────────────────────────────────────
 
 def load_markdowns(folder: str) -> List[Tuple[str, str]]:
     """
-    Read all .md files from `folder` and return a list of (content, filename) tuples.
-    The `folder` is interpreted relative to this script’s directory if not absolute.
+    Return all pathway markdowns in `folder` as a list of (content, filename) tuples.
+    Served from the in-memory corpus store; files are only re-read when they change.
     """
-    base_dir = Path(__file__).resolve().parent
-    md_path = Path(folder)
-    if not md_path.is_absolute():
-        md_path = base_dir / folder
-
-    if not md_path.exists() or not md_path.is_dir():
-        # for debugging, show where we looked
-        logging.error("Tried to load markdowns from %s (cwd=%s)", md_path, Path.cwd())
-        raise FileNotFoundError(f"Folder not found: {md_path}")
-    return [(p.read_text(encoding="utf-8"), p.name) for p in md_path.glob("*.md")]
+    return get_markdowns(list_diseases(folder), folder)
 
 def parse_json_response(raw: str) -> Dict[str, Optional[str]]:
     """Safely parse a JSON blob from the model response."""
@@ -61,11 +53,76 @@ def parse_json_response(raw: str) -> Dict[str, Optional[str]]:
         logging.error("Failed to parse JSON from model response: %r", raw)
         return {"answer": None, "context": None, "disease":None,"source": None}
 
+def is_json(raw: str) -> bool:
+    try:
+        json.loads(raw)
+        return True
+    except (TypeError, json.JSONDecodeError):
+        return False
+
+# ─── Deadlines & Hedging ────────────────────────────────────────────────────────
+#
+# Each pre-synthesis stage has a deadline (seconds). When the history check
+# misses it the raw query is used; when LLM classification misses it the local
+# classifier's best guess is used; when extraction misses it the answer is
+# synthesized from the pathways that did finish and marked as partial.
+#
+# An extraction call that is still running after the HEDGE_PERCENTILE latency of
+# recent extraction calls is duplicated, and whichever copy finishes first wins.
+
+HISTORY_DEADLINE = float(os.getenv("HISTORY_DEADLINE", "10"))
+CLASSIFY_DEADLINE = float(os.getenv("CLASSIFY_DEADLINE", "10"))
+EXTRACTION_DEADLINE = float(os.getenv("EXTRACTION_DEADLINE", "25"))
+
+HEDGED_EXTRACTION = os.getenv("HEDGED_EXTRACTION", "true").lower() == "true"
+HEDGE_PERCENTILE = float(os.getenv("HEDGE_PERCENTILE", "95"))
+# Floor for the hedge delay, and the delay used until enough samples exist.
+HEDGE_MIN_DELAY = float(os.getenv("HEDGE_MIN_DELAY", "3"))
+HEDGE_DEFAULT_DELAY = float(os.getenv("HEDGE_DEFAULT_DELAY", "10"))
+HEDGE_MIN_SAMPLES = 20
+# How long a finished turn waits for its shadow classification before storing its usage
+SHADOW_SETTLE_TIMEOUT = float(os.getenv("SHADOW_SETTLE_TIMEOUT", "2"))
+
+T = TypeVar("T")
+
+# Recent extraction call latencies (seconds) for the hedge delay.
+_extraction_latencies: Deque[float] = deque(maxlen=500)
+
+def hedge_delay() -> float:
+    if len(_extraction_latencies) < HEDGE_MIN_SAMPLES:
+        return HEDGE_DEFAULT_DELAY
+    return max(percentile(sorted(_extraction_latencies), HEDGE_PERCENTILE), HEDGE_MIN_DELAY)
+
+async def hedged(make_call: Callable[[], Awaitable[T]], delay: float, label: str) -> T:
+    """
+    Await `make_call()`; if it has not finished after `delay` seconds, start a
+    second copy and return whichever succeeds first (the other is cancelled).
+    """
+    tasks = [asyncio.create_task(make_call())]
+    try:
+        done, _ = await asyncio.wait(tasks, timeout=delay)
+        if not done:
+            logging.info("Hedging %s after %.1fs", label, delay)
+            tasks.append(asyncio.create_task(make_call()))
+        while True:
+            done, pending = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is None:
+                    return task.result()
+            tasks = list(pending)
+            if not tasks:
+                raise next(iter(done)).exception()
+    finally:
+        for task in tasks:
+            task.cancel()
+        # Let the cancelled copies record their (billed) calls before returning
+        if tasks:
+            await asyncio.wait(tasks)
+
 # ─── Get Relevant Part from Pathway ─────────────────────────────────────────────────────────
 
-def get_relevant_info(query: str, markdown: str, disease_name: str) -> Dict[str, Optional[str]]:
+async def aget_relevant_info(query: str, markdown: str, disease_name: str) -> Dict[str, Optional[str]]:
     """Extract answer/context/source from a single disease markdown."""
-
     system_prompt = (
     f"You are a medical assistant designed to extract only clinically relevant, traceable information from a markdown file about a single disease: {disease_name.replace('.md', '')}."
     f"\n\nThe markdown contains only these three block types:"
@@ -98,19 +155,40 @@ def get_relevant_info(query: str, markdown: str, disease_name: str) -> Dict[str,
     f"\n   - Always return valid JSON with exactly these five keys: \"answer\", \"context\", \"disease\", \"source\", and \"source_notes\"."
     )
 
+    cached = await asyncio.to_thread(get_cached_extraction, query, markdown, disease_name, PATHWAY_MODEL, system_prompt)
+    if cached is not None:
+        logging.info("Extraction cache hit for %s", disease_name)
+        return cached
+
     messages = [
         {"role": "system", "content": system_prompt},
         {"role": "user", "content": f"User Query: {query}\n\nDisease Markdown:\n{markdown}"}
     ]
-    raw = call_model(PATHWAY_MODEL, messages)
-    raw = parse_json_response(raw)
+    stage = f"extract:{disease_key(disease_name)}"
 
-    # print("raw",raw)
-    return raw
+    async def call() -> str:
+        started = time.perf_counter()
+        reply = await acall_model(PATHWAY_MODEL, messages, stage=stage)
+        _extraction_latencies.append(time.perf_counter() - started)
+        return reply
+
+    if HEDGED_EXTRACTION:
+        raw = await hedged(call, hedge_delay(), stage)
+    else:
+        raw = await call()
+    result = parse_json_response(raw)
+
+    # Don't cache unparseable replies; they look like "not relevant" results.
+    if is_json(raw):
+        await asyncio.to_thread(set_cached_extraction, query, markdown, disease_name, PATHWAY_MODEL, system_prompt, result)
+    return result
+
+def get_relevant_info(query: str, markdown: str, disease_name: str) -> Dict[str, Optional[str]]:
+    return llm_gateway.run(aget_relevant_info(query, markdown, disease_name))
 
 # ─── Disease Classifier ─────────────────────────────────────────────────────────
 
-def classify_query_to_diseases(query: str, diseases: List[str]) -> List[str]:
+async def aclassify_query_to_diseases(query: str, diseases: List[str], priority: int = PRIORITY_PIPELINE) -> List[str]:
     system_prompt = f"""
 You are a clinical triage assistant for a rural Indian clinic. For each clinical query, decide which diseases from the list below are clinically relevant—either clearly indicated, strongly suggested, or reasonably possible (“borderline”). Ignore diseases that are only weakly possible or would not usually be considered in this scenario.
 
@@ -160,7 +238,7 @@ Relevant diseases: {{ "disease": ["diarrhoea"] }}
         {"role": "system", "content": system_prompt},
         {"role": "user", "content": f"Query: {query}"}
     ]
-    raw = call_model(PATHWAY_MODEL, messages)
+    raw = await acall_model(PATHWAY_MODEL, messages, priority=priority, stage="classify")
     try:
         disease_json = json.loads(raw)
         if isinstance(disease_json, dict) and isinstance(disease_json.get('disease'), list):
@@ -170,8 +248,87 @@ Relevant diseases: {{ "disease": ["diarrhoea"] }}
     except Exception:
         return []
 
+def classify_query_to_diseases(query: str, diseases: List[str]) -> List[str]:
+    return llm_gateway.run(aclassify_query_to_diseases(query, diseases))
+
+# Background LLM re-checks of fast-path classifications (agreement metrics only);
+# referenced here so the tasks are not garbage-collected mid-flight.
+_shadow_tasks = set()
+
+def _no_metrics() -> None:
+    pass
+
+async def _aclassify(query: str, diseases: List[str]) -> Tuple[List[str], Callable[[], None]]:
+    """
+    The classification behind `aclassify_query`. Returns (disease_list, record),
+    where record() records the classifier metrics of this answer (and samples
+    it for a shadow re-check); call it only if the answer is actually used.
+    """
+    with telemetry.span("classify"):
+        if not classifier.LOCAL_CLASSIFIER:
+            return await aclassify_query_to_diseases(query, diseases), _no_metrics
+
+        prediction = classifier.predict(query, diseases)
+        if prediction["confident"]:
+            logging.info("Local classifier: %s (confidence %.2f, coverage %.2f)",
+                         prediction["diseases"], prediction["confidence"], prediction["coverage"])
+
+            def record_fast_path() -> None:
+                classifier.record_fast_path()
+                if classifier.should_shadow():
+                    task = asyncio.create_task(_shadow_classify(query, diseases, prediction["diseases"]))
+                    _shadow_tasks.add(task)
+                    task.add_done_callback(_shadow_tasks.discard)
+                    telemetry.add_pending(task)
+            return prediction["diseases"], record_fast_path
+
+        try:
+            disease_list = await asyncio.wait_for(aclassify_query_to_diseases(query, diseases), CLASSIFY_DEADLINE)
+        except asyncio.TimeoutError:
+            logging.warning("LLM classification missed its %.0fs deadline; using local prediction %s",
+                            CLASSIFY_DEADLINE, prediction["diseases"])
+            return prediction["diseases"], _no_metrics
+        return disease_list, lambda: classifier.record_fallback(prediction["diseases"], disease_list)
+
+async def aclassify_query(query: str, diseases: List[str]) -> List[str]:
+    """
+    Classify with the local fast-path classifier when it is confident, otherwise
+    fall back to the LLM classifier. A sample of fast-path answers is re-checked
+    by the LLM in the background to measure agreement.
+    """
+    disease_list, record = await _aclassify(query, diseases)
+    record()
+    return disease_list
+
+def classify_query(query: str, diseases: List[str]) -> List[str]:
+    return llm_gateway.run(aclassify_query(query, diseases))
+
+async def _shadow_classify(query: str, diseases: List[str], local: List[str]) -> None:
+    try:
+        llm = await aclassify_query_to_diseases(query, diseases, priority=PRIORITY_BACKGROUND)
+        classifier.record_shadow(local, llm)
+    except Exception:
+        logging.exception("Shadow classification failed")
+
+async def _asettle(tasks: List["asyncio.Task"], timeout: float) -> None:
+    _, pending = await asyncio.wait(tasks, timeout=timeout)
+    for task in pending:
+        task.cancel()
+    if pending:
+        await asyncio.wait(pending)
+
+def settle_background_calls(trace: Optional[dict]) -> None:
+    """
+    Wait up to SHADOW_SETTLE_TIMEOUT for the background calls of a turn (shadow
+    classifications) so their usage is in `trace` before the route stores it;
+    stragglers are cancelled, which records them as cancelled calls.
+    """
+    tasks = [task for task in (trace or {}).get("pending", []) if not task.done()]
+    if tasks:
+        llm_gateway.run(_asettle(tasks, SHADOW_SETTLE_TIMEOUT))
+
 # ─── Combined History Check & Query Refinement ─────────────────────────────────
-def get_history_insights(query: str, history: List[Dict[str, str]]) -> Dict[str, Optional[str]]:
+async def aget_history_insights(query: str, history: List[Dict[str, str]]) -> Dict[str, Optional[str]]:
     """
     Returns a JSON with two keys:
     - answer: a direct answer from history if present, else null
@@ -191,65 +348,77 @@ def get_history_insights(query: str, history: List[Dict[str, str]]) -> Dict[str,
         {"role": "user", "content": f"User Query: {query}"}
     ]
 
-    raw = call_model(PATHWAY_MODEL, messages)
-    return parse_json_response(raw)
-
-# ─── Main Function ───────────────────────────────────────────────────
-
-def answer_medical_query(query: str, history: List[Dict[str, str]], markdown_folder: str = "./disease_markdown") -> str:
-    """Load markdowns, extract relevant info, and synthesize a final answer."""
-    if history:
-        insights = get_history_insights(query, history)
-        if insights.get("answer"):
-            return {
-                "answer" : insights['answer']
-            }
-        refined = insights.get("refined_query") or query
-    else:
-        refined = query
-
-    logging.info("Using query: %s", refined)
+    raw = await acall_model(PATHWAY_MODEL, messages, stage="history")
+    try:
+        data = json.loads(raw)
+        return {"answer": data.get("answer"), "refined_query": data.get("refined_query")}
+    except (json.JSONDecodeError, AttributeError):
+        logging.error("Failed to parse JSON from model response: %r", raw)
+        return {"answer": None, "refined_query": None}
 
-    # 2. Classify Dieases
-    diseases = [
-        "anaemia", "asthma", "copd", "diabetic_foot_ulcer", "diarrhoea",
-        "fever", "heart_failure", "pneumonia", "stroke", "chestpain"
-    ]
+def get_history_insights(query: str, history: List[Dict[str, str]]) -> Dict[str, Optional[str]]:
+    return llm_gateway.run(aget_history_insights(query, history))
 
-    disease_list = classify_query_to_diseases(refined, diseases)
+NO_INFORMATION_ANSWER = "I’m sorry, I couldn’t find any information relevant to your question."
 
-    if not disease_list:
-        return {
-            "answer": "I could not identify any relevant diseases from your query. Please provide more clinical details or clarify the symptoms so I can assist you better."
-        }
+# ─── Speculative Classification ──────────────────────────────────────────────────
 
-    # 3. Search markdowns
-    docs = load_markdowns(markdown_folder)
+SPECULATIVE_PIPELINE = os.getenv("SPECULATIVE_PIPELINE", "true").lower() == "true"
+# Keep the speculative classification of the raw query when the refined query
+# shares at least this fraction of its content words (Jaccard similarity).
+SPECULATION_MIN_SIMILARITY = float(os.getenv("SPECULATION_MIN_SIMILARITY", "0.6"))
 
-    relevant_docs = [
-        doc for doc in docs
-        if doc[1].replace('.md', '').lower() in disease_list
-    ]
+DISEASES = [
+    "anaemia", "asthma", "copd", "diabetic_foot_ulcer", "diarrhoea",
+    "fever", "heart_failure", "pneumonia", "stroke", "chestpain"
+]
 
-    logging.info("Loaded %d markdown files.", len(relevant_docs))
-    with ThreadPoolExecutor(max_workers=min(11, len(relevant_docs))) as executor:
-        results = list(executor.map(lambda md: get_relevant_info(refined, md[0],md[1]), relevant_docs))
+def queries_differ(query: str, refined: str) -> bool:
+    """True if the refined query changed the content words of the raw query materially."""
+    original, new = set(tokenize(query)), set(tokenize(refined))
+    if not original and not new:
+        return False
+    return len(original & new) / len(original | new) < SPECULATION_MIN_SIMILARITY
 
-    filtered = [r for r in results if r.get("answer")!=None]
-    if not filtered:
-        return "I’m sorry, I couldn’t find any information relevant to your question."
-
-    combined = "\n\n".join(
-        f"- Disease ({item['disease']})\n  Answer: {item['answer']}\n  Context: {item['context']}"
-        for item in filtered
-    )
-
-    sources = {
-        item["disease"]: item["source"]
-        for item in filtered
-    }
+async def arefine_and_classify(query: str, history: List[Dict[str, str]]) -> Tuple[Optional[str], str, List[str]]:
+    """
+    Run the history check and, speculatively, the classification of the raw query
+    at the same time. Returns (answer_from_history, refined_query, disease_list);
+    disease_list is empty when history already answers the question.
+    """
+    # The speculative branch records no classifier metrics until its answer is used
+    speculative = asyncio.create_task(_aclassify(query, DISEASES)) if SPECULATIVE_PIPELINE else None
 
-    synth_system = f"""
+    try:
+        with telemetry.span("history"):
+            insights = await asyncio.wait_for(aget_history_insights(query, history), HISTORY_DEADLINE)
+    except asyncio.TimeoutError:
+        logging.warning("History check missed its %.0fs deadline; using the raw query", HISTORY_DEADLINE)
+        insights = {"answer": None, "refined_query": None}
+    except BaseException:
+        if speculative:
+            speculative.cancel()
+        raise
+    if insights.get("answer"):
+        if speculative:
+            logging.info("History answered the query; cancelling speculative classification")
+            speculative.cancel()
+        return insights["answer"], query, []
+
+    refined = insights.get("refined_query") or query
+    if speculative is None:
+        return None, refined, await aclassify_query(refined, DISEASES)
+    if queries_differ(query, refined):
+        speculative.cancel()
+        logging.info("Refined query differs from the raw query; re-classifying")
+        return None, refined, await aclassify_query(refined, DISEASES)
+    disease_list, record = await speculative
+    record()
+    return None, refined, disease_list
+
+# ─── Synthesis Prompt ──────────────────────────────────────────────────────────
+
+SYNTHESIS_SYSTEM_PROMPT = """
 You are FingerTips,” a GenAI medical assistant supporting an Indian doctor in a remote clinic 100 km from the nearest hospital. Your knowledge covers only these ten conditions:
 
 - Anaemia  
@@ -302,9 +471,103 @@ When the doctor asks a question, follow these rules:
     When advising referral, always add a basic tip for safe patient monitoring and transport using available means.
 """
 
+# ─── Main Function ───────────────────────────────────────────────────
+
+async def acollect_facts(
+    query: str,
+    history: List[Dict[str, str]],
+    markdown_folder: str = "./disease_markdown",
+    on_stage: Optional[Callable[[str, dict], None]] = None,
+) -> dict:
+    """
+    Run every stage before synthesis: history check, classification and
+    per-disease extraction. Returns {"answer": ...} when the pipeline ends
+    early, otherwise {"messages": synthesis messages, "sources": {...}}.
+    Both carry "partial": True (and the diseases in "missing") when some
+    extractions failed or missed EXTRACTION_DEADLINE.
+    `on_stage(stage, info)` is called as each stage starts and finishes.
+    """
+    def stage(name: str, **info):
+        if on_stage:
+            on_stage(name, info)
+
+    # 1. History check and disease classification, run concurrently
+    stage("classify", status="started")
+    if history:
+        history_answer, refined, disease_list = await arefine_and_classify(query, history)
+        if history_answer:
+            stage("classify", status="done", answered_from_history=True)
+            return {
+                "answer" : history_answer
+            }
+    else:
+        refined = query
+        disease_list = await aclassify_query(refined, DISEASES)
+    stage("classify", status="done", diseases=disease_list)
+
+    logging.info("Using query: %s", refined)
+
+    if not disease_list:
+        return {
+            "answer": "I could not identify any relevant diseases from your query. Please provide more clinical details or clarify the symptoms so I can assist you better."
+        }
+
+    # 2. Search markdowns: only the best-matching #L/#I/#T blocks of each pathway
+    entries = get_pathways(disease_list, markdown_folder)
+    with telemetry.span("retrieve"):
+        blocks = await asyncio.gather(*[
+            asyncio.to_thread(select_relevant_blocks, refined, entry) for entry in entries
+        ])
+    relevant_docs = [(markdown, entry["filename"]) for markdown, entry in zip(blocks, entries)]
+
+    logging.info(
+        "Selected blocks from %d markdown files (%d chars).",
+        len(relevant_docs), sum(len(md[0]) for md in relevant_docs)
+    )
+    stage("extract", status="started", diseases=disease_list)
+    async def extract(markdown: str, filename: str) -> Dict[str, Optional[str]]:
+        with telemetry.span(f"extract:{disease_key(filename)}"):
+            return await aget_relevant_info(refined, markdown, filename)
+
+    # Synthesize with what we have once the deadline passes
+    tasks = {asyncio.create_task(extract(md[0], md[1])): disease_key(md[1]) for md in relevant_docs}
+    results, missing = [], []
+    if tasks:
+        with telemetry.span("extract"):
+            done, pending = await asyncio.wait(tasks, timeout=EXTRACTION_DEADLINE)
+        for task, disease in tasks.items():
+            if task in pending:
+                task.cancel()
+                logging.warning("Extraction for %s missed the %.0fs deadline", disease, EXTRACTION_DEADLINE)
+                missing.append(disease)
+            elif task.exception() is not None:
+                logging.error("Extraction for %s failed: %s", disease, task.exception())
+                missing.append(disease)
+            else:
+                results.append(task.result())
+
+    filtered = [r for r in results if r.get("answer")!=None]
+    stage("extract", status="done", diseases=[r["disease"] for r in filtered], missing=missing)
+    if not filtered:
+        return {
+            "answer": NO_INFORMATION_ANSWER,
+            "partial": bool(missing),
+            "missing": missing
+        }
+
+    combined = "\n\n".join(
+        f"- Disease ({item['disease']})\n  Answer: {item['answer']}\n  Context: {item['context']}"
+        for item in filtered
+    )
+
+    sources = {
+        item["disease"]: item["source"]
+        for item in filtered
+    }
+
     messages = []
 
-    messages.append({"role": "system", "content": synth_system})
+    messages.append({"role": "system", "content": SYNTHESIS_SYSTEM_PROMPT})
 
     # Include past turns
     for turn in history:
@@ -313,15 +576,83 @@ When the doctor asks a question, follow these rules:
             "content": turn["content"]
         })
 
-    messages.append({"role": "user", "content": f"User Query: {query}\n\nCollected facts:\n{combined}"})
+    note = ""
+    if missing:
+        note = (
+            f"\n\nNote: information for {', '.join(missing)} could not be retrieved in time. "
+            "Answer from the facts above and briefly say that this part is incomplete."
+        )
+    messages.append({"role": "user", "content": f"User Query: {query}\n\nCollected facts:\n{combined}{note}"})
+
+    return {
+        "messages": messages,
+        "sources": sources,
+        "partial": bool(missing),
+        "missing": missing
+    }
 
-    final = call_model(SUMMARIZATION_MODEL, messages)
-    final_answer={}
-    final_answer["answer"]=final
-    final_answer["sources"]=sources
-    if isinstance(final_answer, str):
-        data = json.loads(final_answer)
-    else:
-        data = final_answer  
-    # print("data:",data)
-    return data
+def collect_facts(
+    query: str,
+    history: List[Dict[str, str]],
+    markdown_folder: str = "./disease_markdown",
+    on_stage: Optional[Callable[[str, dict], None]] = None,
+) -> dict:
+    return llm_gateway.run(acollect_facts(query, history, markdown_folder, on_stage))
+
+async def aanswer_medical_query(query: str, history: List[Dict[str, str]], markdown_folder: str = "./disease_markdown") -> dict:
+    """Load markdowns, extract relevant info, and synthesize a final answer."""
+    facts = await acollect_facts(query, history, markdown_folder)
+    if "answer" in facts:
+        return facts
+
+    with telemetry.span("synth"):
+        final = await acall_model(SUMMARIZATION_MODEL, facts["messages"], priority=PRIORITY_INTERACTIVE, stage="synth")
+    return {
+        "answer": final,
+        "sources": facts["sources"],
+        "partial": facts["partial"]
+    }
+
+def answer_medical_query(query: str, history: List[Dict[str, str]], markdown_folder: str = "./disease_markdown") -> dict:
+    return llm_gateway.run(aanswer_medical_query(query, history, markdown_folder))
+
+def stream_medical_query(
+    query: str,
+    history: List[Dict[str, str]],
+    markdown_folder: str = "./disease_markdown",
+) -> Iterator[Tuple[str, dict]]:
+    """
+    Streaming variant of `answer_medical_query`. Yields ("stage", info) events
+    while classification and extraction run, ("delta", {"text": ...}) events as
+    the synthesized answer is generated, and finally ("answer", {"answer", "sources"}).
+    """
+    events: "queue.Queue[Tuple[str, dict]]" = queue.Queue()
+    future = llm_gateway.submit(acollect_facts(
+        query, history, markdown_folder,
+        on_stage=lambda name, info: events.put(("stage", dict(info, stage=name))),
+    ))
+    future.add_done_callback(lambda _: events.put(("finished", {})))
+    while True:
+        event = events.get()
+        if event[0] == "finished":
+            break
+        yield event
+
+    facts = future.result()
+    if "answer" in facts:
+        yield ("answer", facts)
+        return
+
+    yield ("stage", {"stage": "synthesize", "status": "started"})
+    parts = []
+    with telemetry.span("synth"):
+        for delta in llm_gateway.iterate(acall_model_stream(
+            SUMMARIZATION_MODEL, facts["messages"], priority=PRIORITY_INTERACTIVE, stage="synth"
+        )):
+            parts.append(delta)
+            yield ("delta", {"text": delta})
+    yield ("answer", {
+        "answer": "".join(parts),
+        "sources": facts["sources"],
+        "partial": facts["partial"]
+    })
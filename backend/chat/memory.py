@@ -0,0 +1,186 @@
+import asyncio
+import logging
+import os
+from concurrent.futures import Future
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+from bson import ObjectId
+from dotenv import load_dotenv
+
+from . import llm_gateway, telemetry
+from .llm_gateway import PATHWAY_MODEL, acall_model
+from .rate_limiter import PRIORITY_BACKGROUND
+from ..database import get_db
+from ..models.analytics import track_llm_usage
+from ..models.message import CONVERSATION_PROJECTION, get_messages, get_messages_after
+
+# ─── Rolling Conversation Memory ───────────────────────────────────────────────
+#
+# Long conversations are not sent to the model verbatim. Once the history is
+# over MEMORY_TOKEN_BUDGET, the pipeline gets a rolling summary of the older
+# turns plus the most recent MEMORY_RECENT_MESSAGES messages as they are.
+#
+# The summary is stored on the conversation document:
+#     memory: {"summary": str, "covered": <messages folded in>,
+#              "last_id": <id of the last of them>, "updated_at"}
+# and is extended in the background after a turn, folding in the messages that
+# have dropped out of the verbatim window since the last update; only those
+# messages are loaded for it. Messages the summary does not cover yet are
+# always sent verbatim, so until the first summary exists (or while an update
+# is catching up) the history may run over the budget rather than lose turns.
+
+load_dotenv()
+
+CONVERSATION_MEMORY = os.getenv("CONVERSATION_MEMORY", "true").lower() == "true"
+MEMORY_TOKEN_BUDGET = int(os.getenv("MEMORY_TOKEN_BUDGET", "3000"))
+MEMORY_RECENT_MESSAGES = int(os.getenv("MEMORY_RECENT_MESSAGES", "6"))
+# Fold messages into the summary in batches rather than on every turn.
+MEMORY_UPDATE_BATCH = int(os.getenv("MEMORY_UPDATE_BATCH", "4"))
+
+MEMORY_PROMPT = """
+You maintain the running memory of a conversation between a doctor in a rural
+Indian clinic and a clinical assistant. Update the existing summary with the new
+messages. Keep every detail that later questions may refer back to: patient age
+and sex, symptoms, findings and vitals, diagnoses considered or excluded,
+drugs and doses advised, referral decisions and open questions. Drop
+pleasantries and repeated advice. Write plain prose in under 250 words.
+"""
+
+_in_flight = set()
+
+
+def estimate_tokens(history: List[Dict[str, str]]) -> int:
+    """Rough token count of a history (1 token ≈ 4 characters)."""
+    return sum(len(turn["content"]) // 4 + 4 for turn in history)
+
+
+def to_history(messages: List[dict]) -> List[Dict[str, str]]:
+    return [
+        {"role": "user" if m["sender"] == "user" else "assistant", "content": m["text"]}
+        for m in messages
+    ]
+
+
+def build_history(conversation: dict, messages: List[dict]) -> List[Dict[str, str]]:
+    """
+    History to send to the pipeline for `conversation` and its `messages`: the
+    full history when it fits MEMORY_TOKEN_BUDGET or no summary has been
+    written yet, otherwise the stored summary followed by every message it
+    does not cover.
+    """
+    history = to_history(messages)
+    if not CONVERSATION_MEMORY or estimate_tokens(history) <= MEMORY_TOKEN_BUDGET:
+        return history
+
+    memory = conversation.get("memory") or {}
+    if not memory.get("summary"):
+        return history
+    covered = min(memory.get("covered", 0), max(len(history) - MEMORY_RECENT_MESSAGES, 0))
+    return [_summary_turn(memory)] + history[covered:]
+
+
+def load_history(conversation: dict) -> List[Dict[str, str]]:
+    """
+    History to send to the pipeline for `conversation`, reading only the
+    messages it will contain: once a summary exists, the messages after the
+    last one it covers (at least the MEMORY_RECENT_MESSAGES most recent).
+    Conversations without a summary, or whose memory predates last_id, are
+    read in full and passed to build_history.
+    """
+    memory = conversation.get("memory") or {}
+    if CONVERSATION_MEMORY and memory.get("summary") and memory.get("last_id"):
+        try:
+            recent = get_messages_after(conversation, memory["last_id"])
+        except ValueError:
+            logging.warning("Memory of conversation %s points at a missing message", conversation.get("_id"))
+        else:
+            if len(recent) < MEMORY_RECENT_MESSAGES:
+                recent = get_messages(conversation, limit=MEMORY_RECENT_MESSAGES)
+            return [_summary_turn(memory)] + to_history(recent)
+    return build_history(conversation, get_messages(conversation))
+
+
+def _summary_turn(memory: dict) -> Dict[str, str]:
+    return {
+        "role": "system",
+        "content": f"Summary of the earlier conversation:\n{memory['summary']}"
+    }
+
+
+async def asummarize_turns(summary: Optional[str], history: List[Dict[str, str]]) -> str:
+    transcript = "\n".join(f"{turn['role']}: {turn['content']}" for turn in history)
+    messages = [
+        {"role": "system", "content": MEMORY_PROMPT},
+        {"role": "user", "content": f"Existing summary:\n{summary or '(none)'}\n\nNew messages:\n{transcript}"}
+    ]
+    return (await acall_model(
+        PATHWAY_MODEL, messages, priority=PRIORITY_BACKGROUND, stage="memory"
+    )).strip()
+
+
+def _load_uncovered(conversation_id) -> Optional[Tuple[dict, List[dict]]]:
+    """The conversation and the messages its memory does not cover yet"""
+    conversation = get_db()["conversations"].find_one(
+        {"_id": ObjectId(conversation_id)}, CONVERSATION_PROJECTION
+    )
+    if not conversation:
+        return None
+    memory = conversation.get("memory") or {}
+    if memory.get("last_id"):
+        try:
+            return conversation, get_messages_after(conversation, memory["last_id"])
+        except ValueError:
+            logging.warning("Memory of conversation %s points at a missing message", conversation_id)
+    # Memory written before last_id was stored: skip the covered messages
+    return conversation, get_messages(conversation)[memory.get("covered", 0):]
+
+
+def _save_memory(conversation_id, previous_covered: int, summary: str, covered: int, last_id: str, calls: List[dict]) -> None:
+    # Only apply on top of the memory this update was computed from.
+    get_db()["conversations"].update_one(
+        {"_id": ObjectId(conversation_id), "memory.covered": previous_covered or {"$in": [None, 0]}},
+        {"$set": {"memory": {
+            "summary": summary, "covered": covered, "last_id": last_id, "updated_at": datetime.utcnow()
+        }}}
+    )
+    try:
+        track_llm_usage(conversation_id, None, calls)
+    except Exception as e:
+        print(f"Analytics tracking error: {e}")
+
+
+async def _update_memory(conversation_id) -> None:
+    trace = telemetry.start_trace()
+    try:
+        loaded = await asyncio.to_thread(_load_uncovered, conversation_id)
+        if not loaded:
+            return
+        conversation, uncovered = loaded
+        memory = conversation.get("memory") or {}
+        history = to_history(uncovered)
+        # Without a summary the uncovered messages are the whole conversation
+        if not memory.get("summary") and estimate_tokens(history) <= MEMORY_TOKEN_BUDGET:
+            return
+        fold = len(history) - MEMORY_RECENT_MESSAGES
+        if fold < MEMORY_UPDATE_BATCH:
+            return
+        covered = memory.get("covered", 0)
+        target = covered + fold
+        summary = await asummarize_turns(memory.get("summary"), history[:fold])
+        await asyncio.to_thread(
+            _save_memory, conversation_id, covered, summary, target, uncovered[fold - 1].get("id"), trace["calls"]
+        )
+        logging.info("Conversation %s memory now covers %d messages", conversation_id, target)
+    except Exception:
+        logging.exception("Memory update failed for conversation %s", conversation_id)
+    finally:
+        _in_flight.discard(str(conversation_id))
+
+
+def schedule_memory_update(conversation_id) -> Optional["Future[None]"]:
+    """Extend the conversation's rolling summary in the background, if it is due."""
+    if not CONVERSATION_MEMORY or str(conversation_id) in _in_flight:
+        return None
+    _in_flight.add(str(conversation_id))
+    return llm_gateway.submit(_update_memory(conversation_id))
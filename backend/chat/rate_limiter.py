@@ -0,0 +1,265 @@
+import asyncio
+import contextvars
+import heapq
+import itertools
+import logging
+import os
+import time
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+
+from dotenv import load_dotenv
+
+# ─── OpenAI Rate Limiter ───────────────────────────────────────────────────────
+#
+# Token buckets for requests-per-minute and tokens-per-minute per model, checked
+# *before* a call is sent so that bursts queue up here instead of turning into
+# a wave of 429s and retries. Waiting calls are served in priority order
+# (interactive synthesis first, background titles/summaries last) and, within a
+# priority, round-robin across users so one busy user cannot starve the rest.
+#
+# Limits are per process by default. With LLM_RATE_LIMIT_SHARED=true every
+# process also reserves its calls in a per-minute window document in Mongo, so
+# several workers together stay under the account quota.
+#
+# All of this runs on the LLM gateway loop (see llm_gateway.py).
+
+load_dotenv()
+
+LLM_RATE_LIMIT = os.getenv("LLM_RATE_LIMIT", "true").lower() == "true"
+LLM_RATE_LIMIT_SHARED = os.getenv("LLM_RATE_LIMIT_SHARED", "false").lower() == "true"
+DEFAULT_RPM = int(os.getenv("LLM_DEFAULT_RPM", "500"))
+DEFAULT_TPM = int(os.getenv("LLM_DEFAULT_TPM", "200000"))
+# Completion tokens assumed when a call does not set max_tokens; corrected
+# against the real usage once the response arrives.
+COMPLETION_TOKEN_ESTIMATE = int(os.getenv("LLM_COMPLETION_TOKEN_ESTIMATE", "800"))
+
+PRIORITY_INTERACTIVE = 0   # answer synthesis the user is waiting on
+PRIORITY_PIPELINE = 1      # history check, classification, extraction
+PRIORITY_BACKGROUND = 2    # titles, summaries, shadow classification
+
+WINDOW_COLLECTION = "llm_rate_windows"
+
+_current_user: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar("llm_user", default=None)
+
+
+def set_current_user(user_id: Optional[str]) -> None:
+    """Attribute subsequent model calls in this context to `user_id` (for fair queuing)."""
+    _current_user.set(str(user_id) if user_id else None)
+
+
+def model_limits(model: str) -> Dict[str, int]:
+    """
+    RPM/TPM for `model`. Per-model overrides use the model's env name, e.g.
+    PATHWAY_MODEL_RPM / PATHWAY_MODEL_TPM or SUMMARIZATION_MODEL_RPM / _TPM.
+    """
+    from .llm_gateway import PATHWAY_MODEL, SUMMARIZATION_MODEL
+
+    prefix = {PATHWAY_MODEL: "PATHWAY_MODEL", SUMMARIZATION_MODEL: "SUMMARIZATION_MODEL"}.get(model)
+    rpm, tpm = DEFAULT_RPM, DEFAULT_TPM
+    if prefix:
+        rpm = int(os.getenv(f"{prefix}_RPM", rpm))
+        tpm = int(os.getenv(f"{prefix}_TPM", tpm))
+    return {"rpm": rpm, "tpm": tpm}
+
+
+def estimate_prompt_tokens(messages: List[dict]) -> int:
+    """Rough prompt estimate (1 token ≈ 4 characters)."""
+    chars = sum(len(str(m.get("content") or "")) for m in messages)
+    return chars // 4 + 4 * len(messages)
+
+
+def estimate_tokens(messages: List[dict], max_tokens: Optional[int] = None) -> int:
+    """Rough prompt + completion estimate."""
+    return estimate_prompt_tokens(messages) + (max_tokens or COMPLETION_TOKEN_ESTIMATE)
+
+
+class _Bucket:
+    """Token bucket refilled continuously at `per_minute / 60` per second."""
+
+    def __init__(self, per_minute: int):
+        self.capacity = float(per_minute)
+        self.level = float(per_minute)
+        self.rate = per_minute / 60.0
+        self.updated = time.monotonic()
+
+    def refill(self, now: float) -> None:
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount: float) -> float:
+        amount = min(amount, self.capacity)
+        if self.level >= amount:
+            return 0.0
+        return (amount - self.level) / self.rate
+
+    def take(self, amount: float) -> None:
+        self.level -= min(amount, self.capacity)
+
+
+class ModelLimiter:
+    """Admission queue for one model."""
+
+    def __init__(self, model: str):
+        self.model = model
+        limits = model_limits(model)
+        self.requests = _Bucket(limits["rpm"])
+        self.tokens = _Bucket(limits["tpm"])
+        self.paused_until = 0.0
+        self._queue = []
+        self._seq = itertools.count()
+        self._virtual_time = 0
+        self._user_time: Dict[Optional[str], int] = {}
+        self._timer: Optional[asyncio.TimerHandle] = None
+
+    def _fair_tag(self, user: Optional[str]) -> int:
+        # Each user's calls are numbered after the later of "now" and that user's
+        # last queued call, so queued users are interleaved rather than FIFO.
+        tag = max(self._virtual_time, self._user_time.get(user, 0)) + 1
+        self._user_time[user] = tag
+        return tag
+
+    async def acquire(self, tokens: int, priority: int, user: Optional[str]) -> None:
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._queue, (priority, self._fair_tag(user), next(self._seq), tokens, future))
+        self._pump()
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                # Admitted and then cancelled: give the capacity back.
+                self.settle(tokens, 0, requests=1)
+            raise
+
+    def _pump(self) -> None:
+        if self._timer:
+            self._timer.cancel()
+            self._timer = None
+        now = time.monotonic()
+        self.requests.refill(now)
+        self.tokens.refill(now)
+        while self._queue:
+            priority, tag, _, tokens, future = self._queue[0]
+            if future.done():
+                heapq.heappop(self._queue)
+                continue
+            wait = max(
+                self.paused_until - now,
+                self.requests.wait_time(1),
+                self.tokens.wait_time(tokens),
+            )
+            if wait > 0:
+                self._timer = asyncio.get_running_loop().call_later(wait, self._pump)
+                return
+            heapq.heappop(self._queue)
+            self.requests.take(1)
+            self.tokens.take(tokens)
+            self._virtual_time = max(self._virtual_time, tag)
+            future.set_result(None)
+        # Nobody is waiting: forget per-user positions so the map stays small.
+        self._user_time.clear()
+
+    def settle(self, estimated: int, actual: int, requests: int = 0) -> None:
+        """Correct the token bucket once the real usage of an admitted call is known."""
+        self.tokens.level = min(self.tokens.capacity, self.tokens.level + estimated - actual)
+        self.requests.level = min(self.requests.capacity, self.requests.level + requests)
+        if self._queue:
+            self._pump()
+
+    def pause(self, seconds: float) -> None:
+        """Hold all admissions after a 429 (the API's view of our quota wins)."""
+        self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+        self.tokens.level = min(self.tokens.level, 0.0)
+
+    def queued(self) -> int:
+        return sum(1 for item in self._queue if not item[4].done())
+
+
+_limiters: Dict[str, ModelLimiter] = {}
+
+
+def get_limiter(model: str) -> ModelLimiter:
+    limiter = _limiters.get(model)
+    if limiter is None:
+        limiter = _limiters[model] = ModelLimiter(model)
+    return limiter
+
+
+# ─── Cross-process Window (optional) ───────────────────────────────────────────
+
+_window_index_ready = False
+
+
+def _reserve_window(model: str, tokens: int) -> float:
+    """
+    Reserve one request and `tokens` in the current minute's shared window.
+    Returns 0 on success, otherwise the seconds to wait for the next window.
+    """
+    global _window_index_ready
+    from pymongo import ReturnDocument
+    from ..database import get_db
+
+    collection = get_db()[WINDOW_COLLECTION]
+    if not _window_index_ready:
+        collection.create_index("expires_at", expireAfterSeconds=0)
+        _window_index_ready = True
+
+    now = datetime.utcnow()
+    minute = now.replace(second=0, microsecond=0)
+    limits = model_limits(model)
+    window_id = f"{model}:{minute.isoformat()}"
+    doc = collection.find_one_and_update(
+        {"_id": window_id},
+        {
+            "$inc": {"requests": 1, "tokens": tokens},
+            "$setOnInsert": {"model": model, "expires_at": minute + timedelta(minutes=2)},
+        },
+        upsert=True,
+        return_document=ReturnDocument.AFTER,
+    )
+    if doc["requests"] <= limits["rpm"] and doc["tokens"] <= max(limits["tpm"], tokens):
+        return 0.0
+    collection.update_one({"_id": window_id}, {"$inc": {"requests": -1, "tokens": -tokens}})
+    return 60.0 - (now - minute).total_seconds()
+
+
+async def acquire(model: str, tokens: int, priority: int = PRIORITY_PIPELINE) -> None:
+    """Wait until a call of ~`tokens` tokens to `model` fits within the rate limits."""
+    if not LLM_RATE_LIMIT:
+        return
+    limiter = get_limiter(model)
+    await limiter.acquire(tokens, priority, _current_user.get())
+    while LLM_RATE_LIMIT_SHARED:
+        try:
+            wait = await asyncio.to_thread(_reserve_window, model, tokens)
+        except Exception as e:
+            logging.warning(f"Shared rate limit window unavailable: {e}")
+            return
+        if not wait:
+            return
+        logging.info("Shared %s quota exhausted for this minute; waiting %.1fs", model, wait)
+        await asyncio.sleep(wait)
+
+
+def settle(model: str, estimated: int, actual: Optional[int]) -> None:
+    if LLM_RATE_LIMIT and actual is not None:
+        get_limiter(model).settle(estimated, actual)
+
+
+def pause(model: str, seconds: float) -> None:
+    if LLM_RATE_LIMIT:
+        get_limiter(model).pause(seconds)
+
+
+def get_status() -> Dict[str, dict]:
+    """Current bucket levels and queue depth per model."""
+    return {
+        model: {
+            "queued": limiter.queued(),
+            "requests_available": round(limiter.requests.level, 1),
+            "tokens_available": round(limiter.tokens.level),
+            "rpm": int(limiter.requests.capacity),
+            "tpm": int(limiter.tokens.capacity),
+        }
+        for model, limiter in _limiters.items()
+    }
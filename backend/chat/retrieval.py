@@ -0,0 +1,203 @@
+import math
+import os
+import re
+import threading
+from collections import Counter
+from typing import Dict, List, Tuple
+
+from .embeddings import dense_scores
+
+# ─── Block-level Lexical Retrieval ─────────────────────────────────────────────
+#
+# Pathway markdowns are split into addressable blocks (#L23 lines, #I1 image
+# summaries, #T1 tables). Rather than sending a whole pathway to the extraction
+# prompt, we score the blocks against the query with BM25 and keep the top-k,
+# expanded with neighbouring lines, under their original IDs so that the
+# `source.lines/images/tables` citations still resolve. When the dense block
+# index (embeddings.py) is available, lexical and vector scores are blended.
+
+BLOCK_RETRIEVAL = os.getenv("BLOCK_RETRIEVAL", "true").lower() == "true"
+RETRIEVAL_TOP_K = int(os.getenv("RETRIEVAL_TOP_K", "15"))
+RETRIEVAL_NEIGHBOURS = int(os.getenv("RETRIEVAL_NEIGHBOURS", "2"))
+# Leading lines (pathway title, definition heading) always sent for orientation.
+RETRIEVAL_HEADER_LINES = int(os.getenv("RETRIEVAL_HEADER_LINES", "2"))
+# Weight of the dense (cosine) score in hybrid ranking; BM25 gets the rest.
+HYBRID_ALPHA = float(os.getenv("HYBRID_ALPHA", "0.5"))
+# Blocks below this hybrid score are never selected, even if within top-k.
+HYBRID_MIN_SCORE = float(os.getenv("HYBRID_MIN_SCORE", "0.2"))
+
+BM25_K1 = 1.5
+BM25_B = 0.75
+
+BLOCK_MARKER = re.compile(r"^#\s?([LIT])(\d+)\s*$")
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+(?:\.[0-9]+)?")
+
+STOPWORDS = frozenset("""
+a an and are as at be by can do does for from has have how i if in into is it its
+me my of on or should so than that the their them then there these this to was
+we what when where which who why will with would you your patient pt please about
+""".split())
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercase word tokens with stopwords removed and a light plural strip."""
+    tokens = []
+    for tok in TOKEN_PATTERN.findall(text.lower()):
+        if tok in STOPWORDS:
+            continue
+        if len(tok) > 4 and tok.endswith("es") and not tok.endswith("ses"):
+            tok = tok[:-2]
+        elif len(tok) > 3 and tok.endswith("s") and not tok.endswith("ss"):
+            tok = tok[:-1]
+        tokens.append(tok)
+    return tokens
+
+
+def parse_blocks(markdown: str) -> List[Dict[str, str]]:
+    """
+    Split a pathway markdown into its #L/#I/#T blocks, in document order.
+    Each block is {"id": "L23", "type": "L", "text": "..."}.
+    """
+    blocks = []
+    current = None
+    for line in markdown.splitlines():
+        match = BLOCK_MARKER.match(line)
+        if match:
+            current = {"id": f"{match.group(1)}{match.group(2)}", "type": match.group(1), "lines": []}
+            blocks.append(current)
+        elif current is not None:
+            current["lines"].append(line)
+    return [
+        {"id": b["id"], "type": b["type"], "text": "\n".join(b["lines"]).strip()}
+        for b in blocks
+    ]
+
+
+class BlockIndex:
+    """BM25 index over the blocks of a single pathway markdown."""
+
+    def __init__(self, markdown: str):
+        self.blocks = parse_blocks(markdown)
+        self.doc_tokens = [Counter(tokenize(b["text"])) for b in self.blocks]
+        self.doc_lengths = [sum(tf.values()) for tf in self.doc_tokens]
+        n = len(self.blocks)
+        self.avg_length = (sum(self.doc_lengths) / n) if n else 0.0
+
+        df = Counter()
+        for tf in self.doc_tokens:
+            df.update(tf.keys())
+        self.idf = {
+            term: math.log(1 + (n - freq + 0.5) / (freq + 0.5))
+            for term, freq in df.items()
+        }
+
+    def score(self, query: str) -> List[float]:
+        """BM25 score of every block against `query`, aligned with `self.blocks`."""
+        terms = set(tokenize(query))
+        scores = []
+        for tf, length in zip(self.doc_tokens, self.doc_lengths):
+            norm = BM25_K1 * (1 - BM25_B + BM25_B * length / (self.avg_length or 1))
+            s = 0.0
+            for term in terms:
+                freq = tf.get(term)
+                if freq:
+                    s += self.idf[term] * freq * (BM25_K1 + 1) / (freq + norm)
+            scores.append(s)
+        return scores
+
+    def top_k(self, query: str, k: int = RETRIEVAL_TOP_K) -> List[Tuple[int, float]]:
+        """(block position, score) of the k best blocks with a positive score."""
+        ranked = sorted(enumerate(self.score(query)), key=lambda x: x[1], reverse=True)
+        return [(i, s) for i, s in ranked[:k] if s > 0]
+
+    def expand(self, positions: List[int], neighbours: int = RETRIEVAL_NEIGHBOURS) -> List[int]:
+        """
+        Add up to `neighbours` adjacent line blocks on each side of every selected
+        line block (sentences in the pathways are wrapped across several #L lines).
+        """
+        selected = set(positions)
+        for pos in positions:
+            if self.blocks[pos]["type"] != "L":
+                continue
+            for offset in range(1, neighbours + 1):
+                for p in (pos - offset, pos + offset):
+                    if 0 <= p < len(self.blocks) and self.blocks[p]["type"] == "L":
+                        selected.add(p)
+        header = [i for i, b in enumerate(self.blocks) if b["type"] == "L"][:RETRIEVAL_HEADER_LINES]
+        selected.update(header)
+        return sorted(selected)
+
+    def render(self, positions: List[int]) -> str:
+        """Render the selected blocks under their original #IDs, in document order."""
+        parts = []
+        previous = None
+        for pos in positions:
+            if previous is not None and pos != previous + 1:
+                parts.append("...")
+            block = self.blocks[pos]
+            parts.append(f"#{block['id']}\n{block['text']}")
+            previous = pos
+        return "\n".join(parts)
+
+
+_indexes: Dict[str, Tuple[str, BlockIndex]] = {}
+_lock = threading.Lock()
+
+
+def get_block_index(entry: dict) -> BlockIndex:
+    """Return the BM25 index for a corpus entry, rebuilding it when the content hash changes."""
+    key = entry["disease"]
+    cached = _indexes.get(key)
+    if cached and cached[0] == entry["hash"]:
+        return cached[1]
+    index = BlockIndex(entry["content"])
+    with _lock:
+        _indexes[key] = (entry["hash"], index)
+    return index
+
+
+def hybrid_top_k(
+    index: BlockIndex,
+    query: str,
+    dense: Dict[str, float],
+    k: int = RETRIEVAL_TOP_K,
+) -> List[Tuple[int, float]]:
+    """
+    Rank blocks by HYBRID_ALPHA * cosine + (1 - HYBRID_ALPHA) * BM25, with BM25
+    scaled to [0, 1] by the best block of this pathway.
+    """
+    lexical = index.score(query)
+    best = max(lexical) if lexical else 0.0
+    scored = []
+    for i, (block, bm25) in enumerate(zip(index.blocks, lexical)):
+        score = HYBRID_ALPHA * max(dense.get(block["id"], 0.0), 0.0)
+        if best > 0:
+            score += (1 - HYBRID_ALPHA) * bm25 / best
+        scored.append((i, score))
+    scored.sort(key=lambda x: x[1], reverse=True)
+    return [(i, s) for i, s in scored[:k] if s >= HYBRID_MIN_SCORE]
+
+
+def select_relevant_blocks(
+    query: str,
+    entry: dict,
+    top_k: int = RETRIEVAL_TOP_K,
+    neighbours: int = RETRIEVAL_NEIGHBOURS,
+) -> str:
+    """
+    Return the part of a pathway markdown worth sending to the extraction prompt.
+    Uses hybrid ranking when a dense index is available for this pathway, BM25
+    otherwise. Falls back to the full markdown when retrieval is disabled or
+    nothing matches.
+    """
+    if not BLOCK_RETRIEVAL:
+        return entry["content"]
+    index = get_block_index(entry)
+    dense = dense_scores(query, entry)
+    if dense is not None:
+        hits = hybrid_top_k(index, query, dense, top_k)
+    else:
+        hits = index.top_k(query, top_k)
+    if not hits:
+        return entry["content"]
+    return index.render(index.expand([i for i, _ in hits], neighbours))
@@ -1,20 +1,115 @@
 import time 
+import json
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from bson import ObjectId
-from flask import Blueprint, request, jsonify, current_app, Response
+from flask import Blueprint, request, jsonify, current_app, Response, stream_with_context
 from datetime import datetime
-from .main import answer_medical_query
-from .utils import generate_conversation_title
+from .main import answer_medical_query, settle_background_calls, stream_medical_query
+from .utils import PLACEHOLDER_TITLE, schedule_conversation_title
 from ..auth.utils import verify_token
 from ..database import get_db 
 from .utils import summarize_conversation
 from .pdf_export import conversation_to_pdf_bytes 
+from .rate_limiter import set_current_user
+from . import telemetry
+from .memory import load_history, schedule_memory_update
 
-from ..models.analytics import track_response_latency, track_query_cost
+from ..models.analytics import track_response_latency, track_query_cost, track_llm_usage
 from ..models.prompt import get_user_active_prompt, get_default_system_prompt
+from ..models.daily_stats import increment_daily_stat
+from ..models.message import (
+    CONVERSATION_PROJECTION, DEFAULT_MESSAGE_PAGE, MAX_MESSAGE_PAGE,
+    add_message, get_messages, get_messages_after, get_message_page, delete_conversation_messages
+)
 
 chat_bp = Blueprint("chat", __name__)
 
+def _start_conversation_turn(user_id, conversation_id, user_message):
+    """
+    Create or load the conversation and save the user message.
+    Returns (conversation_id, history, user_message_doc, error_response).
+    """
+    db = get_db()
+    conversations = db["conversations"]
+
+    # Create or load conversation; the title is generated in the background
+    if not conversation_id:
+        with telemetry.span("db:create_conversation"):
+            conversation_id = conversations.insert_one({
+                "user_id": ObjectId(user_id),
+                "messages_migrated": True,
+                "message_count": 0,
+                "version": 0,
+                "created_at": datetime.utcnow(),
+                "updated_at": datetime.utcnow(),
+                "title": PLACEHOLDER_TITLE
+            }).inserted_id
+            increment_daily_stat("conversations")
+        schedule_conversation_title(user_id, conversation_id, user_message)
+        history = []
+    else:
+        with telemetry.span("db:load_conversation"):
+            convo = conversations.find_one({
+                "_id": ObjectId(conversation_id),
+                "user_id": ObjectId(user_id)
+            }, CONVERSATION_PROJECTION)
+            if convo:
+                # Long conversations are condensed to a rolling summary + recent turns
+                history = load_history(convo)
+        if not convo:
+            return None, None, None, (jsonify({"error": "Conversation not found"}), 404)
+        if not history and convo.get("title") == PLACEHOLDER_TITLE:
+            # Created empty via /chat/new; title it from this first message.
+            schedule_conversation_title(user_id, conversation_id, user_message)
+        
+    # Save the user message right after receiving it
+    with telemetry.span("db:save_user_message"):
+        message, _ = add_message(conversation_id, "user", user_message)
+    return conversation_id, history, message, None
+
+
+def _finish_conversation_turn(conversation_id, user_message, bot_reply, sources, start_time, trace=None, partial=False):
+    """
+    Save the bot message and track analytics. `trace` holds the per-call usage
+    records and stage spans of this turn (see telemetry.py); `partial` marks an
+    answer synthesized after some extractions missed their deadline. Returns the
+    bot message and the conversation's version after it.
+    """
+    settle_background_calls(trace)
+    calls = trace["calls"] if trace else None
+
+    if calls:
+        token_count = telemetry.total_tokens(calls)
+    else:
+        # Estimate token count (rough approximation: 1 token ≈ 4 characters)
+        token_count = (len(user_message) + len(bot_reply)) // 4
+
+    # Save the bot response after generating it
+    with telemetry.span("db:save_bot_message"):
+        bot_message, version = add_message(
+            conversation_id, "bot", bot_reply, sources=sources, partial=partial
+        )
+    bot_message_id = bot_message["id"]
+
+    # Track end time and calculate latency (including the save above)
+    end_time = time.time()
+
+    schedule_memory_update(conversation_id)
+    
+        # Track analytics
+    try:
+        track_response_latency(
+            conversation_id, bot_message_id, start_time, end_time, token_count,
+            spans=trace["spans"] if trace else None, partial=partial
+        )
+        track_query_cost(conversation_id, bot_message_id, token_count, calls=calls)
+        track_llm_usage(conversation_id, bot_message_id, calls)
+    except Exception as e:
+        print(f"Analytics tracking error: {e}")
+
+    return bot_message, version
+
+
 @chat_bp.route("/chat", methods=["POST"])
 def chat():
     auth_header = request.headers.get("Authorization")
@@ -24,6 +119,8 @@ def chat():
     user_id = verify_token(token)
     if not user_id:
         return jsonify({"error": "Invalid or expired token"}), 403
+    set_current_user(user_id)
+    trace = telemetry.start_trace()
 
     data = request.get_json()
     user_message = data.get("message")
@@ -31,102 +128,114 @@ def chat():
     if not user_message:
         return jsonify({"error": "Message is required"}), 400
 
-    db = get_db()
-    conversations = db["conversations"]
     # Track start time for latency measurement
     start_time = time.time()
 
-    # Create or load conversation
-    if not conversation_id:
-        title = generate_conversation_title(user_message)
-        conversation_id = conversations.insert_one({
-            "user_id": ObjectId(user_id),
-            "messages": [],
-            "created_at": datetime.utcnow(),
-            "updated_at": datetime.utcnow(),
-            "title": title
-        }).inserted_id
-        history = []
-    else:
-        convo = conversations.find_one({
-            "_id": ObjectId(conversation_id),
-            "user_id": ObjectId(user_id)
-        })
-        if not convo:
-            return jsonify({"error": "Conversation not found"}), 404
-        history = [
-            {"role": "user" if m["sender"]=="user" else "assistant", "content": m["text"]}
-            for m in convo.get("messages", [])
-        ]
-        
-    user_message_id = str(ObjectId())
-
-    # Save the user message right after receiving it
-    conversations.update_one(
-        {"_id": ObjectId(conversation_id)},
-        {
-            "$push": {
-                "messages": {
-                    "id": user_message_id,
-                    "sender": "user",
-                    "text": user_message,
-                    "timestamp": datetime.utcnow(),
-                }
-            },
-            "$set": {"updated_at": datetime.utcnow()},
-        },
-    )    
+    conversation_id, history, user_doc, error = _start_conversation_turn(user_id, conversation_id, user_message)
+    if error:
+        return error
 
     bot_answer = answer_medical_query(user_message, history)
     bot_reply=bot_answer.get("answer")
     sources=bot_answer.get("sources")
+    partial=bot_answer.get("partial", False)
 
-    # Track end time and calculate latency
-    end_time = time.time()
-    
-    # Estimate token count (rough approximation: 1 token ≈ 4 characters)
-    estimated_tokens = (len(user_message) + len(bot_reply)) // 4
-
-    # Save messages
-    # Generate bot message ID
-    bot_message_id = str(ObjectId())
+    bot_doc, version = _finish_conversation_turn(
+        conversation_id, user_message, bot_reply, sources, start_time, trace, partial
+    )
 
-    # Save the bot response after generating it
-    conversations.update_one(
-    {"_id": ObjectId(conversation_id)},
-    {
-        "$push": {
-            "messages": {
-                "id": bot_message_id,
-                "sender": "bot",
-                "text": bot_reply,
-                "timestamp": datetime.utcnow(),
-                "sources": sources,
-            }
-        },
-        "$set": {"updated_at": datetime.utcnow()}
-    })
-    
-        # Track analytics
-    try:
-        track_response_latency(conversation_id, bot_message_id, start_time, end_time, estimated_tokens)
-        track_query_cost(conversation_id, bot_message_id, estimated_tokens)
-    except Exception as e:
-        print(f"Analytics tracking error: {e}")
+    # ?response=delta: only this turn's two messages, no re-read of the conversation
+    if request.args.get("response") == "delta":
+        return jsonify({
+            "reply": bot_reply,
+            "partial": partial,
+            "conversation_id": str(conversation_id),
+            "version": version,
+            "messages": [user_doc, bot_doc]
+        })
 
-    updated = conversations.find_one({"_id": ObjectId(conversation_id)})
+    db = get_db()
+    conversations = db["conversations"]
+    updated = conversations.find_one({"_id": ObjectId(conversation_id)}, CONVERSATION_PROJECTION)
     history_resp = [
         {"role": "user" if m["sender"] == "user" else "assistant", "content": m["text"], "timestamp": m["timestamp"].isoformat(),"id": m.get("id", str(ObjectId()))}
-        for m in updated.get("messages", [])
+        for m in get_messages(updated)
     ]
 
     return jsonify({
         "reply": bot_reply,
+        "partial": partial,
         "conversation_id": str(conversation_id),
         "history": history_resp
     })
 
 
+def _sse(event, data):
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+@chat_bp.route("/chat/stream", methods=["POST"])
+def chat_stream():
+    """
+    Streaming variant of /chat over Server-Sent Events. Emits `conversation`,
+    `stage` (classify/extract/synthesize progress), `delta` (answer text as it is
+    generated) and a final `done` event; the bot message is saved once complete.
+    """
+    auth_header = request.headers.get("Authorization")
+    if not auth_header:
+        return jsonify({"error": "Missing token"}), 401
+    token = auth_header.split(" ")[1]
+    user_id = verify_token(token)
+    if not user_id:
+        return jsonify({"error": "Invalid or expired token"}), 403
+    set_current_user(user_id)
+    trace = telemetry.start_trace()
+
+    data = request.get_json()
+    user_message = data.get("message")
+    conversation_id = data.get("conversation_id")
+    if not user_message:
+        return jsonify({"error": "Message is required"}), 400
+
+    start_time = time.time()
+
+    conversation_id, history, _, error = _start_conversation_turn(user_id, conversation_id, user_message)
+    if error:
+        return error
+
+    def generate():
+        set_current_user(user_id)
+        telemetry.use_trace(trace)
+        yield _sse("conversation", {"conversation_id": str(conversation_id)})
+        try:
+            for event, payload in stream_medical_query(user_message, history):
+                if event == "answer":
+                    bot_reply = payload.get("answer")
+                    sources = payload.get("sources")
+                    partial = payload.get("partial", False)
+                    bot_message, version = _finish_conversation_turn(
+                        conversation_id, user_message, bot_reply, sources, start_time, trace, partial
+                    )
+                    yield _sse("done", {
+                        "conversation_id": str(conversation_id),
+                        "message_id": bot_message["id"],
+                        "version": version,
+                        "reply": bot_reply,
+                        "sources": sources,
+                        "partial": partial,
+                    })
+                else:
+                    yield _sse(event, payload)
+        except Exception as e:
+            current_app.logger.error(f"Streaming chat failed: {e}")
+            yield _sse("error", {"error": "Failed to generate a response"})
+
+    response = Response(stream_with_context(generate()), mimetype="text/event-stream")
+    response.headers["Cache-Control"] = "no-cache"
+    response.headers["X-Accel-Buffering"] = "no"
+    return response
+
+
 @chat_bp.route("/chat/new", methods=["POST"])
 def new_chat():
     auth_header = request.headers.get("Authorization")
@@ -143,11 +252,14 @@ def new_chat():
 
     conversation_id = conversations.insert_one({
         "user_id": ObjectId(user_id),
-        "messages": [],
+        "messages_migrated": True,
+        "message_count": 0,
+        "version": 0,
         "created_at": datetime.utcnow(),
         "updated_at": datetime.utcnow(),
-        "title": "New Chat"  # Default title for new conversations
+        "title": PLACEHOLDER_TITLE  # Replaced once the first message arrives
     }).inserted_id
+    increment_daily_stat("conversations")
 
     return jsonify({
         "message": "New conversation created",
@@ -170,7 +282,7 @@ def get_conversation_history():
 
     history = conversations.find(
         {"user_id": ObjectId(user_id)},
-        {"messages": 0}  # Exclude full messages
+        {"title": 1, "created_at": 1, "updated_at": 1}
     ).sort("updated_at", -1)
 
     result = [{
@@ -201,29 +313,51 @@ def get_conversation_messages(conversation_id):
     conversation = conversations.find_one({
         "_id": ObjectId(conversation_id),
         "user_id": ObjectId(user_id)
-    })
+    }, CONVERSATION_PROJECTION)
 
     if not conversation:
         return jsonify({"error": "Conversation not found"}), 404
 
-    messages = conversation.get("messages", [])
-    
-    # Convert messages to frontend format
-    history = []
-    for msg in messages:
-        history.append({
-            "role": "user" if msg["sender"] == "user" else "assistant",
-            "content": msg["text"],
-            "timestamp": msg["timestamp"].isoformat() if msg["timestamp"] else None,
-            "id": msg.get("id", str(ObjectId()))
-        })
-    
-    return jsonify({
+    # ?before=<message id>&limit=N returns one page of older messages;
+    # ?format=messages or ?format=history returns only that encoding.
+    before = request.args.get("before")
+    paginated = before or "limit" in request.args
+    response_format = request.args.get("format", "both")
+    if response_format not in ("both", "messages", "history"):
+        return jsonify({"error": "format must be one of both, messages, history"}), 400
+
+    if paginated:
+        try:
+            limit = min(max(int(request.args.get("limit", DEFAULT_MESSAGE_PAGE)), 1), MAX_MESSAGE_PAGE)
+            messages, has_more = get_message_page(conversation, before, limit)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+    else:
+        messages = get_messages(conversation)
+
+    response = {
         "conversation_id": str(conversation["_id"]),
         "title": conversation.get("title", "Untitled Chat"),
-        "messages": messages,  # Keep original format for backward compatibility
-        "history": history     # Add converted format for frontend
-    })
+        "version": conversation.get("version", 0),
+    }
+    if response_format in ("both", "messages"):
+        response["messages"] = messages  # Keep original format for backward compatibility
+    if response_format in ("both", "history"):
+        # Convert messages to frontend format
+        response["history"] = [
+            {
+                "role": "user" if msg["sender"] == "user" else "assistant",
+                "content": msg["text"],
+                "timestamp": msg["timestamp"].isoformat() if msg["timestamp"] else None,
+                "id": msg.get("id", str(ObjectId()))
+            }
+            for msg in messages
+        ]
+    if paginated:
+        response["has_more"] = has_more
+        response["next_before"] = messages[0].get("id") if has_more and messages else None
+
+    return jsonify(response)
 
 # Add endpoint to delete conversation
 @chat_bp.route("/chat/conversation/<conversation_id>", methods=["DELETE"])
@@ -249,6 +383,8 @@ def delete_conversation(conversation_id):
     if result.deleted_count == 0:
         return jsonify({"error": "Conversation not found"}), 404
 
+    delete_conversation_messages(conversation_id)
+
     return jsonify({"message": "Conversation deleted successfully"})
 
 # Add endpoint to rename conversation
@@ -300,6 +436,7 @@ def summarize_conversation_endpoint(conversation_id):
     user_id = verify_token(token)
     if not user_id:
         return jsonify({"error": "Invalid or expired token"}), 403
+    set_current_user(user_id)
 
     # Load the conversation
     db = get_db()
@@ -307,27 +444,84 @@ def summarize_conversation_endpoint(conversation_id):
     conversation = conversations.find_one({
         "_id": ObjectId(conversation_id),
         "user_id": ObjectId(user_id)
-    })
+    }, CONVERSATION_PROJECTION)
     if not conversation:
         return jsonify({"error": "Conversation not found"}), 404
 
+    # Serve the stored summary while the conversation is unchanged: every
+    # added message bumps the conversation's version
+    stored = conversation.get("summary") or {}
+    version = conversation.get("version")
+    if stored.get("text") and "version" in stored and stored["version"] == version:
+        return jsonify({
+            "conversation_id": conversation_id,
+            "summary": stored["text"],
+            "cached": True
+        })
+
+    # Only the new turns need loading and summarizing if there is a stored summary
+    previous_summary = None
+    covered = 0
+    messages = None
+    if stored.get("text") and stored.get("last_message_id"):
+        try:
+            messages = get_messages_after(conversation, stored["last_message_id"])
+            previous_summary = stored["text"]
+            covered = stored.get("message_count", 0)
+        except ValueError:
+            messages = None
+    if messages is None:
+        messages = get_messages(conversation)
+    all_count = covered + len(messages)
+    last_message_id = messages[-1].get("id") if messages else stored.get("last_message_id")
+
+    if previous_summary and not messages:
+        # Nothing new since the summary (it was written after this version)
+        conversations.update_one(
+            {"_id": ObjectId(conversation_id)},
+            {"$set": {"summary.version": version}}
+        )
+        return jsonify({
+            "conversation_id": conversation_id,
+            "summary": previous_summary,
+            "cached": True
+        })
+
     # Build history for summarization
     history = [
         {"role": "user" if msg["sender"] == "user" else "assistant", "content": msg["text"]}
-        for msg in conversation.get("messages", [])
+        for msg in messages
     ]
 
     # Generate summary
+    trace = telemetry.start_trace()
     try:
-        summary_text = summarize_conversation(history).get("summary")
+        summary_text = summarize_conversation(history, previous_summary).get("summary")
         print(summary_text)
     except Exception as e:
         current_app.logger.error(f"Summarization failed: {e}")
         return jsonify({"error": "Failed to summarize conversation"}), 500
 
+    conversations.update_one(
+        {"_id": ObjectId(conversation_id)},
+        {"$set": {"summary": {
+            "text": summary_text,
+            "message_count": all_count,
+            "last_message_id": last_message_id,
+            "version": version,
+            "updated_at": datetime.utcnow()
+        }}}
+    )
+
+    try:
+        track_llm_usage(conversation_id, None, trace["calls"])
+    except Exception as e:
+        print(f"Analytics tracking error: {e}")
+
     return jsonify({
         "conversation_id": conversation_id,
-        "summary": summary_text
+        "summary": summary_text,
+        "cached": False
     })
 
 @chat_bp.route("/chat/conversation/<conversation_id>/export/pdf", methods=["GET"])
@@ -345,12 +539,12 @@ def export_conversation_pdf(conversation_id):
     conversation = conversations.find_one({
         "_id": ObjectId(conversation_id),
         "user_id": ObjectId(user_id)
-    })
+    }, CONVERSATION_PROJECTION)
     if not conversation:
         return jsonify({"error": "Conversation not found"}), 404
 
     title = conversation.get("title", "Chat Export")
-    messages = conversation.get("messages", [])
+    messages = get_messages(conversation)
     pdf_bytes = conversation_to_pdf_bytes(title, messages)
     filename = f"{title.replace(' ', '_')}_chat.pdf"
 
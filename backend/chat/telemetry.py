@@ -0,0 +1,133 @@
+import contextvars
+import logging
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional
+
+# ─── LLM Call Telemetry ────────────────────────────────────────────────────────
+#
+# A trace collects one record per model call made while handling a request:
+# the pipeline stage that made it (title, history, classify, extract:<disease>,
+# synth, summary, memory), the model, the token usage reported by the API and the
+# latency. It also collects timed spans for each pipeline stage (including the
+# Mongo reads/writes of the route), so wall time can be attributed to stages.
+# The route starts a trace, the gateway and pipeline append to it, and the
+# route hands the finished trace to models/analytics.py.
+#
+# The trace lives in a context variable; coroutines scheduled on the gateway
+# loop and tasks started from them inherit it, so concurrent extraction calls
+# all land in the same request's trace. Background tasks that may outlive the
+# pipeline (shadow classifications) are listed in the trace's "pending" so the
+# route can wait for them before storing it. A call cancelled while in flight
+# (the losing copy of a hedged extraction) is still billed for its prompt; it
+# is recorded with an estimated prompt and "cancelled": True.
+
+STAGES = ("title", "history", "classify", "extract", "synth", "summary", "memory")
+
+_trace: contextvars.ContextVar[Optional[dict]] = contextvars.ContextVar("llm_trace", default=None)
+
+
+def start_trace() -> dict:
+    """
+    Begin collecting in the current context. Returns the live trace:
+    {"calls": [...], "spans": [...], "pending": [...], "started": perf_counter()}.
+    """
+    trace = {"calls": [], "spans": [], "pending": [], "started": time.perf_counter()}
+    _trace.set(trace)
+    return trace
+
+
+def use_trace(trace: Optional[dict]) -> None:
+    """Re-attach an existing trace, e.g. inside a streaming response generator."""
+    _trace.set(trace)
+
+
+def current_trace() -> Optional[dict]:
+    return _trace.get()
+
+
+def add_pending(task) -> None:
+    """Attach a background task whose calls belong to the current trace."""
+    trace = _trace.get()
+    if trace is not None:
+        trace["pending"].append(task)
+
+
+@contextmanager
+def span(name: str) -> Iterator[None]:
+    """
+    Time the enclosed block as stage `name` of the current trace. Works around
+    `await`s too; concurrent spans (e.g. one per extraction) simply overlap.
+    """
+    trace = _trace.get()
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        if trace is not None:
+            ended = time.perf_counter()
+            trace["spans"].append({
+                "name": name,
+                "start_ms": round((started - trace["started"]) * 1000, 1),
+                "duration_ms": round((ended - started) * 1000, 1),
+            })
+
+
+def stage_durations(spans: List[dict]) -> Dict[str, float]:
+    """Total milliseconds per span name (a stage can run more than once per turn)."""
+    totals: Dict[str, float] = {}
+    for s in spans:
+        totals[s["name"]] = round(totals.get(s["name"], 0.0) + s["duration_ms"], 1)
+    return totals
+
+
+def usage_from_response(usage) -> Optional[Dict[str, int]]:
+    """Flatten an OpenAI `usage` object into plain token counts."""
+    if usage is None:
+        return None
+    prompt_details = getattr(usage, "prompt_tokens_details", None)
+    completion_details = getattr(usage, "completion_tokens_details", None)
+    return {
+        "prompt_tokens": usage.prompt_tokens or 0,
+        "completion_tokens": usage.completion_tokens or 0,
+        "total_tokens": usage.total_tokens or 0,
+        "cached_tokens": getattr(prompt_details, "cached_tokens", None) or 0,
+        "reasoning_tokens": getattr(completion_details, "reasoning_tokens", None) or 0,
+    }
+
+
+def stage_group(stage: Optional[str]) -> str:
+    """'extract:asthma' -> 'extract'; untagged calls are grouped as 'other'."""
+    return (stage or "other").split(":", 1)[0]
+
+
+def cancelled_usage(prompt_tokens: int) -> Dict[str, int]:
+    """Usage to record for a call cancelled in flight: its (estimated) prompt."""
+    return {
+        "prompt_tokens": prompt_tokens,
+        "completion_tokens": 0,
+        "total_tokens": prompt_tokens,
+        "cached_tokens": 0,
+        "reasoning_tokens": 0,
+    }
+
+
+def record_call(
+    stage: Optional[str], model: str, usage: Optional[Dict[str, int]], latency_ms: float, cancelled: bool = False
+) -> None:
+    trace = _trace.get()
+    if trace is None:
+        return
+    if usage is None:
+        logging.warning("No usage reported for %s call (%s)", stage or "untagged", model)
+    trace["calls"].append({
+        "stage": stage or "other",
+        "model": model,
+        "latency_ms": round(latency_ms, 1),
+        **(usage or {}),
+        **({"cancelled": True} if cancelled else {}),
+    })
+
+
+def total_tokens(calls: List[dict]) -> int:
+    return sum(c.get("total_tokens", 0) for c in calls)
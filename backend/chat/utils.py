@@ -1,13 +1,20 @@
-import os
-import json
+import asyncio
 import logging
-import time
-from pathlib import Path
-from typing import List, Dict, Optional, Tuple
-from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import Future
+from typing import Iterator, List, Dict, Optional
+
+from bson import ObjectId
 
 from dotenv import load_dotenv      
-import openai
+
+# The OpenAI client, model names and retry policy live in the shared gateway.
+from . import llm_gateway
+from .llm_gateway import PATHWAY_MODEL, acall_model, acall_model_stream
+from .rate_limiter import PRIORITY_BACKGROUND
+from . import telemetry
+from ..database import get_db
+from ..models.analytics import track_llm_usage
+from ..socketio_instance import emit_from_thread
 
 # ─── Load .env ────────────────────────────────────────────────────────────────
 
@@ -20,72 +27,81 @@ logging.basicConfig(
     format="%(asctime)s %(levelname)s %(message)s"
 )
 
-API_KEY = os.getenv("OPENAI_API_KEY")
-if not API_KEY:
-    raise RuntimeError("Please set the OPENAI_API_KEY environment variable (in your .env or shell)")
-
-client = openai.OpenAI(api_key=API_KEY)
+# ─── Utility Functions ─────────────────────────────────────────────────────────
 
-PATHWAY_MODEL = os.getenv("PATHWAY_MODEL", "gpt-4.1-mini-2025-04-14")
-SUMMARIZATION_MODEL = os.getenv("SUMMARIZATION_MODEL", "o4-mini-2025-04-16")
+def call_model(model: str, messages: List[dict], **kwargs) -> str:
+    """Synchronous `acall_model`: runs the call on the shared gateway loop."""
+    return llm_gateway.run(acall_model(model, messages, **kwargs))
 
-# ─── Utility Functions ─────────────────────────────────────────────────────────
 
-def call_model(
-    model: str,
-    messages: List[dict],
-    max_retries: int = 3,
-    backoff_factor: float = 2.0,
-    **kwargs
-) -> str:
-    """
-    Call OpenAI ChatCompletion with a simple retry loop on rate limits.
-    Uses temperature ONLY if not summarization model.
-    """
-    for attempt in range(1, max_retries + 1):
-        try:
-            call_args = {
-                "model": model,
-                "messages": messages,
-                **kwargs
-            }
-            # Only use temperature if model is not summarization model
-            if model != SUMMARIZATION_MODEL:
-                call_args["temperature"] = kwargs.get("temperature", 0.2)
-            resp = client.chat.completions.create(**call_args)
-            return resp.choices[0].message.content
-
-        except openai.RateLimitError:
-            if attempt == max_retries:
-                logging.error("Rate limit reached; no more retries left.")
-                raise
-            wait_time = backoff_factor ** (attempt - 1)
-            logging.warning(
-                f"Rate limited. Retrying in {wait_time:.1f}s "
-                f"(attempt {attempt}/{max_retries})"
-            )
-            time.sleep(wait_time)
-        except Exception:
-            logging.exception("OpenAI API call failed unexpectedly:")
-            raise
+def call_model_stream(model: str, messages: List[dict], **kwargs) -> Iterator[str]:
+    """Synchronous `acall_model_stream`: yields content deltas as they arrive."""
+    return llm_gateway.iterate(acall_model_stream(model, messages, **kwargs))
 
 
 # ─── Title Generation Helper ───────────────────────────────────────────────────
-def generate_conversation_title(first_message: str) -> str:
+
+# Title a new conversation is created with until the generated one is ready.
+PLACEHOLDER_TITLE = "New Chat"
+
+async def agenerate_conversation_title(first_message: str) -> str:
     prompt = (
         "You’re a smart assistant. Given the first user message below, come up with a concise, human-readable chat title "
         "(no more than 5 words):\n\n"
         f"“{first_message}”"
     )
-    title = call_model(
+    title = (await acall_model(
         PATHWAY_MODEL,
         [{"role": "user", "content": prompt}],
-        temperature=0.0
-    ).strip().strip('"')
-    return title or "New Chat"
+        temperature=0.0,
+        priority=PRIORITY_BACKGROUND,
+        stage="title"
+    )).strip().strip('"')
+    return title or PLACEHOLDER_TITLE
+
+def generate_conversation_title(first_message: str) -> str:
+    return llm_gateway.run(agenerate_conversation_title(first_message))
+
+def _save_conversation_title(user_id: str, conversation_id, title: str, calls: List[dict]) -> None:
+    # Only replace the placeholder: the user may have renamed the chat meanwhile.
+    result = get_db()["conversations"].update_one(
+        {"_id": ObjectId(conversation_id), "title": PLACEHOLDER_TITLE},
+        {"$set": {"title": title}}
+    )
+    if result.modified_count:
+        emit_from_thread(f"conversation_title_{user_id}", {
+            "conversation_id": str(conversation_id),
+            "title": title
+        })
+    try:
+        track_llm_usage(conversation_id, None, calls)
+    except Exception as e:
+        print(f"Analytics tracking error: {e}")
+
+async def _title_conversation(user_id: str, conversation_id, first_message: str) -> None:
+    # Own trace: the request that started this has usually finished by now.
+    trace = telemetry.start_trace()
+    try:
+        title = await agenerate_conversation_title(first_message)
+        if title != PLACEHOLDER_TITLE:
+            await asyncio.to_thread(_save_conversation_title, user_id, conversation_id, title, trace["calls"])
+    except Exception:
+        logging.exception("Background title generation failed for conversation %s", conversation_id)
+
+def schedule_conversation_title(user_id: str, conversation_id, first_message: str) -> "Future[None]":
+    """
+    Generate the title of a new conversation in the background. When ready it
+    replaces the placeholder and is pushed to the user as a
+    `conversation_title_<user_id>` socket event.
+    """
+    return llm_gateway.submit(_title_conversation(user_id, conversation_id, first_message))
 
 # --- Summary of all content ───────────────────────────────────────────────────
-def summarize_conversation(history: List[Dict[str, str]]) -> Dict[str, Optional[str]]:
+def summarize_conversation(history: List[Dict[str, str]], previous_summary: Optional[str] = None) -> Dict[str, Optional[str]]:
+    """
+    Summarize `history`. With `previous_summary`, `history` holds only the turns
+    after it and the model extends that summary instead of re-reading everything.
+    """
     # Prompt template for summarizing the entire conversation
     summary_prompt = f"""
        Please summarize the entire conversation as a single, 
@@ -101,9 +117,20 @@ def summarize_conversation(history: List[Dict[str, str]]) -> Dict[str, Optional[
        write only a clear, clinically focused case summary in past tense.
     """
 
-    messages = [{"role": "system", "content": summary_prompt}] + history
+    messages = [{"role": "system", "content": summary_prompt}]
+    if previous_summary:
+        messages.append({
+            "role": "system",
+            "content": (
+                "Summary of the conversation so far:\n"
+                f"{previous_summary}\n\n"
+                "The messages below continue the same conversation. Return the complete, "
+                "updated summary covering both, following the instructions above."
+            )
+        })
+    messages += history
 
-    summary = call_model(PATHWAY_MODEL, messages)
+    summary = call_model(PATHWAY_MODEL, messages, priority=PRIORITY_BACKGROUND, stage="summary")
     return {
         "summary" : summary
     }
\ No newline at end of file
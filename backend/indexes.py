@@ -0,0 +1,239 @@
+from .database import get_db
+from bson import ObjectId
+from datetime import datetime
+from pymongo.errors import OperationFailure
+import argparse
+import logging
+import sys
+
+# Indexes for every query the backend runs, kept in one place and created at
+# startup (see app.py) or from the command line:
+#
+#     python -m backend.indexes            # create missing indexes
+#     python -m backend.indexes --check    # also explain the queries below and exit 1
+#                                          # if any of them scans a collection or
+#                                          # sorts in memory
+#
+# create_index is a no-op for an index that already exists with the same keys
+# and options, so this is safe to run on every start. Indexes are named
+# explicitly so a changed definition shows up as a conflict in the log instead
+# of silently creating a second index.
+#
+# List endpoints page by (sort field, _id) (see pagination.py), and messages
+# are read by (timestamp, _id) within a conversation, so those indexes end in
+# _id to serve the sort without an in-memory SORT stage.
+#
+# Indexes replaced by a longer one are listed in OBSOLETE_INDEXES and dropped
+# by ensure_indexes once their replacement exists.
+#
+# The TTL indexes of llm_rate_windows and extraction_cache are created by their
+# modules, since their expiry comes from those modules' settings.
+
+INDEXES = {
+    "users": [
+        ([("email", 1)], {}),
+        ([("google_id", 1)], {"sparse": True}),
+        ([("role", 1)], {}),
+        ([("created_at", -1), ("_id", -1)], {}),
+    ],
+    "conversations": [
+        ([("user_id", 1), ("updated_at", -1), ("_id", -1)], {}),
+        ([("updated_at", -1), ("_id", -1)], {}),
+        ([("created_at", -1)], {}),
+    ],
+    "messages": [
+        ([("conversation_id", 1), ("timestamp", 1), ("_id", 1)], {}),
+        ([("conversation_id", 1), ("id", 1)], {}),
+        ([("timestamp", 1)], {}),
+    ],
+    # One index per branch of the "notifications for this user" $or, so each
+    # branch is an index scan; read_by/hidden_by are $ne filters and cannot
+    # narrow the scan, they are applied to the matched documents.
+    "notifications": [
+        ([("target", 1), ("created_at", -1), ("_id", -1)], {}),
+        ([("user_id", 1), ("created_at", -1), ("_id", -1)], {}),
+        ([("user_ids", 1), ("created_at", -1), ("_id", -1)], {}),
+        ([("created_at", -1), ("_id", -1)], {}),
+        ([("read", 1)], {}),
+    ],
+    "analytics": [
+        ([("timestamp", -1)], {}),
+    ],
+    "costs": [
+        ([("timestamp", -1)], {}),
+    ],
+    "llm_usage": [
+        ([("timestamp", -1)], {}),
+    ],
+    "feedback": [
+        ([("conversation_id", 1), ("message_id", 1), ("user_id", 1)], {}),
+        ([("user_id", 1)], {}),
+        ([("created_at", -1)], {}),
+    ],
+    "user_prompts": [
+        ([("user_id", 1), ("is_active", 1)], {}),
+        ([("user_id", 1), ("version", -1)], {}),
+    ],
+    "reviews": [
+        ([("reviewer_id", 1), ("created_at", -1)], {}),
+        ([("conversation_id", 1), ("created_at", -1)], {}),
+    ],
+}
+
+OBSOLETE_INDEXES = {
+    "messages": ["conversation_id_1_timestamp_1"],
+}
+
+def index_name(keys):
+    """[("user_id", 1), ("updated_at", -1)] -> "user_id_1_updated_at_-1" (Mongo's default naming)"""
+    return "_".join(f"{field}_{direction}" for field, direction in keys)
+
+def ensure_indexes(collections=None, db=None):
+    """
+    Create the indexes of `collections` (all of INDEXES by default). Failures
+    are logged per index and do not stop the others. Returns
+    {"created": [...], "existing": [...], "failed": [...], "dropped": [...]}
+    of "collection.index" names.
+    """
+    db = db if db is not None else get_db()
+    result = {"created": [], "existing": [], "failed": [], "dropped": []}
+    for collection_name in collections or INDEXES:
+        collection = db[collection_name]
+        try:
+            existing = set(collection.index_information())
+        except OperationFailure:
+            existing = set()
+        for keys, options in INDEXES[collection_name]:
+            name = index_name(keys)
+            label = f"{collection_name}.{name}"
+            try:
+                collection.create_index(keys, name=name, **options)
+            except OperationFailure as e:
+                logging.error(f"Could not create index {label}: {e}")
+                result["failed"].append(label)
+                continue
+            result["existing" if name in existing else "created"].append(label)
+        failed = any(label.startswith(f"{collection_name}.") for label in result["failed"])
+        for name in OBSOLETE_INDEXES.get(collection_name, []):
+            if name not in existing or failed:
+                continue
+            try:
+                collection.drop_index(name)
+                result["dropped"].append(f"{collection_name}.{name}")
+            except OperationFailure as e:
+                logging.error(f"Could not drop obsolete index {collection_name}.{name}: {e}")
+    if result["created"]:
+        logging.info(f"Created indexes: {', '.join(result['created'])}")
+    if result["dropped"]:
+        logging.info(f"Dropped obsolete indexes: {', '.join(result['dropped'])}")
+    return result
+
+# Representative filters/sorts of the queries the routes run, used by
+# check_query_plans to catch a query that has lost (or never had) its index.
+QUERY_SHAPES = [
+    ("users", {"email": "someone@example.com"}, None),
+    ("users", {"google_id": "0"}, None),
+    ("users", {"role": {"$in": ["reviewer", "admin"]}}, None),
+    ("users", {}, [("created_at", -1), ("_id", -1)]),
+    ("conversations", {"user_id": "$oid"}, [("updated_at", -1), ("_id", -1)]),
+    ("conversations", {}, [("updated_at", -1), ("_id", -1)]),
+    ("conversations", {"created_at": {"$gte": "$date"}}, None),
+    ("messages", {"conversation_id": "$oid"}, [("timestamp", -1), ("_id", -1)]),
+    ("messages", {"conversation_id": "$oid"}, [("timestamp", 1), ("_id", 1)]),
+    ("messages", {
+        "conversation_id": "$oid",
+        "timestamp": {"$lte": "$date"},
+        "$or": [{"timestamp": {"$lt": "$date"}}, {"timestamp": "$date", "_id": {"$lt": "$oid"}}],
+    }, [("timestamp", -1), ("_id", -1)]),
+    ("messages", {"conversation_id": "$oid", "id": "0"}, None),
+    ("messages", {"timestamp": {"$gte": "$date"}}, None),
+    ("notifications", {
+        "$or": [
+            {"target": "all"},
+            {"target": "user", "user_id": "$oid"},
+            {"target": "multiple", "user_ids": "$oid"},
+        ],
+        "hidden_by": {"$ne": "$oid"},
+    }, [("created_at", -1), ("_id", -1)]),
+    ("notifications", {}, [("created_at", -1), ("_id", -1)]),
+    ("analytics", {"timestamp": {"$gte": "$date"}}, None),
+    ("costs", {"timestamp": {"$gte": "$date"}}, None),
+    ("llm_usage", {"timestamp": {"$gte": "$date"}}, None),
+    ("feedback", {"conversation_id": "$oid"}, None),
+    ("feedback", {"conversation_id": "$oid", "message_id": "0", "user_id": "$oid"}, None),
+    ("user_prompts", {"user_id": "$oid", "is_active": True}, None),
+    ("user_prompts", {"user_id": "$oid"}, [("version", -1)]),
+    ("reviews", {"reviewer_id": "$oid"}, [("created_at", -1)]),
+    ("reviews", {"conversation_id": "$oid"}, [("created_at", -1)]),
+]
+
+def _placeholders(value):
+    """Replace "$oid"/"$date" markers with real values of those types"""
+    if value == "$oid":
+        return ObjectId()
+    if value == "$date":
+        return datetime.utcnow()
+    if isinstance(value, dict):
+        return {k: _placeholders(v) for k, v in value.items()}
+    if isinstance(value, list):
+        return [_placeholders(v) for v in value]
+    return value
+
+def _plan_stages(plan):
+    """All stage names in a (possibly nested) explain plan"""
+    stages = [plan.get("stage")]
+    for key in ("inputStage", "queryPlan"):
+        if key in plan:
+            stages += _plan_stages(plan[key])
+    for child in plan.get("inputStages", []):
+        stages += _plan_stages(child)
+    return stages
+
+# Winning-plan stages that mean a query is not served by an index: a full
+# collection scan, or a blocking in-memory sort of everything it matched.
+PROBLEM_STAGES = ("COLLSCAN", "SORT")
+
+def check_query_plans(db=None):
+    """
+    Explain every query in QUERY_SHAPES and return the ones whose winning
+    plan contains a PROBLEM_STAGES stage, as
+    [{"collection", "filter", "sort", "stages", "problems"}].
+    """
+    db = db if db is not None else get_db()
+    scans = []
+    for collection_name, query_filter, sort in QUERY_SHAPES:
+        cursor = db[collection_name].find(_placeholders(query_filter))
+        if sort:
+            cursor = cursor.sort(sort)
+        plan = cursor.explain()["queryPlanner"]["winningPlan"]
+        stages = _plan_stages(plan)
+        problems = [stage for stage in PROBLEM_STAGES if stage in stages]
+        if problems:
+            scans.append({
+                "collection": collection_name,
+                "filter": query_filter,
+                "sort": sort,
+                "stages": [stage for stage in stages if stage],
+                "problems": problems
+            })
+    return scans
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    parser = argparse.ArgumentParser(description="Create the backend's MongoDB indexes")
+    parser.add_argument("--check", action="store_true", help="explain known queries and fail on collection scans or in-memory sorts")
+    args = parser.parse_args()
+
+    result = ensure_indexes()
+    print(f"created: {len(result['created'])}, existing: {len(result['existing'])}, "
+          f"dropped: {len(result['dropped'])}, failed: {len(result['failed'])}")
+    for label in result["failed"]:
+        print(f"  failed: {label}")
+
+    if args.check:
+        scans = check_query_plans()
+        for scan in scans:
+            print(f"{'+'.join(scan['problems'])} on {scan['collection']}: filter={scan['filter']} sort={scan['sort']} plan={scan['stages']}")
+        print(f"{len(QUERY_SHAPES) - len(scans)}/{len(QUERY_SHAPES)} queries use an index")
+        if scans or result["failed"]:
+            sys.exit(1)
@@ -1,10 +1,16 @@
 from ..database import get_db
 from bson import ObjectId
 from datetime import datetime, timedelta
+import math
 import time
 
-def track_response_latency(conversation_id, message_id, start_time, end_time, token_count=None):
-    """Track response latency for analytics"""
+def track_response_latency(conversation_id, message_id, start_time, end_time, token_count=None, spans=None, partial=False):
+    """
+    Track response latency for analytics. `spans` are the timed pipeline stages
+    of the turn ({"name", "start_ms", "duration_ms"}, see chat/telemetry.py);
+    they are stored as-is and summed per stage name into `stage_ms`. `partial`
+    marks answers synthesized after an extraction deadline passed.
+    """
     db = get_db()
     analytics_collection = db["analytics"]
     
@@ -15,9 +21,18 @@ def track_response_latency(conversation_id, message_id, start_time, end_time, to
         "message_id": message_id,
         "latency_ms": latency_ms,
         "token_count": token_count,
+        "partial": partial,
         "timestamp": datetime.utcnow(),
         "date": datetime.utcnow().date().isoformat()
     }
+    if spans:
+        stage_ms = {}
+        for span in spans:
+            # Mongo field names cannot contain dots; stage names never should.
+            name = span["name"].replace(".", "_")
+            stage_ms[name] = round(stage_ms.get(name, 0) + span["duration_ms"], 1)
+        analytics_data["spans"] = spans
+        analytics_data["stage_ms"] = stage_ms
     
     result = analytics_collection.insert_one(analytics_data)
     return result.inserted_id
@@ -40,6 +55,7 @@ def get_latency_stats(start_date=None, end_date=None):
                 "min_latency": {"$min": "$latency_ms"},
                 "max_latency": {"$max": "$latency_ms"},
                 "total_requests": {"$sum": 1},
+                "partial_requests": {"$sum": {"$cond": ["$partial", 1, 0]}},
                 "avg_tokens": {"$avg": "$token_count"}
             }
         }
@@ -70,32 +86,151 @@ def get_daily_latency_trends(days=30):
     
     return list(analytics_collection.aggregate(pipeline))
 
+# Pricing per 1K tokens (USD). Model IDs are matched by prefix, so dated
+# snapshots such as "gpt-4.1-mini-2025-04-14" use the "gpt-4.1-mini" row.
+# Cached prompt tokens are billed at the "cached" rate; reasoning tokens are
+# part of the completion and billed as output.
+MODEL_PRICING = {
+    "gpt-4.1-mini": {"input": 0.0004, "cached": 0.0001, "output": 0.0016},
+    "gpt-4.1-nano": {"input": 0.0001, "cached": 0.000025, "output": 0.0004},
+    "gpt-4.1": {"input": 0.002, "cached": 0.0005, "output": 0.008},
+    "gpt-4o-mini": {"input": 0.00015, "cached": 0.000075, "output": 0.0006},
+    "gpt-4o": {"input": 0.0025, "cached": 0.00125, "output": 0.01},
+    "o4-mini": {"input": 0.0011, "cached": 0.000275, "output": 0.0044},
+    "o3-mini": {"input": 0.0011, "cached": 0.00055, "output": 0.0044},
+    "gpt-4": {"input": 0.03, "cached": 0.03, "output": 0.06},
+    "gpt-3.5-turbo": {"input": 0.001, "cached": 0.001, "output": 0.002},
+}
+
+def get_model_pricing(model):
+    """Pricing row for a model ID (longest matching prefix), defaulting to gpt-4"""
+    matches = [name for name in MODEL_PRICING if model and model.startswith(name)]
+    if not matches:
+        return MODEL_PRICING["gpt-4"]
+    return MODEL_PRICING[max(matches, key=len)]
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return None
+    rank = max(math.ceil(pct / 100 * len(sorted_values)), 1)
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+# Stage percentiles are computed in Python from the turns of a bounded window:
+# the last STAGE_LATENCY_DEFAULT_DAYS unless a range is given, and at most the
+# newest STAGE_LATENCY_MAX_SAMPLES turns of it (read through the timestamp index).
+STAGE_LATENCY_DEFAULT_DAYS = 7
+STAGE_LATENCY_MAX_SAMPLES = 50000
+
+def get_stage_latency_stats(start_date=None, end_date=None, by_disease=False, percentiles=(50, 90, 95, 99)):
+    """
+    Latency percentiles per pipeline stage (and for the whole turn as "total"),
+    over the turns between `start_date` and `end_date` (by default the last
+    STAGE_LATENCY_DEFAULT_DAYS days). Per-disease extraction spans
+    (extract:<disease>) are folded into "extract:each" unless `by_disease` is set.
+    """
+    db = get_db()
+    analytics_collection = db["analytics"]
+    
+    if start_date is None:
+        start_date = (end_date or datetime.utcnow()) - timedelta(days=STAGE_LATENCY_DEFAULT_DAYS)
+    match_query = {"timestamp": {"$gte": start_date}, "stage_ms": {"$exists": True}}
+    if end_date:
+        match_query["timestamp"]["$lte"] = end_date
+    
+    cursor = (
+        analytics_collection.find(match_query, {"latency_ms": 1, "stage_ms": 1, "_id": 0})
+        .sort("timestamp", -1)
+        .limit(STAGE_LATENCY_MAX_SAMPLES)
+    )
+    samples = {"total": []}
+    for doc in cursor:
+        samples["total"].append(doc["latency_ms"])
+        per_turn = {}
+        for name, ms in doc["stage_ms"].items():
+            if not by_disease and name.startswith("extract:"):
+                # Each disease is one sample, not their sum.
+                samples.setdefault("extract:each", []).append(ms)
+                continue
+            per_turn[name] = per_turn.get(name, 0) + ms
+        for name, ms in per_turn.items():
+            samples.setdefault(name, []).append(ms)
+    
+    stats = {}
+    for name, values in samples.items():
+        if not values:
+            continue
+        values.sort()
+        stats[name] = {
+            "count": len(values),
+            "avg": round(sum(values) / len(values), 2),
+            "max": round(values[-1], 2),
+            **{f"p{p}": round(percentile(values, p), 2) for p in percentiles}
+        }
+    return stats
+
+def get_daily_stage_trends(days=30):
+    """Average milliseconds per pipeline stage per day"""
+    db = get_db()
+    analytics_collection = db["analytics"]
+    
+    start_date = datetime.utcnow() - timedelta(days=days)
+    
+    pipeline = [
+        {"$match": {"timestamp": {"$gte": start_date}, "stage_ms": {"$exists": True}}},
+        {"$project": {"date": 1, "stages": {"$objectToArray": "$stage_ms"}}},
+        {"$unwind": "$stages"},
+        {"$match": {"stages.k": {"$not": {"$regex": "^extract:"}}}},
+        {
+            "$group": {
+                "_id": {"date": "$date", "stage": "$stages.k"},
+                "avg_ms": {"$avg": "$stages.v"}
+            }
+        },
+        {"$sort": {"_id.date": 1}}
+    ]
+    
+    trends = {}
+    for row in analytics_collection.aggregate(pipeline):
+        trends.setdefault(row["_id"]["date"], {})[row["_id"]["stage"]] = round(row["avg_ms"], 2)
+    return trends
+
 def calculate_query_cost(token_count, model_type="gpt-4"):
     """Calculate cost based on token usage"""
-    # Pricing per 1K tokens (example rates)
-    pricing = {
-        "gpt-4": {"input": 0.03, "output": 0.06},
-        "gpt-3.5-turbo": {"input": 0.001, "output": 0.002}
-    }
-    
-    if model_type not in pricing:
-        model_type = "gpt-4"
+    pricing = get_model_pricing(model_type)
     
     # Assuming 50/50 split between input and output tokens
     input_tokens = token_count * 0.5
     output_tokens = token_count * 0.5
     
-    cost = (input_tokens / 1000 * pricing[model_type]["input"]) + \
-           (output_tokens / 1000 * pricing[model_type]["output"])
+    cost = (input_tokens / 1000 * pricing["input"]) + \
+           (output_tokens / 1000 * pricing["output"])
     
     return round(cost, 6)
 
-def track_query_cost(conversation_id, message_id, token_count, model_type="gpt-4"):
-    """Track query cost"""
+def calculate_call_cost(model, prompt_tokens=0, completion_tokens=0, cached_tokens=0, **_):
+    """Calculate the cost of one model call from its reported usage"""
+    pricing = get_model_pricing(model)
+    uncached = max(prompt_tokens - cached_tokens, 0)
+    cost = (uncached / 1000 * pricing["input"]) + \
+           (cached_tokens / 1000 * pricing["cached"]) + \
+           (completion_tokens / 1000 * pricing["output"])
+    return round(cost, 6)
+
+def track_query_cost(conversation_id, message_id, token_count, model_type="gpt-4", calls=None):
+    """
+    Track query cost. When `calls` (per-call usage records, see chat/telemetry.py)
+    are given, the cost and token count are the sums of the real usage.
+    """
     db = get_db()
     costs_collection = db["costs"]
     
-    cost = calculate_query_cost(token_count, model_type)
+    if calls:
+        token_count = sum(c.get("total_tokens", 0) for c in calls)
+        cost = round(sum(calculate_call_cost(**c) for c in calls), 6)
+        model_type = ",".join(sorted({c["model"] for c in calls}))
+    else:
+        cost = calculate_query_cost(token_count, model_type)
     
     cost_data = {
         "conversation_id": ObjectId(conversation_id),
@@ -110,6 +245,78 @@ def track_query_cost(conversation_id, message_id, token_count, model_type="gpt-4
     result = costs_collection.insert_one(cost_data)
     return result.inserted_id
 
+def track_llm_usage(conversation_id, message_id, calls):
+    """Store one usage record per model call, tagged with its pipeline stage"""
+    if not calls:
+        return []
+    db = get_db()
+    usage_collection = db["llm_usage"]
+    
+    now = datetime.utcnow()
+    docs = []
+    for call in calls:
+        stage = call.get("stage", "other")
+        docs.append({
+            "conversation_id": ObjectId(conversation_id) if conversation_id else None,
+            "message_id": message_id,
+            "stage": stage,
+            "stage_group": stage.split(":", 1)[0],
+            "model": call["model"],
+            "prompt_tokens": call.get("prompt_tokens", 0),
+            "completion_tokens": call.get("completion_tokens", 0),
+            "total_tokens": call.get("total_tokens", 0),
+            "cached_tokens": call.get("cached_tokens", 0),
+            "reasoning_tokens": call.get("reasoning_tokens", 0),
+            "latency_ms": call.get("latency_ms"),
+            "cancelled": call.get("cancelled", False),
+            "cost_usd": calculate_call_cost(**call),
+            "timestamp": now,
+            "date": now.date().isoformat()
+        })
+    
+    result = usage_collection.insert_many(docs)
+    return result.inserted_ids
+
+def get_usage_by_stage(start_date=None, end_date=None, by_disease=False):
+    """
+    Aggregate token usage and cost per pipeline stage and model. With
+    `by_disease`, extraction calls are split per disease (extract:<disease>).
+    """
+    db = get_db()
+    usage_collection = db["llm_usage"]
+    
+    match_query = {}
+    if start_date and end_date:
+        match_query["timestamp"] = {"$gte": start_date, "$lte": end_date}
+    
+    stage_field = "$stage" if by_disease else "$stage_group"
+    pipeline = [
+        {"$match": match_query},
+        {
+            "$group": {
+                "_id": {"stage": stage_field, "model": "$model"},
+                "calls": {"$sum": 1},
+                "prompt_tokens": {"$sum": "$prompt_tokens"},
+                "completion_tokens": {"$sum": "$completion_tokens"},
+                "cached_tokens": {"$sum": "$cached_tokens"},
+                "reasoning_tokens": {"$sum": "$reasoning_tokens"},
+                "total_tokens": {"$sum": "$total_tokens"},
+                "total_cost": {"$sum": "$cost_usd"},
+                "avg_prompt_tokens": {"$avg": "$prompt_tokens"},
+                "avg_latency": {"$avg": "$latency_ms"}
+            }
+        },
+        {"$sort": {"total_cost": -1}}
+    ]
+    
+    results = []
+    for row in usage_collection.aggregate(pipeline):
+        row["stage"] = row["_id"]["stage"]
+        row["model"] = row["_id"]["model"]
+        del row["_id"]
+        results.append(row)
+    return results
+
 def get_cost_analytics(start_date=None, end_date=None):
     """Get cost analytics"""
     db = get_db()
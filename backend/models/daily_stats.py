@@ -0,0 +1,89 @@
+from ..database import get_db
+from datetime import datetime
+import argparse
+import logging
+
+# Per-day counters for the admin dashboard, one small document per UTC day:
+#     {_id: "YYYY-MM-DD", users: n, conversations: n, messages: n}
+# kept current with $inc upserts where users, conversations and messages are
+# created, so the dashboard reads at most 90 documents however much history
+# there is.
+#
+# The counters only cover creations seen since they were introduced, and
+# deletes do not decrement them. `python -m backend.models.daily_stats`
+# rebuilds them from the raw collections and marks the rollup complete; until
+# then the dashboard keeps aggregating the raw data (see models/dashboard.py).
+
+METRICS = ("users", "conversations", "messages")
+META_ID = "meta"
+
+def _day(when):
+    return when.strftime("%Y-%m-%d")
+
+def increment_daily_stat(metric, when=None, amount=1):
+    """Add `amount` to today's (or `when`'s) `metric` counter. Never raises"""
+    try:
+        get_db()["daily_stats"].update_one(
+            {"_id": _day(when or datetime.utcnow())},
+            {"$inc": {metric: amount}},
+            upsert=True
+        )
+    except Exception as e:
+        logging.error(f"Daily stats update error ({metric}): {e}")
+
+def daily_stats_ready(db=None):
+    """True once the counters have been rebuilt from history"""
+    db = db if db is not None else get_db()
+    return db["daily_stats"].find_one({"_id": META_ID}, {"_id": 1}) is not None
+
+def get_daily_stats(since, db=None):
+    """{metric: {"YYYY-MM-DD": count}} for each day from `since`"""
+    db = db if db is not None else get_db()
+    stats = {metric: {} for metric in METRICS}
+    for doc in db["daily_stats"].find({"_id": {"$gte": _day(since), "$ne": META_ID}}):
+        for metric in METRICS:
+            if doc.get(metric):
+                stats[metric][doc["_id"]] = doc[metric]
+    return stats
+
+def rebuild_daily_stats(db=None):
+    """
+    Recompute every day's counters from the users, conversations and messages
+    collections and mark the rollup complete. Creations that land while this
+    runs may be counted twice or missed for the current day; re-run to settle.
+    """
+    from .dashboard import daily_counts
+    from .message import get_daily_message_counts
+
+    db = db if db is not None else get_db()
+    beginning = datetime(1970, 1, 2)
+    counts = {
+        "users": daily_counts(db["users"], "created_at", beginning, epoch_seconds=True),
+        "conversations": daily_counts(db["conversations"], "created_at", beginning),
+        "messages": get_daily_message_counts(beginning, db=db),
+    }
+
+    days = set()
+    for per_day in counts.values():
+        days.update(per_day)
+    collection = db["daily_stats"]
+    for day in sorted(days):
+        collection.update_one(
+            {"_id": day},
+            {"$set": {metric: counts[metric].get(day, 0) for metric in METRICS}},
+            upsert=True
+        )
+    # Days that no longer have any data
+    collection.delete_many({"_id": {"$nin": sorted(days) + [META_ID]}})
+    collection.update_one(
+        {"_id": META_ID},
+        {"$set": {"rebuilt_at": datetime.utcnow()}},
+        upsert=True
+    )
+    return {"days": len(days), **{metric: sum(counts[metric].values()) for metric in METRICS}}
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    parser = argparse.ArgumentParser(description="Rebuild the daily_stats dashboard counters from history")
+    parser.parse_args()
+    print(rebuild_daily_stats())
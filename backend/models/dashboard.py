@@ -0,0 +1,80 @@
+from ..database import get_db
+from .message import count_messages_since, get_daily_message_counts
+from .daily_stats import daily_stats_ready, get_daily_stats
+from datetime import datetime, timedelta
+
+# Admin dashboard statistics. Per-day counts come from the daily_stats rollup
+# (see daily_stats.py) once it has been rebuilt; before that each collection
+# is grouped by day in Mongo (one aggregation over the last GROWTH_DAYS,
+# served by the created_at / timestamp indexes). The today/week/month/90-day
+# counts are sums over those daily buckets, and all-time totals come from
+# collection metadata. No message bodies are ever sent to the app.
+
+GROWTH_DAYS = 90
+
+def _day(date):
+    return date.strftime("%Y-%m-%d")
+
+def daily_counts(collection, field, since, epoch_seconds=False):
+    """
+    {"YYYY-MM-DD": count} of documents per UTC day of `field`, for `field` >= `since`.
+    `epoch_seconds` is for fields stored as Unix timestamps (users.created_at).
+    """
+    date = {"$toDate": {"$multiply": [f"${field}", 1000]}} if epoch_seconds else f"${field}"
+    rows = collection.aggregate([
+        {"$match": {field: {"$gte": since.timestamp() if epoch_seconds else since}}},
+        {"$group": {
+            "_id": {"$dateToString": {"format": "%Y-%m-%d", "date": date}},
+            "count": {"$sum": 1}
+        }}
+    ])
+    return {row["_id"]: row["count"] for row in rows}
+
+def summarize_daily(daily, total, today):
+    """Dashboard block (window counts + growth series) from daily counts"""
+    def since(days):
+        start = _day(today - timedelta(days=days))
+        return sum(count for day, count in daily.items() if day >= start)
+
+    growth = []
+    for i in reversed(range(GROWTH_DAYS)):
+        date_str = _day(today - timedelta(days=i))
+        growth.append({"date": date_str, "count": daily.get(date_str, 0)})
+
+    return {
+        "total": total,
+        "today": since(0),
+        "week": since(7),
+        "month": since(30),
+        "ninety_days": since(90),
+        "growth": growth
+    }
+
+def get_dashboard_stats(db=None, now=None):
+    """Statistics shown on the admin dashboard"""
+    db = db if db is not None else get_db()
+    today = (now or datetime.utcnow()).replace(hour=0, minute=0, second=0, microsecond=0)
+    start = today - timedelta(days=90)
+
+    users = db["users"]
+    conversations = db["conversations"]
+    notifications = db["notifications"]
+
+    if daily_stats_ready(db):
+        daily = get_daily_stats(start, db=db)
+    else:
+        daily = {
+            "users": daily_counts(users, "created_at", start, epoch_seconds=True),
+            "conversations": daily_counts(conversations, "created_at", start),
+            "messages": get_daily_message_counts(start, db=db),
+        }
+
+    return {
+        "users": summarize_daily(daily["users"], users.estimated_document_count(), today),
+        "conversations": summarize_daily(daily["conversations"], conversations.estimated_document_count(), today),
+        "messages": summarize_daily(daily["messages"], count_messages_since(db=db), today),
+        "notifications": {
+            "total": notifications.estimated_document_count(),
+            "unread": notifications.count_documents({"read": False})
+        }
+    }
@@ -0,0 +1,359 @@
+from ..database import get_db
+from ..indexes import ensure_indexes
+from .daily_stats import increment_daily_stat
+from bson import ObjectId
+from pymongo import ReturnDocument
+from datetime import datetime
+import argparse
+import logging
+
+# Chat messages live in their own collection, one document per message:
+#     {conversation_id, id, sender, text, timestamp, sources?, partial?}
+# indexed by (conversation_id, timestamp, _id). The conversation keeps a `version`
+# counter that every added message increments, so clients can tell whether
+# their copy is current, and a `message_count` so list views never have to
+# count messages. `message_count` is only maintained on conversations that
+# have one (new and migrated conversations; `--backfill-counts` adds it to the
+# rest); readers fall back to counting the messages for the others.
+#
+# Conversations created before the move still embed a `messages` array; they
+# are marked `messages_migrated: True` once `python -m backend.models.message`
+# has copied their messages over.
+# Readers use the functions below, which combine both stores until then.
+
+MESSAGE_FIELDS = ("id", "sender", "text", "timestamp", "sources", "partial")
+
+# Fields needed when a reader only wants the conversation, not its messages
+CONVERSATION_PROJECTION = {"messages": 0}
+
+# Fields of conversation list views (no messages, memory or summary)
+CONVERSATION_LIST_PROJECTION = {
+    "user_id": 1, "title": 1, "created_at": 1, "updated_at": 1,
+    "message_count": 1, "messages_migrated": 1
+}
+
+# Page size bounds for paginated message loading
+DEFAULT_MESSAGE_PAGE = 50
+MAX_MESSAGE_PAGE = 200
+
+def ensure_message_indexes():
+    """Create the indexes of the messages collection (idempotent, see indexes.py)"""
+    return ensure_indexes(["messages"])
+
+def _to_message(doc):
+    """Message document -> the shape messages always had inside conversations"""
+    return {field: doc[field] for field in MESSAGE_FIELDS if field in doc}
+
+def add_message(conversation_id, sender, text, message_id=None, **fields):
+    """
+    Store a message, bump the conversation's updated_at, its `version` and
+    (when present) its `message_count`. Returns the message and the
+    conversation's new version.
+    """
+    db = get_db()
+    now = datetime.utcnow()
+    message = {
+        "id": message_id or str(ObjectId()),
+        "sender": sender,
+        "text": text,
+        "timestamp": now,
+        **fields
+    }
+    db["messages"].insert_one({"conversation_id": ObjectId(conversation_id), **message})
+    conversation = db["conversations"].find_one_and_update(
+        {"_id": ObjectId(conversation_id)},
+        [{"$set": {
+            "updated_at": now,
+            "version": {"$add": [{"$ifNull": ["$version", 0]}, 1]},
+            # Left absent on conversations whose count was never initialised
+            "message_count": {"$cond": [
+                {"$eq": [{"$type": "$message_count"}, "missing"]},
+                "$$REMOVE",
+                {"$add": ["$message_count", 1]}
+            ]}
+        }}],
+        projection={"version": 1},
+        return_document=ReturnDocument.AFTER
+    )
+    increment_daily_stat("messages", now)
+    return message, (conversation or {}).get("version")
+
+def _legacy_messages(conversation):
+    """Embedded messages of a conversation that has not been migrated yet"""
+    if conversation.get("messages_migrated"):
+        return []
+    if "messages" in conversation:
+        return conversation.get("messages") or []
+    doc = get_db()["conversations"].find_one({"_id": conversation["_id"]}, {"messages": 1})
+    return (doc or {}).get("messages") or []
+
+def get_messages(conversation, limit=None):
+    """
+    Messages of `conversation` (a conversation document, ideally loaded with
+    CONVERSATION_PROJECTION) in chronological order; only the last `limit`
+    when given.
+    """
+    db = get_db()
+    cursor = db["messages"].find(
+        {"conversation_id": conversation["_id"]},
+        {"_id": 0, "conversation_id": 0}
+    )
+    if limit:
+        stored = list(cursor.sort([("timestamp", -1), ("_id", -1)]).limit(limit))
+        stored.reverse()
+    else:
+        stored = list(cursor.sort([("timestamp", 1), ("_id", 1)]))
+
+    messages = _legacy_messages(conversation) + [_to_message(doc) for doc in stored]
+    return messages[-limit:] if limit else messages
+
+def get_message_page(conversation, before=None, limit=DEFAULT_MESSAGE_PAGE):
+    """
+    Up to `limit` messages of `conversation` older than the message with id
+    `before` (the latest ones when `before` is None), oldest first. Returns
+    (messages, has_more). Raises ValueError if `before` is not in the conversation.
+    """
+    db = get_db()
+    legacy = _legacy_messages(conversation)
+    query = {"conversation_id": conversation["_id"]}
+    if before:
+        anchor = db["messages"].find_one(
+            {"conversation_id": conversation["_id"], "id": before},
+            {"timestamp": 1}
+        )
+        if anchor:
+            # The $lte bound keeps both branches on one range of the
+            # (conversation_id, timestamp, _id) index
+            query["timestamp"] = {"$lte": anchor["timestamp"]}
+            query["$or"] = [
+                {"timestamp": {"$lt": anchor["timestamp"]}},
+                {"timestamp": anchor["timestamp"], "_id": {"$lt": anchor["_id"]}}
+            ]
+        else:
+            # Embedded messages are all older than the stored ones
+            ids = [msg.get("id") for msg in legacy]
+            if before not in ids:
+                raise ValueError(f"Message {before} not found")
+            legacy = legacy[:ids.index(before)]
+            return legacy[-limit:], len(legacy) > limit
+
+    stored = list(
+        db["messages"].find(query, {"conversation_id": 0})
+        .sort([("timestamp", -1), ("_id", -1)])
+        .limit(limit + 1)
+    )
+    if len(stored) > limit:
+        page = [_to_message(doc) for doc in reversed(stored[:limit])]
+        return page, True
+
+    page = [_to_message(doc) for doc in reversed(stored)]
+    needed = limit - len(page)
+    older = legacy[-needed:] if needed else []
+    return older + page, len(legacy) > len(older)
+
+def get_messages_after(conversation, after=None):
+    """
+    Messages of `conversation` newer than the message with id `after` (all of
+    them when None), oldest first. Raises ValueError if `after` is not in the
+    conversation.
+    """
+    if not after:
+        return get_messages(conversation)
+    db = get_db()
+    anchor = db["messages"].find_one(
+        {"conversation_id": conversation["_id"], "id": after},
+        {"timestamp": 1}
+    )
+    query = {"conversation_id": conversation["_id"]}
+    if anchor:
+        query["timestamp"] = {"$gte": anchor["timestamp"]}
+        query["$or"] = [
+            {"timestamp": {"$gt": anchor["timestamp"]}},
+            {"timestamp": anchor["timestamp"], "_id": {"$gt": anchor["_id"]}}
+        ]
+        newer = []
+    else:
+        # Embedded messages are all older than the stored ones
+        legacy = _legacy_messages(conversation)
+        ids = [msg.get("id") for msg in legacy]
+        if after not in ids:
+            raise ValueError(f"Message {after} not found")
+        newer = legacy[ids.index(after) + 1:]
+
+    stored = db["messages"].find(query, {"conversation_id": 0}).sort([("timestamp", 1), ("_id", 1)])
+    return newer + [_to_message(doc) for doc in stored]
+
+def count_messages(conversation_ids):
+    """Number of messages per conversation id, for many conversations at once"""
+    db = get_db()
+    ids = [ObjectId(cid) for cid in conversation_ids]
+    counts = {cid: 0 for cid in ids}
+    if not ids:
+        return counts
+
+    for row in db["messages"].aggregate([
+        {"$match": {"conversation_id": {"$in": ids}}},
+        {"$group": {"_id": "$conversation_id", "count": {"$sum": 1}}}
+    ]):
+        counts[row["_id"]] += row["count"]
+
+    # Conversations that still embed their messages
+    for row in db["conversations"].aggregate([
+        {"$match": {"_id": {"$in": ids}, "messages_migrated": {"$ne": True}}},
+        {"$project": {"count": {"$size": {"$ifNull": ["$messages", []]}}}}
+    ]):
+        counts[row["_id"]] += row["count"]
+    return counts
+
+def message_counts_for(conversations):
+    """
+    {conversation _id: message count} for conversation documents loaded with
+    CONVERSATION_LIST_PROJECTION (or any projection keeping message_count and
+    messages_migrated). Maintained counts are used as is; only conversations
+    without one are counted.
+    """
+    counts, uncounted = {}, []
+    for conv in conversations:
+        if conv.get("messages_migrated") and "message_count" in conv:
+            counts[conv["_id"]] = conv["message_count"]
+        else:
+            uncounted.append(conv["_id"])
+    counts.update(count_messages(uncounted))
+    return counts
+
+def count_messages_since(since=None, db=None):
+    """Number of messages (in both stores) with a timestamp at or after `since`"""
+    db = db if db is not None else get_db()
+    if since is None:
+        # All messages: collection metadata plus the sizes of embedded arrays,
+        # summed server-side without unwinding them
+        total = db["messages"].estimated_document_count()
+        legacy = list(db["conversations"].aggregate([
+            {"$match": {"messages_migrated": {"$ne": True}, "messages.0": {"$exists": True}}},
+            {"$group": {"_id": None, "count": {"$sum": {"$size": "$messages"}}}}
+        ]))
+        return total + (legacy[0]["count"] if legacy else 0)
+
+    total = db["messages"].count_documents({"timestamp": {"$gte": since}})
+    legacy = list(db["conversations"].aggregate([
+        {"$match": {"messages_migrated": {"$ne": True}, "messages.timestamp": {"$gte": since}}},
+        {"$unwind": "$messages"},
+        {"$match": {"messages.timestamp": {"$gte": since}}},
+        {"$count": "count"}
+    ]))
+    return total + (legacy[0]["count"] if legacy else 0)
+
+def get_daily_message_counts(since, db=None):
+    """{"YYYY-MM-DD": count} of messages per day since `since`"""
+    db = db if db is not None else get_db()
+    counts = {}
+
+    def add(rows):
+        for row in rows:
+            counts[row["_id"]] = counts.get(row["_id"], 0) + row["count"]
+
+    group = {
+        "$group": {
+            "_id": {"$dateToString": {"format": "%Y-%m-%d", "date": "$timestamp"}},
+            "count": {"$sum": 1}
+        }
+    }
+    add(db["messages"].aggregate([
+        {"$match": {"timestamp": {"$gte": since}}},
+        group
+    ]))
+    add(db["conversations"].aggregate([
+        {"$match": {"messages_migrated": {"$ne": True}, "messages.timestamp": {"$gte": since}}},
+        {"$project": {"messages.timestamp": 1}},
+        {"$unwind": "$messages"},
+        {"$replaceRoot": {"newRoot": "$messages"}},
+        {"$match": {"timestamp": {"$gte": since}}},
+        group
+    ]))
+    return counts
+
+def delete_conversation_messages(conversation_id):
+    """Delete all stored messages of a conversation"""
+    result = get_db()["messages"].delete_many({"conversation_id": ObjectId(conversation_id)})
+    return result.deleted_count
+
+def migrate_embedded_messages(batch_size=100, dry_run=False):
+    """
+    Copy embedded `conversations.messages` arrays into the messages collection,
+    then drop the arrays and mark the conversations migrated. Safe to re-run:
+    messages are upserted by (conversation_id, id).
+    """
+    db = get_db()
+    conversations = db["conversations"]
+    messages_collection = db["messages"]
+    ensure_message_indexes()
+
+    migrated = moved = 0
+    query = {"messages_migrated": {"$ne": True}}
+    while True:
+        batch = list(conversations.find(query, {"messages": 1}).limit(batch_size))
+        if not batch:
+            break
+        for conv in batch:
+            embedded = conv.get("messages") or []
+            for msg in embedded:
+                if "id" not in msg:
+                    msg["id"] = str(ObjectId())
+            if not dry_run:
+                for msg in embedded:
+                    messages_collection.update_one(
+                        {"conversation_id": conv["_id"], "id": msg["id"]},
+                        {"$setOnInsert": {"conversation_id": conv["_id"], **_to_message(msg)}},
+                        upsert=True
+                    )
+                conversations.update_one(
+                    {"_id": conv["_id"]},
+                    {
+                        "$set": {
+                            "messages_migrated": True,
+                            "message_count": messages_collection.count_documents({"conversation_id": conv["_id"]})
+                        },
+                        "$unset": {"messages": ""}
+                    }
+                )
+            migrated += 1
+            moved += len(embedded)
+        if dry_run:
+            break
+        logging.info("Migrated %d conversations (%d messages)", migrated, moved)
+    return {"conversations": migrated, "messages": moved}
+
+def backfill_message_counts(batch_size=500):
+    """
+    Set `message_count` on migrated conversations that do not have one yet
+    (created before counts were maintained). A message added while a
+    conversation is being counted can be missed; re-run to settle.
+    """
+    db = get_db()
+    conversations = db["conversations"]
+    filled = 0
+    query = {"messages_migrated": True, "message_count": {"$exists": False}}
+    while True:
+        batch = [conv["_id"] for conv in conversations.find(query, {"_id": 1}).limit(batch_size)]
+        if not batch:
+            break
+        counts = count_messages(batch)
+        for conversation_id in batch:
+            conversations.update_one(
+                {"_id": conversation_id, "message_count": {"$exists": False}},
+                {"$set": {"message_count": counts.get(conversation_id, 0)}}
+            )
+        filled += len(batch)
+        logging.info("Backfilled message counts of %d conversations", filled)
+    return {"conversations": filled}
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    parser = argparse.ArgumentParser(description="Move embedded conversation messages into the messages collection")
+    parser.add_argument("--batch-size", type=int, default=100)
+    parser.add_argument("--dry-run", action="store_true", help="report the first batch without writing")
+    parser.add_argument("--backfill-counts", action="store_true", help="also set message_count where it is missing")
+    args = parser.parse_args()
+    print(migrate_embedded_messages(args.batch_size, args.dry_run))
+    if args.backfill_counts and not args.dry_run:
+        print(backfill_message_counts(args.batch_size))
@@ -1,21 +1,16 @@
 from ..database import get_db
 from bson import ObjectId
+from ..user_loader import display_name, load_user
 from datetime import datetime
 
 def create_review_comment(reviewer_id, conversation_id, message_id, comment, rating=None):
     """Create a review comment for a specific message"""
     db = get_db()
     reviews_collection = db["reviews"]
-    users_collection = db["users"]
-    
-    # Get reviewer info to store name
-    reviewer = users_collection.find_one({"_id": ObjectId(reviewer_id)})
-    reviewer_name = reviewer.get("name", "") if reviewer else ""
-    reviewer_email = reviewer.get("email", "") if reviewer else ""
     
     review = {
         "reviewer_id": ObjectId(reviewer_id),
-        "reviewer_name": reviewer_name or reviewer_email,  # Store reviewer name or email
+        "reviewer_name": display_name(load_user(reviewer_id)),  # Store reviewer name or email
         "conversation_id": ObjectId(conversation_id),
         "message_id": message_id,
         "comment": comment,
@@ -64,10 +59,17 @@ def get_reviews_by_conversation(conversation_id):
 
 def get_reviewer_activity(reviewer_id, start_date=None, end_date=None):
     """Get activity logs for a specific reviewer"""
+    activity = get_reviewers_activity([reviewer_id], start_date, end_date)
+    for item in activity:
+        item.pop("reviewer_id", None)
+    return activity
+
+def get_reviewers_activity(reviewer_ids, start_date=None, end_date=None):
+    """Get activity logs of several reviewers in one aggregation (newest first)"""
     db = get_db()
     reviews_collection = db["reviews"]
     
-    match_query = {"reviewer_id": ObjectId(reviewer_id)}
+    match_query = {"reviewer_id": {"$in": [ObjectId(reviewer_id) for reviewer_id in reviewer_ids]}}
     if start_date and end_date:
         match_query["created_at"] = {"$gte": start_date, "$lte": end_date}
     
@@ -87,6 +89,7 @@ def get_reviewer_activity(reviewer_id, start_date=None, end_date=None):
                 "comment": 1,
                 "rating": 1,
                 "created_at": 1,
+                "reviewer_id": 1,
                 "reviewer_name": 1,
                 "conversation.title": 1,
                 "conversation.user_id": 1
@@ -1,6 +1,7 @@
 import bcrypt
 from ..database import get_db
 from bson import ObjectId
+from .daily_stats import increment_daily_stat
 import time
 
 
@@ -20,6 +21,7 @@ def create_user(email, password,name):
         "updated_at": int(time.time()),
     }
     result = users_collection.insert_one(user)
+    increment_daily_stat("users")
     return result.inserted_id
 
 
@@ -42,6 +44,7 @@ def create_google_user(email, google_id, name=None, picture=None):
 
     # Insert the user
     result = users_collection.insert_one(user_data)
+    increment_daily_stat("users")
 
     # Return the created user
     return users_collection.find_one({"_id": result.inserted_id})
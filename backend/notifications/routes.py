@@ -4,6 +4,7 @@ from bson import ObjectId
 from ..auth.utils import verify_token
 from ..database import get_db
 from ..socketio_instance import socketio
+from ..pagination import list_page
 import logging
 
 notifications_bp = Blueprint("notifications", __name__)
@@ -37,8 +38,6 @@ def get_user_notifications():
         return jsonify({"error": "Invalid or expired token"}), 403
 
     try:
-        page = int(request.args.get("page", 1))
-        limit = int(request.args.get("limit", 20))
         unread_only = request.args.get("unread_only", "false").lower() == "true"
 
         db = get_db()
@@ -56,14 +55,10 @@ def get_user_notifications():
         if unread_only:
             query["read_by"] = {"$ne": ObjectId(user_id)}
 
-        total = notifications.count_documents(query)
+        # ?cursor= keyset paging, see pagination.py
+        notif_list, pagination = list_page(notifications, query, "created_at", request.args)
         unread_count = get_unread_count(user_id, db)
 
-        skip = (page - 1) * limit
-        notif_list = list(
-            notifications.find(query).sort("created_at", -1).skip(skip).limit(limit)
-        )
-
         for notif in notif_list:
             notif["_id"] = str(notif["_id"])
             notif["created_by"] = str(notif.get("created_by", ""))
@@ -78,12 +73,12 @@ def get_user_notifications():
         return jsonify(
             {
                 "notifications": notif_list,
-                "total": total,
                 "unread_count": unread_count,
-                "page": page,
-                "pages": (total + limit - 1) // limit,
+                **pagination,
             }
         )
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
     except Exception as e:
         logging.error(f"Get user notifications error: {e}")
         return jsonify({"error": "Failed to fetch notifications"}), 500
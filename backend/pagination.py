@@ -0,0 +1,153 @@
+from bson import ObjectId
+from datetime import datetime
+import base64
+import json
+import os
+import threading
+import time
+
+# Keyset ("cursor") pagination for list endpoints sorted newest first.
+#
+# A page is fetched with find(query + "after the cursor").sort([(field, -1),
+# ("_id", -1)]).limit(limit + 1), which is an index range scan however deep
+# the page is, instead of .skip() walking and discarding every earlier
+# document. The cursor is an opaque token holding the sort value and _id of
+# the last document of the previous page.
+#
+# Totals are a separate, optional cost. `?total=` picks how they are computed:
+#     cached    (default) exact count, reused for PAGINATION_COUNT_TTL seconds
+#     exact     count_documents on every request
+#     estimated collection metadata count for unfiltered lists (cached count
+#               when the list is filtered)
+#     none      no total at all
+
+PAGINATION_COUNT_TTL = int(os.getenv("PAGINATION_COUNT_TTL", "60"))
+TOTAL_MODES = ("cached", "exact", "estimated", "none")
+
+def _encode_value(value):
+    if isinstance(value, datetime):
+        return {"$date": value.isoformat()}
+    if isinstance(value, ObjectId):
+        return {"$oid": str(value)}
+    return value
+
+def _decode_value(value):
+    if isinstance(value, dict) and "$date" in value:
+        return datetime.fromisoformat(value["$date"])
+    if isinstance(value, dict) and "$oid" in value:
+        return ObjectId(value["$oid"])
+    return value
+
+def encode_cursor(doc, sort_field):
+    """Opaque cursor pointing just after `doc` in a list sorted by `sort_field`"""
+    payload = json.dumps({"v": _encode_value(doc.get(sort_field)), "id": str(doc["_id"])})
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+def decode_cursor(cursor):
+    """(sort value, _id) of a cursor from encode_cursor. Raises ValueError if malformed"""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        return _decode_value(payload["v"]), ObjectId(payload["id"])
+    except Exception:
+        raise ValueError("Invalid cursor")
+
+def after_cursor(query, sort_field, cursor):
+    """`query` restricted to documents after `cursor` in (sort_field, _id) descending order"""
+    value, last_id = decode_cursor(cursor)
+    if value is None:
+        # Documents without the sort field sort last; page through them by _id
+        position = {sort_field: None, "_id": {"$lt": last_id}}
+    else:
+        position = {"$or": [
+            {sort_field: {"$lt": value}},
+            {sort_field: value, "_id": {"$lt": last_id}},
+            {sort_field: None},
+        ]}
+    return {"$and": [query, position]} if query else position
+
+def fetch_page(collection, query, sort_field, limit, cursor=None, projection=None):
+    """
+    One page of `collection` matching `query`, newest `sort_field` first,
+    starting after `cursor`. Returns (documents, next_cursor); next_cursor is
+    None on the last page.
+    """
+    if cursor:
+        query = after_cursor(query, sort_field, cursor)
+    docs = list(
+        collection.find(query, projection)
+        .sort([(sort_field, -1), ("_id", -1)])
+        .limit(limit + 1)
+    )
+    if len(docs) > limit:
+        docs = docs[:limit]
+        return docs, encode_cursor(docs[-1], sort_field)
+    return docs, None
+
+_count_cache = {}
+_count_lock = threading.Lock()
+
+def count_total(collection, query, mode="cached"):
+    """Total matching documents according to `mode` (see TOTAL_MODES); None for "none" """
+    if mode == "none":
+        return None
+    if mode == "estimated" and not query:
+        return collection.estimated_document_count()
+    if mode == "exact":
+        return collection.count_documents(query)
+
+    key = (collection.name, json.dumps(query, default=str, sort_keys=True))
+    now = time.monotonic()
+    with _count_lock:
+        cached = _count_cache.get(key)
+        if cached and cached[1] > now:
+            return cached[0]
+    total = collection.count_documents(query)
+    with _count_lock:
+        if len(_count_cache) > 1000:
+            _count_cache.clear()
+        _count_cache[key] = (total, now + PAGINATION_COUNT_TTL)
+    return total
+
+def page_args(args, default_limit=20, max_limit=100):
+    """
+    (limit, cursor, page, total_mode) from request args. `page` is only kept
+    for clients that still ask for page N > 1 without a cursor.
+    Raises ValueError on bad values.
+    """
+    limit = min(max(int(args.get("limit", default_limit)), 1), max_limit)
+    page = max(int(args.get("page", 1)), 1)
+    cursor = args.get("cursor") or None
+    total_mode = args.get("total", "cached")
+    if total_mode not in TOTAL_MODES:
+        raise ValueError(f"total must be one of {', '.join(TOTAL_MODES)}")
+    if cursor:
+        decode_cursor(cursor)
+    return limit, cursor, page, total_mode
+
+def list_page(collection, query, sort_field, args, projection=None, default_limit=20):
+    """
+    Page of `collection` for a list endpoint's request `args`: keyset paging
+    with ?cursor=, or legacy ?page=N (skip) when no cursor is given.
+    Returns (documents, pagination fields for the response).
+    """
+    limit, cursor, page, total_mode = page_args(args, default_limit)
+    if cursor or page == 1:
+        docs, next_cursor = fetch_page(collection, query, sort_field, limit, cursor, projection)
+    else:
+        docs = list(
+            collection.find(query, projection)
+            .sort([(sort_field, -1), ("_id", -1)])
+            .skip((page - 1) * limit)
+            .limit(limit + 1)
+        )
+        next_cursor = encode_cursor(docs[limit - 1], sort_field) if len(docs) > limit else None
+        docs = docs[:limit]
+
+    total = count_total(collection, query, total_mode)
+    return docs, {
+        "total": total,
+        "page": page,
+        "pages": (total + limit - 1) // limit if total is not None else None,
+        "next_cursor": next_cursor,
+    }
@@ -0,0 +1,137 @@
+from dotenv import load_dotenv
+import logging
+import os
+import threading
+import time
+
+# In-process stale-while-revalidate cache for expensive, frequently polled
+# responses (the admin and analytics dashboards).
+#
+# A value younger than RESPONSE_CACHE_TTL is served as is. An older one (up to
+# RESPONSE_CACHE_MAX_STALE) is still served immediately while a single
+# background thread recomputes it. Without a usable value the caller computes
+# it, and concurrent callers for the same key wait for that one computation
+# instead of starting their own (singleflight). So N open dashboards cost one
+# recomputation per TTL per worker process, not N.
+#
+# Each cache counts hits, stale hits, misses, coalesced waits and refreshes;
+# get_cache_stats() exposes them (GET /analytics/cache).
+
+load_dotenv()
+
+RESPONSE_CACHE = os.getenv("RESPONSE_CACHE", "true").lower() == "true"
+RESPONSE_CACHE_TTL = float(os.getenv("RESPONSE_CACHE_TTL", "30"))
+RESPONSE_CACHE_MAX_STALE = float(os.getenv("RESPONSE_CACHE_MAX_STALE", "600"))
+
+class _Flight:
+    """One in-progress computation of a key that other callers can wait on"""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.error = None
+
+class ResponseCache:
+    def __init__(self, name, ttl=RESPONSE_CACHE_TTL, max_stale=RESPONSE_CACHE_MAX_STALE):
+        self.name = name
+        self.ttl = ttl
+        self.max_stale = max(max_stale, ttl)
+        self._entries = {}   # key -> (value, computed_at)
+        self._flights = {}   # key -> _Flight
+        self._lock = threading.Lock()
+        self.stats = {
+            "hits": 0, "stale_hits": 0, "misses": 0, "coalesced": 0,
+            "refreshes": 0, "refresh_errors": 0,
+        }
+
+    def get(self, key, compute):
+        """
+        Cached value of `key`, computing it with `compute()` when needed.
+        Returns (value, status) where status is "hit", "stale" or "miss".
+        """
+        if not RESPONSE_CACHE:
+            return compute(), "miss"
+
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and now - entry[1] < self.ttl:
+                self.stats["hits"] += 1
+                return entry[0], "hit"
+            if entry and now - entry[1] < self.max_stale:
+                self.stats["stale_hits"] += 1
+                if key not in self._flights:
+                    flight = self._flights[key] = _Flight()
+                    threading.Thread(
+                        target=self._refresh, args=(key, compute, flight),
+                        name=f"cache-refresh-{self.name}", daemon=True
+                    ).start()
+                return entry[0], "stale"
+
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = _Flight()
+                self.stats["misses"] += 1
+            else:
+                self.stats["coalesced"] += 1
+
+        if leader:
+            self._refresh(key, compute, flight)
+        else:
+            flight.done.wait()
+        if flight.error is not None:
+            raise flight.error
+        return flight.value, "miss"
+
+    def _refresh(self, key, compute, flight):
+        try:
+            flight.value = compute()
+            with self._lock:
+                self._entries[key] = (flight.value, time.monotonic())
+                self.stats["refreshes"] += 1
+        except Exception as e:
+            flight.error = e
+            with self._lock:
+                self.stats["refresh_errors"] += 1
+            logging.error(f"Refreshing cached {self.name} response failed: {e}")
+        finally:
+            with self._lock:
+                self._flights.pop(key, None)
+            flight.done.set()
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def get_stats(self):
+        with self._lock:
+            served = self.stats["hits"] + self.stats["stale_hits"] + self.stats["misses"] + self.stats["coalesced"]
+            return {
+                **self.stats,
+                "entries": len(self._entries),
+                "hit_ratio": round((self.stats["hits"] + self.stats["stale_hits"]) / served, 3) if served else None,
+                "ttl": self.ttl,
+                "max_stale": self.max_stale,
+            }
+
+_caches = {}
+_caches_lock = threading.Lock()
+
+def get_cache(name):
+    """The process-wide cache called `name`, created on first use"""
+    with _caches_lock:
+        cache = _caches.get(name)
+        if cache is None:
+            cache = _caches[name] = ResponseCache(name)
+        return cache
+
+def cache_key(endpoint, params):
+    """Key for `endpoint` with the request parameters that affect its response"""
+    return (endpoint,) + tuple(sorted((k, str(v)) for k, v in params.items()))
+
+def get_cache_stats():
+    """Hit/miss counters per cache"""
+    with _caches_lock:
+        caches = list(_caches.values())
+    return {cache.name: cache.get_stats() for cache in caches}
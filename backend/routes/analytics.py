@@ -5,8 +5,11 @@ from ..auth.utils import verify_token
 from ..database import get_db
 from ..models.analytics import (
     get_latency_stats, get_daily_latency_trends, 
-    get_cost_analytics, track_response_latency, track_query_cost
+    get_cost_analytics, track_response_latency, track_query_cost,
+    get_usage_by_stage, get_stage_latency_stats, get_daily_stage_trends
 )
+from ..chat.classifier import get_metrics as get_classifier_metrics
+from ..response_cache import cache_key, get_cache, get_cache_stats
 import logging
 
 analytics_bp = Blueprint("analytics", __name__)
@@ -53,6 +56,8 @@ def get_latency_analytics(user_id):
         if end_date:
             end_dt = datetime.fromisoformat(end_date)
         
+        by_disease = request.args.get("by_disease", "false").lower() == "true"
+        
         stats = get_latency_stats(start_dt, end_dt)
         
         if stats:
@@ -62,7 +67,10 @@ def get_latency_analytics(user_id):
             if stats["avg_tokens"]:
                 stats["avg_tokens"] = round(stats["avg_tokens"], 0)
         
-        return jsonify({"latency_stats": stats})
+        return jsonify({
+            "latency_stats": stats,
+            "stage_stats": get_stage_latency_stats(start_dt, end_dt, by_disease)
+        })
         
     except Exception as e:
         logging.error(f"Get latency analytics error: {e}")
@@ -82,12 +90,27 @@ def get_latency_trends(user_id):
             if trend["avg_tokens"]:
                 trend["avg_tokens"] = round(trend["avg_tokens"], 0)
         
+        stage_trends = get_daily_stage_trends(days)
+        for trend in trends:
+            trend["stages"] = stage_trends.get(trend["_id"], {})
+        
         return jsonify({"trends": trends})
         
     except Exception as e:
         logging.error(f"Get latency trends error: {e}")
         return jsonify({"error": "Failed to get latency trends"}), 500
 
+@analytics_bp.route("/analytics/classifier", methods=["GET"])
+@require_admin_or_reviewer
+def get_classifier_analytics(user_id):
+    """Get local disease classifier fallback and LLM agreement rates"""
+    try:
+        return jsonify({"classifier_stats": get_classifier_metrics()})
+
+    except Exception as e:
+        logging.error(f"Get classifier analytics error: {e}")
+        return jsonify({"error": "Failed to get classifier analytics"}), 500
+
 @analytics_bp.route("/analytics/costs", methods=["GET"])
 @require_admin_or_reviewer
 def get_cost_analytics_data(user_id):
@@ -116,80 +139,128 @@ def get_cost_analytics_data(user_id):
         logging.error(f"Get cost analytics error: {e}")
         return jsonify({"error": "Failed to get cost analytics"}), 500
 
+@analytics_bp.route("/analytics/usage", methods=["GET"])
+@require_admin_or_reviewer
+def get_usage_analytics(user_id):
+    """Get token usage and cost per pipeline stage and model"""
+    try:
+        start_date = request.args.get("start_date")
+        end_date = request.args.get("end_date")
+        by_disease = request.args.get("by_disease", "false").lower() == "true"
+        
+        start_dt = None
+        end_dt = None
+        
+        if start_date:
+            start_dt = datetime.fromisoformat(start_date)
+        if end_date:
+            end_dt = datetime.fromisoformat(end_date)
+        
+        stages = get_usage_by_stage(start_dt, end_dt, by_disease)
+        
+        for stage in stages:
+            stage["total_cost"] = round(stage["total_cost"], 4)
+            stage["avg_prompt_tokens"] = round(stage["avg_prompt_tokens"] or 0, 0)
+            if stage["avg_latency"]:
+                stage["avg_latency"] = round(stage["avg_latency"], 2)
+        
+        return jsonify({"usage_by_stage": stages})
+        
+    except Exception as e:
+        logging.error(f"Get usage analytics error: {e}")
+        return jsonify({"error": "Failed to get usage analytics"}), 500
+
+def _build_analytics_dashboard(days):
+    """Analytics dashboard data for the last `days` days"""
+    end_date = datetime.now()
+    start_date = end_date - timedelta(days=days)
+
+    # Get all analytics
+    latency_stats = get_latency_stats(start_date, end_date)
+    cost_stats = get_cost_analytics(start_date, end_date)
+    trends = get_daily_latency_trends(days)
+
+    # Get feedback stats
+    db = get_db()
+    feedback_collection = db["feedback"]
+
+    feedback_pipeline = [
+        {"$match": {"created_at": {"$gte": start_date, "$lte": end_date}}},
+        {
+            "$group": {
+                "_id": None,
+                "avg_rating": {"$avg": "$rating"},
+                "total_feedback": {"$sum": 1},
+                "rating_distribution": {"$push": "$rating"}
+            }
+        }
+    ]
+
+    feedback_result = list(feedback_collection.aggregate(feedback_pipeline))
+    feedback_stats = feedback_result[0] if feedback_result else None
+
+    if feedback_stats:
+        # Calculate rating distribution
+        rating_dist = {}
+        for rating in feedback_stats["rating_distribution"]:
+            rating_dist[str(rating)] = rating_dist.get(str(rating), 0) + 1
+        feedback_stats["rating_distribution"] = rating_dist
+        feedback_stats["avg_rating"] = round(feedback_stats["avg_rating"], 2)
+
+    # Format data
+    if latency_stats:
+        latency_stats["avg_latency"] = round(latency_stats["avg_latency"], 2)
+        latency_stats["min_latency"] = round(latency_stats["min_latency"], 2)
+        latency_stats["max_latency"] = round(latency_stats["max_latency"], 2)
+        if latency_stats["avg_tokens"]:
+            latency_stats["avg_tokens"] = round(latency_stats["avg_tokens"], 0)
+
+    if cost_stats:
+        cost_stats["total_cost"] = round(cost_stats["total_cost"], 4)
+        cost_stats["avg_cost_per_query"] = round(cost_stats["avg_cost_per_query"], 6)
+
+    for trend in trends:
+        trend["avg_latency"] = round(trend["avg_latency"], 2)
+        if trend["avg_tokens"]:
+            trend["avg_tokens"] = round(trend["avg_tokens"], 0)
+
+    return {
+        "latency_stats": latency_stats,
+        "cost_stats": cost_stats,
+        "feedback_stats": feedback_stats,
+        "trends": trends,
+        "date_range": {
+            "start_date": start_date.isoformat(),
+            "end_date": end_date.isoformat()
+        }
+    }
+
 @analytics_bp.route("/analytics/dashboard", methods=["GET"])
 @require_admin_or_reviewer
 def get_analytics_dashboard(user_id):
     """Get comprehensive analytics dashboard data"""
     try:
-        # G
         days = request.args.get("days", default=30, type=int)
-        end_date = datetime.now()
-        start_date = end_date - timedelta(days=days)
 
-        # Get all analytics
-        latency_stats = get_latency_stats(start_date, end_date)
-        cost_stats = get_cost_analytics(start_date, end_date)
-        trends = get_daily_latency_trends(days)
-        
-        # Get feedback stats
-        db = get_db()
-        feedback_collection = db["feedback"]
-        
-        feedback_pipeline = [
-            {"$match": {"created_at": {"$gte": start_date, "$lte": end_date}}},
-            {
-                "$group": {
-                    "_id": None,
-                    "avg_rating": {"$avg": "$rating"},
-                    "total_feedback": {"$sum": 1},
-                    "rating_distribution": {"$push": "$rating"}
-                }
-            }
-        ]
-        
-        feedback_result = list(feedback_collection.aggregate(feedback_pipeline))
-        feedback_stats = feedback_result[0] if feedback_result else None
-        
-        if feedback_stats:
-            # Calculate rating distribution
-            rating_dist = {}
-            for rating in feedback_stats["rating_distribution"]:
-                rating_dist[str(rating)] = rating_dist.get(str(rating), 0) + 1
-            feedback_stats["rating_distribution"] = rating_dist
-            feedback_stats["avg_rating"] = round(feedback_stats["avg_rating"], 2)
-        
-        # Format data
-        if latency_stats:
-            latency_stats["avg_latency"] = round(latency_stats["avg_latency"], 2)
-            latency_stats["min_latency"] = round(latency_stats["min_latency"], 2)
-            latency_stats["max_latency"] = round(latency_stats["max_latency"], 2)
-            if latency_stats["avg_tokens"]:
-                latency_stats["avg_tokens"] = round(latency_stats["avg_tokens"], 0)
-        
-        if cost_stats:
-            cost_stats["total_cost"] = round(cost_stats["total_cost"], 4)
-            cost_stats["avg_cost_per_query"] = round(cost_stats["avg_cost_per_query"], 6)
-        
-        for trend in trends:
-            trend["avg_latency"] = round(trend["avg_latency"], 2)
-            if trend["avg_tokens"]:
-                trend["avg_tokens"] = round(trend["avg_tokens"], 0)
-        
-        return jsonify({
-            "latency_stats": latency_stats,
-            "cost_stats": cost_stats,
-            "feedback_stats": feedback_stats,
-            "trends": trends,
-            "date_range": {
-                "start_date": start_date.isoformat(),
-                "end_date": end_date.isoformat()
-            }
-        })
-        
+        # Polled by every open admin tab: served stale-while-revalidate
+        data, cache_status = get_cache("analytics_dashboard").get(
+            cache_key("analytics_dashboard", {"days": days}),
+            lambda: _build_analytics_dashboard(days)
+        )
+        response = jsonify(data)
+        response.headers["X-Cache"] = cache_status.upper()
+        return response
+
     except Exception as e:
         logging.error(f"Get analytics dashboard error: {e}")
         return jsonify({"error": "Failed to get analytics dashboard"}), 500
 
+@analytics_bp.route("/analytics/cache", methods=["GET"])
+@require_admin_or_reviewer
+def get_response_cache_stats(user_id):
+    """Hit/miss counters of the dashboard response caches"""
+    return jsonify({"caches": get_cache_stats()})
+
 @analytics_bp.route("/analytics/export", methods=["GET"])
 @require_admin_or_reviewer
 def export_analytics(user_id):
@@ -48,7 +48,7 @@ def submit_feedback(user_id):
         conversation = conversations.find_one({
             "_id": ObjectId(conversation_id),
             "user_id": ObjectId(user_id)
-        })
+        }, {"_id": 1})
         
         if not conversation:
             return jsonify({"error": "Conversation not found"}), 404
@@ -81,7 +81,7 @@ def get_conversation_feedback(user_id, conversation_id):
             conversation = conversations.find_one({
                 "_id": ObjectId(conversation_id),
                 "user_id": ObjectId(user_id)
-            })
+            }, {"_id": 1})
             if not conversation:
                 return jsonify({"error": "Conversation not found"}), 404
         
@@ -118,7 +118,7 @@ def get_message_feedback(user_id, conversation_id, message_id):
             conversation = conversations.find_one({
                 "_id": ObjectId(conversation_id),
                 "user_id": ObjectId(user_id)
-            })
+            }, {"_id": 1})
             if not conversation:
                 return jsonify({"error": "Conversation not found"}), 404
         
@@ -161,7 +161,8 @@ def update_message_feedback(user_id, conversation_id, message_id):
         # Check if user has permission
         if user_role not in ["admin", "reviewer"]:
             conversation = conversations.find_one(
-                {"_id": ObjectId(conversation_id), "user_id": ObjectId(user_id)}
+                {"_id": ObjectId(conversation_id), "user_id": ObjectId(user_id)},
+                {"_id": 1}
             )
             if not conversation:
                 return jsonify({"error": "Conversation not found"}), 404
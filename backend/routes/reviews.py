@@ -7,6 +7,7 @@ from ..models.review import (
     create_review_comment,
     get_reviews_by_conversation,
     get_reviewer_activity,
+    get_reviewers_activity,
     update_review_comment,
     delete_review_comment,
 )
@@ -111,7 +112,8 @@ def get_conversation_reviews(conversation_id):
                     {
                         "_id": ObjectId(conversation_id),
                         # "user_id": ObjectId(user_id)
-                    }
+                    },
+                    {"_id": 1}
                 )
             except Exception:
                 return jsonify({"error": "Invalid conversation ID"}), 400
@@ -271,21 +273,19 @@ def get_all_reviewer_activity(current_user_id):
         if user_role != "admin":
             return jsonify({"error": "Admin access required"}), 403
 
-        # Get all reviewers
-        reviewers = list(users.find({"role": {"$in": ["reviewer", "admin"]}}))
-
-        all_activity = []
-        for reviewer in reviewers:
-            activity = get_reviewer_activity(str(reviewer["_id"]))
-            for item in activity:
-                item["_id"] = str(item["_id"])
-                item["created_at"] = item["created_at"].isoformat()
-                item["reviewer_email"] = reviewer["email"]
-                item["reviewer_name"] = reviewer.get("name", "")
-            all_activity.extend(activity)
-
-        # Sort by creation date
-        all_activity.sort(key=lambda x: x["created_at"], reverse=True)
+        # Get all reviewers and their activity in one aggregation (newest first)
+        reviewers = {
+            reviewer["_id"]: reviewer
+            for reviewer in users.find({"role": {"$in": ["reviewer", "admin"]}}, {"email": 1, "name": 1})
+        }
+        all_activity = get_reviewers_activity(list(reviewers))
+
+        for item in all_activity:
+            reviewer = reviewers[item.pop("reviewer_id")]
+            item["_id"] = str(item["_id"])
+            item["created_at"] = item["created_at"].isoformat()
+            item["reviewer_email"] = reviewer["email"]
+            item["reviewer_name"] = reviewer.get("name", "")
 
         return jsonify({"activity": all_activity})
 
@@ -1,7 +1,44 @@
 from flask_socketio import SocketIO
+import logging
 import os
+import queue
 from dotenv import load_dotenv
 
 load_dotenv()
 
 socketio = SocketIO(cors_allowed_origins=os.getenv("FRONTEND_ORIGIN"))
+
+# Emitting from a plain OS thread (the LLM gateway loop, its to_thread
+# workers) is unsafe under eventlet without monkey-patching: the write can
+# block or be lost. Such threads queue their events with emit_from_thread,
+# and a socketio background task, i.e. a greenthread on the server's hub,
+# emits them.
+
+EMIT_RELAY_INTERVAL = 0.2
+
+_outbox = queue.SimpleQueue()
+_relay_started = False
+
+def emit_from_thread(event, data):
+    """Emit `event` from any thread, via the relay greenthread"""
+    _outbox.put((event, data))
+
+def _relay_emits():
+    while True:
+        while True:
+            try:
+                event, data = _outbox.get_nowait()
+            except queue.Empty:
+                break
+            try:
+                socketio.emit(event, data)
+            except Exception as e:
+                logging.error(f"Socket emit of {event} failed: {e}")
+        socketio.sleep(EMIT_RELAY_INTERVAL)
+
+def start_emit_relay():
+    """Start the relay; call once from the thread that runs the server"""
+    global _relay_started
+    if not _relay_started:
+        _relay_started = True
+        socketio.start_background_task(_relay_emits)
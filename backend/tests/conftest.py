@@ -0,0 +1,26 @@
+import os
+
+import pytest
+
+# llm_gateway refuses to import without a key; tests never call the API.
+os.environ.setdefault("OPENAI_API_KEY", "test")
+
+TEST_DATABASE = "Fingertips_test"
+
+
+@pytest.fixture
+def db():
+    """
+    An empty database: on the MongoDB server at MONGO_TEST_URI when set,
+    otherwise an in-memory mongomock one (skipped if mongomock is missing).
+    """
+    uri = os.getenv("MONGO_TEST_URI")
+    if uri:
+        from pymongo import MongoClient
+        client = MongoClient(uri)
+    else:
+        mongomock = pytest.importorskip("mongomock")
+        client = mongomock.MongoClient()
+    client.drop_database(TEST_DATABASE)
+    yield client[TEST_DATABASE]
+    client.drop_database(TEST_DATABASE)
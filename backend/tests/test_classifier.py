@@ -0,0 +1,74 @@
+import pytest
+
+from backend.chat import classifier
+from backend.chat.corpus import list_diseases
+
+# Labelled queries beyond the prompt EXAMPLES, including the ambiguous ones the
+# fast path used to get confidently wrong.
+LABELLED = [
+    ("fever and breathless on lying down", ["fever", "heart_failure"]),
+    ("Breathless at night, has to sit up to breathe", ["heart_failure"]),
+    ("Cough and fever", ["pneumonia", "fever"]),
+    ("Child with high fever and chills for 3 days", ["fever"]),
+    ("Known asthmatic with wheezing, using salbutamol inhaler", ["asthma"]),
+    ("Sudden facial droop and slurred speech", ["stroke"]),
+    ("Loose stools and vomiting for 2 days, no fever", ["diarrhoea"]),
+    ("Woman with pallor and low haemoglobin", ["anaemia"]),
+    ("Smoker with COPD and productive cough, fever", ["copd", "pneumonia", "fever"]),
+    ("Chest pain radiating to left arm with sweating", ["chestpain"]),
+    ("Diabetic foot ulcer with gangrene", ["diabetic_foot_ulcer"]),
+]
+
+
+@pytest.mark.parametrize("query,labels", classifier.EXAMPLES + LABELLED)
+def test_confident_predictions_are_correct(query, labels):
+    """Either the fast path gets every label right, or it defers to the LLM."""
+    prediction = classifier.predict(query, list_diseases())
+    if prediction["confident"]:
+        assert set(prediction["diseases"]) == set(labels)
+
+
+def test_unexplained_findings_fall_back():
+    prediction = classifier.predict("fever and breathless on lying down", list_diseases())
+    assert prediction["diseases"] == ["fever"]
+    assert prediction["coverage"] < classifier.CLASSIFIER_MIN_COVERAGE
+    assert not prediction["confident"]
+
+
+def test_first_prompt_example_falls_back():
+    query, _ = classifier.EXAMPLES[0]
+    assert not classifier.predict(query, list_diseases())["confident"]
+
+
+def test_clear_queries_take_the_fast_path():
+    diseases = list_diseases()
+    for query, labels in [
+        ("Adult with diarrhoea and vomiting, HR 110, BP 90/60.", ["diarrhoea"]),
+        ("Sudden facial droop and slurred speech", ["stroke"]),
+        ("Diabetic foot ulcer with gangrene", ["diabetic_foot_ulcer"]),
+    ]:
+        prediction = classifier.predict(query, diseases)
+        assert prediction["confident"], query
+        assert prediction["diseases"] == labels
+
+
+def test_thresholds():
+    prediction = classifier.predict("Sudden facial droop and slurred speech", list_diseases())
+    assert prediction["presence"] >= classifier.CLASSIFIER_MIN_CONFIDENCE
+    assert prediction["absence"] >= classifier.CLASSIFIER_MIN_CONFIDENCE
+    assert prediction["confidence"] == min(prediction["presence"], prediction["absence"])
+
+    # A weak keyword alone (weight < CALIBRATION_MIDPOINT) selects nothing.
+    assert classifier.predict("mentions a smoker", list_diseases())["diseases"] == []
+
+
+def test_negated_mentions_add_no_weight_but_count_as_explained():
+    scores, matched, negated = classifier._match_keywords("loose stools, no fever")
+    assert scores["fever"] == 0.0
+    assert scores["diarrhoea"] == 1.0
+    assert negated == {3}
+    assert matched["diarrhoea"] == {0, 1}
+
+
+def test_plural_keywords_match():
+    assert classifier._keyword_scores("frequent loose stools")["diarrhoea"] == 1.0
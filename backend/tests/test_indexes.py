@@ -0,0 +1,36 @@
+import os
+
+import pytest
+
+from backend.indexes import INDEXES, QUERY_SHAPES, check_query_plans, ensure_indexes, index_name
+
+requires_server = pytest.mark.skipif(
+    not os.getenv("MONGO_TEST_URI"), reason="query plans need a MongoDB server"
+)
+
+
+def test_index_names_follow_mongo_defaults():
+    assert index_name([("user_id", 1), ("updated_at", -1), ("_id", -1)]) == "user_id_1_updated_at_-1__id_-1"
+
+
+def test_every_query_shape_targets_an_indexed_collection():
+    assert {collection for collection, _, _ in QUERY_SHAPES} <= set(INDEXES)
+
+
+@requires_server
+def test_ensure_indexes_is_idempotent(db):
+    first = ensure_indexes(db=db)
+    assert not first["failed"]
+    second = ensure_indexes(db=db)
+    assert not second["created"] and not second["failed"]
+    assert sorted(second["existing"]) == sorted(first["created"] + first["existing"])
+
+
+@requires_server
+def test_known_queries_use_indexes(db):
+    ensure_indexes(db=db)
+    problems = check_query_plans(db)
+    assert problems == [], "\n".join(
+        f"{'+'.join(p['problems'])} on {p['collection']}: filter={p['filter']} sort={p['sort']}"
+        for p in problems
+    )
@@ -0,0 +1,60 @@
+from datetime import datetime, timedelta
+
+import pytest
+from bson import ObjectId
+
+from backend.chat import memory
+from backend.chat.memory import MEMORY_RECENT_MESSAGES, build_history, load_history
+from backend.models import message
+
+START = datetime(2026, 1, 1, 9, 0, 0)
+
+
+@pytest.fixture
+def memory_db(db, monkeypatch):
+    monkeypatch.setattr(message, "get_db", lambda: db)
+    return db
+
+
+def _conversation(db, count, memory_doc=None):
+    conversation_id = db["conversations"].insert_one({
+        "user_id": ObjectId(), "title": "Long", "created_at": START,
+        "messages_migrated": True, **({"memory": memory_doc} if memory_doc else {})
+    }).inserted_id
+    db["messages"].insert_many([
+        {"conversation_id": conversation_id, "id": f"m{i}", "sender": "user" if i % 2 == 0 else "bot",
+         "text": f"message {i}", "timestamp": START + timedelta(minutes=i)}
+        for i in range(count)
+    ])
+    return db["conversations"].find_one({"_id": conversation_id}, message.CONVERSATION_PROJECTION)
+
+
+def _contents(history):
+    return [turn["content"] for turn in history]
+
+
+def test_unsummarized_conversation_is_sent_in_full(memory_db):
+    conversation = _conversation(memory_db, 4)
+    assert _contents(load_history(conversation)) == [f"message {i}" for i in range(4)]
+
+
+def test_summarized_conversation_reads_only_uncovered_messages(memory_db, monkeypatch):
+    conversation = _conversation(memory_db, 20, {"summary": "earlier", "covered": 10, "last_id": "m9"})
+    monkeypatch.setattr(memory, "get_messages", lambda *a, **k: pytest.fail("read the whole conversation"))
+    history = load_history(conversation)
+    assert history[0]["role"] == "system" and "earlier" in history[0]["content"]
+    assert _contents(history[1:]) == [f"message {i}" for i in range(10, 20)]
+
+
+def test_summarized_conversation_keeps_the_recent_window(memory_db):
+    conversation = _conversation(memory_db, 20, {"summary": "earlier", "covered": 18, "last_id": "m17"})
+    history = load_history(conversation)
+    assert _contents(history[1:]) == [f"message {i}" for i in range(20 - MEMORY_RECENT_MESSAGES, 20)]
+
+
+def test_memory_without_last_id_falls_back_to_build_history(memory_db, monkeypatch):
+    monkeypatch.setattr(memory, "MEMORY_TOKEN_BUDGET", 0)
+    conversation = _conversation(memory_db, 20, {"summary": "earlier", "covered": 10})
+    history = load_history(conversation)
+    assert history == build_history(conversation, message.get_messages(conversation))
+    assert _contents(history[1:]) == [f"message {i}" for i in range(10, 20)]
@@ -0,0 +1,186 @@
+import os
+from datetime import datetime, timedelta
+
+import pytest
+from bson import ObjectId
+
+from backend import indexes
+from backend.models import daily_stats, message
+from backend.models.message import (
+    get_message_page, get_messages, get_messages_after, migrate_embedded_messages
+)
+
+START = datetime(2026, 1, 1, 9, 0, 0)
+
+
+@pytest.fixture
+def messages_db(db, monkeypatch):
+    for module in (message, indexes, daily_stats):
+        monkeypatch.setattr(module, "get_db", lambda: db)
+    return db
+
+
+def _message(i, sender=None):
+    return {"id": f"m{i}", "sender": sender or ("user" if i % 2 == 0 else "bot"),
+            "text": f"message {i}", "timestamp": START + timedelta(minutes=i)}
+
+
+def _legacy_conversation(db, count):
+    """A conversation from before the move: its messages embedded in the document"""
+    conversation_id = db["conversations"].insert_one({
+        "user_id": ObjectId(), "title": "Legacy", "created_at": START,
+        "messages": [_message(i) for i in range(count)]
+    }).inserted_id
+    return conversation_id
+
+
+def _store(db, conversation_id, numbers):
+    db["messages"].insert_many([{"conversation_id": conversation_id, **_message(i)} for i in numbers])
+
+
+def _load(db, conversation_id):
+    return db["conversations"].find_one({"_id": conversation_id}, message.CONVERSATION_PROJECTION)
+
+
+def _ids(messages):
+    return [m["id"] for m in messages]
+
+
+def test_legacy_conversation_reads_embedded_messages(messages_db):
+    conversation_id = _legacy_conversation(messages_db, 3)
+    assert _ids(get_messages(_load(messages_db, conversation_id))) == ["m0", "m1", "m2"]
+
+
+def test_dual_read_puts_embedded_messages_before_stored_ones(messages_db):
+    # Messages added after the move land in the collection even for old conversations
+    conversation_id = _legacy_conversation(messages_db, 3)
+    _store(messages_db, conversation_id, [4, 3])
+    conversation = _load(messages_db, conversation_id)
+    assert _ids(get_messages(conversation)) == ["m0", "m1", "m2", "m3", "m4"]
+    assert _ids(get_messages(conversation, limit=2)) == ["m3", "m4"]
+    assert _ids(get_messages(conversation, limit=4)) == ["m1", "m2", "m3", "m4"]
+
+
+def test_migration_preserves_what_readers_see(messages_db):
+    conversation_id = _legacy_conversation(messages_db, 4)
+    _store(messages_db, conversation_id, [4, 5])
+    before = get_messages(_load(messages_db, conversation_id))
+
+    assert migrate_embedded_messages() == {"conversations": 1, "messages": 4}
+
+    conversation = messages_db["conversations"].find_one({"_id": conversation_id})
+    assert conversation["messages_migrated"] is True
+    assert conversation["message_count"] == 6
+    assert "messages" not in conversation
+    assert get_messages(_load(messages_db, conversation_id)) == before
+
+
+def test_migration_is_idempotent(messages_db):
+    conversation_id = _legacy_conversation(messages_db, 3)
+    migrate_embedded_messages()
+    messages_db["conversations"].update_one({"_id": conversation_id}, {"$set": {"messages_migrated": False}})
+    migrate_embedded_messages()
+    assert messages_db["messages"].count_documents({"conversation_id": conversation_id}) == 3
+
+
+def test_migration_dry_run_writes_nothing(messages_db):
+    conversation_id = _legacy_conversation(messages_db, 3)
+    assert migrate_embedded_messages(dry_run=True) == {"conversations": 1, "messages": 3}
+    assert messages_db["messages"].count_documents({}) == 0
+    assert "messages" in messages_db["conversations"].find_one({"_id": conversation_id})
+
+
+def test_message_pages_cross_both_stores(messages_db):
+    conversation_id = _legacy_conversation(messages_db, 3)
+    _store(messages_db, conversation_id, [3, 4, 5])
+    conversation = _load(messages_db, conversation_id)
+
+    page, has_more = get_message_page(conversation, limit=2)
+    assert (_ids(page), has_more) == (["m4", "m5"], True)
+    page, has_more = get_message_page(conversation, before="m4", limit=2)
+    assert (_ids(page), has_more) == (["m2", "m3"], True)
+    page, has_more = get_message_page(conversation, before="m2", limit=2)
+    assert (_ids(page), has_more) == (["m0", "m1"], False)
+
+    with pytest.raises(ValueError):
+        get_message_page(conversation, before="unknown")
+
+
+def test_message_pages_break_timestamp_ties_by_id(messages_db):
+    conversation_id = ObjectId()
+    messages_db["conversations"].insert_one({"_id": conversation_id, "messages_migrated": True})
+    messages_db["messages"].insert_many([
+        {"conversation_id": conversation_id, "id": f"t{i}", "sender": "user", "text": "", "timestamp": START}
+        for i in range(5)
+    ])
+    conversation = _load(messages_db, conversation_id)
+    seen, before = [], None
+    while True:
+        page, has_more = get_message_page(conversation, before=before, limit=2)
+        seen = page + seen
+        if not has_more:
+            break
+        before = page[0]["id"]
+    assert _ids(seen) == [f"t{i}" for i in range(5)]
+
+
+def test_messages_after_cross_both_stores(messages_db):
+    conversation_id = _legacy_conversation(messages_db, 3)
+    _store(messages_db, conversation_id, [3, 4])
+    conversation = _load(messages_db, conversation_id)
+    assert _ids(get_messages_after(conversation, "m1")) == ["m2", "m3", "m4"]
+    assert _ids(get_messages_after(conversation, "m3")) == ["m4"]
+    assert get_messages_after(conversation, "m4") == []
+    assert _ids(get_messages_after(conversation)) == ["m0", "m1", "m2", "m3", "m4"]
+    with pytest.raises(ValueError):
+        get_messages_after(conversation, "unknown")
+
+
+@pytest.mark.skipif(not os.getenv("MONGO_TEST_URI"), reason="update pipelines need a MongoDB server")
+def test_add_message_maintains_version_and_count(messages_db):
+    conversation_id = messages_db["conversations"].insert_one({
+        "messages_migrated": True, "message_count": 0, "version": 0
+    }).inserted_id
+    legacy_id = messages_db["conversations"].insert_one({"messages": []}).inserted_id
+
+    _, version = message.add_message(conversation_id, "user", "hello")
+    _, version = message.add_message(conversation_id, "bot", "hi")
+    assert version == 2
+    assert messages_db["conversations"].find_one({"_id": conversation_id})["message_count"] == 2
+
+    # Conversations without a count are left to backfill_message_counts
+    message.add_message(legacy_id, "user", "hello")
+    assert "message_count" not in messages_db["conversations"].find_one({"_id": legacy_id})
+
+
+def test_backfill_message_counts(messages_db):
+    conversations = messages_db["conversations"]
+    uncounted = conversations.insert_one({"messages_migrated": True}).inserted_id
+    empty = conversations.insert_one({"messages_migrated": True}).inserted_id
+    counted = conversations.insert_one({"messages_migrated": True, "message_count": 7}).inserted_id
+    legacy = _legacy_conversation(messages_db, 2)
+    _store(messages_db, uncounted, [0, 1, 2])
+    _store(messages_db, counted, [0])
+
+    assert message.backfill_message_counts(batch_size=1) == {"conversations": 2}
+
+    def count(conversation_id):
+        return conversations.find_one({"_id": conversation_id}).get("message_count")
+
+    assert count(uncounted) == 3
+    assert count(empty) == 0
+    assert count(counted) == 7          # maintained counts are left alone
+    assert count(legacy) is None        # set by the migration instead
+    assert message.backfill_message_counts() == {"conversations": 0}
+
+
+def test_message_counts_for_uses_maintained_counts(messages_db):
+    conversations = messages_db["conversations"]
+    counted = conversations.insert_one({"messages_migrated": True, "message_count": 7}).inserted_id
+    uncounted = conversations.insert_one({"messages_migrated": True}).inserted_id
+    legacy = _legacy_conversation(messages_db, 2)
+    _store(messages_db, uncounted, [0, 1])
+    _store(messages_db, legacy, [2])
+
+    docs = list(conversations.find({}, message.CONVERSATION_LIST_PROJECTION))
+    assert message.message_counts_for(docs) == {counted: 7, uncounted: 2, legacy: 3}
@@ -0,0 +1,129 @@
+from datetime import datetime, timedelta
+
+import pytest
+from bson import ObjectId
+
+from backend.pagination import (
+    after_cursor, count_total, decode_cursor, encode_cursor, fetch_page, list_page, page_args
+)
+
+NOW = datetime(2026, 1, 1, 12, 0, 0)
+
+
+def test_cursor_round_trip_datetime():
+    doc = {"_id": ObjectId(), "created_at": NOW}
+    assert decode_cursor(encode_cursor(doc, "created_at")) == (NOW, doc["_id"])
+
+
+def test_cursor_round_trip_other_values():
+    for value in (1700000000.5, "b", None, ObjectId()):
+        doc = {"_id": ObjectId(), "field": value}
+        assert decode_cursor(encode_cursor(doc, "field")) == (value, doc["_id"])
+
+
+def test_cursor_is_url_safe():
+    cursor = encode_cursor({"_id": ObjectId(), "created_at": NOW}, "created_at")
+    assert "=" not in cursor and "+" not in cursor and "/" not in cursor
+
+
+@pytest.mark.parametrize("cursor", ["", "not-a-cursor", "e30"])
+def test_malformed_cursor_is_rejected(cursor):
+    with pytest.raises(ValueError):
+        decode_cursor(cursor)
+
+
+def test_after_cursor_breaks_ties_on_id():
+    last_id = ObjectId()
+    cursor = encode_cursor({"_id": last_id, "created_at": NOW}, "created_at")
+    assert after_cursor({}, "created_at", cursor) == {"$or": [
+        {"created_at": {"$lt": NOW}},
+        {"created_at": NOW, "_id": {"$lt": last_id}},
+        {"created_at": None},
+    ]}
+
+
+def test_after_cursor_keeps_the_filter():
+    cursor = encode_cursor({"_id": ObjectId(), "created_at": NOW}, "created_at")
+    query = after_cursor({"target": "all"}, "created_at", cursor)
+    assert query["$and"][0] == {"target": "all"}
+
+
+def test_after_cursor_past_documents_without_the_field():
+    last_id = ObjectId()
+    cursor = encode_cursor({"_id": last_id}, "created_at")
+    assert after_cursor({}, "created_at", cursor) == {"created_at": None, "_id": {"$lt": last_id}}
+
+
+def _seed(db, n=25, same_time=10):
+    """n documents, the first `same_time` of them sharing one created_at"""
+    docs = []
+    for i in range(n):
+        created = NOW if i < same_time else NOW - timedelta(minutes=i)
+        docs.append({"_id": ObjectId(), "i": i, "created_at": created})
+    db["items"].insert_many(docs)
+    return docs
+
+
+def _walk(collection, limit, query=None):
+    seen, cursor, pages = [], None, 0
+    while True:
+        docs, cursor = fetch_page(collection, query or {}, "created_at", limit, cursor)
+        seen += docs
+        pages += 1
+        if cursor is None:
+            return seen, pages
+
+
+def test_fetch_page_walks_every_document_once_across_ties(db):
+    docs = _seed(db)
+    seen, pages = _walk(db["items"], limit=4)
+    assert pages == 7
+    assert len(seen) == len(docs)
+    assert len({doc["_id"] for doc in seen}) == len(docs)
+    expected = sorted(docs, key=lambda d: (d["created_at"], d["_id"]), reverse=True)
+    assert [doc["_id"] for doc in seen] == [doc["_id"] for doc in expected]
+
+
+def test_fetch_page_includes_documents_without_the_sort_field(db):
+    docs = _seed(db, n=6, same_time=2)
+    db["items"].insert_many([{"_id": ObjectId(), "i": 100}, {"_id": ObjectId(), "i": 101}])
+    seen, _ = _walk(db["items"], limit=3)
+    assert len(seen) == len(docs) + 2
+    assert [doc["i"] for doc in seen[-2:]] == [101, 100]
+
+
+def test_fetch_page_last_page_has_no_cursor(db):
+    _seed(db, n=3)
+    docs, cursor = fetch_page(db["items"], {}, "created_at", 3)
+    assert len(docs) == 3 and cursor is None
+
+
+def test_list_page_legacy_page_number_hands_over_to_cursor(db):
+    docs = _seed(db, n=10, same_time=4)
+    page2, info = list_page(db["items"], {}, "created_at", {"page": "2", "limit": "3", "total": "exact"})
+    page3, _ = fetch_page(db["items"], {}, "created_at", 3, info["next_cursor"])
+    expected = sorted(docs, key=lambda d: (d["created_at"], d["_id"]), reverse=True)
+    assert [d["_id"] for d in page2 + page3] == [d["_id"] for d in expected[3:9]]
+    assert info["total"] == 10 and info["pages"] == 4
+
+
+def test_count_total_modes(db):
+    _seed(db, n=5)
+    items = db["items"]
+    assert count_total(items, {}, "none") is None
+    assert count_total(items, {}, "exact") == 5
+    assert count_total(items, {}, "estimated") == 5
+    assert count_total(items, {"i": {"$lt": 2}}, "cached") == 2
+    items.insert_one({"i": 0})
+    # Cached counts are reused for PAGINATION_COUNT_TTL seconds
+    assert count_total(items, {"i": {"$lt": 2}}, "cached") == 2
+    assert count_total(items, {"i": {"$lt": 2}}, "exact") == 3
+
+
+def test_page_args_validation():
+    assert page_args({}) == (20, None, 1, "cached")
+    assert page_args({"limit": "500"})[0] == 100
+    with pytest.raises(ValueError):
+        page_args({"total": "all"})
+    with pytest.raises(ValueError):
+        page_args({"cursor": "garbage"})
@@ -0,0 +1,111 @@
+import asyncio
+import time
+
+from backend.chat import rate_limiter
+from backend.chat.rate_limiter import (
+    PRIORITY_BACKGROUND, PRIORITY_INTERACTIVE, PRIORITY_PIPELINE, ModelLimiter, _Bucket
+)
+
+
+def _blocked_limiter():
+    """A limiter with no request capacity left and a refill slow enough to never fire in a test."""
+    limiter = ModelLimiter("test-model")
+    limiter.requests = _Bucket(1)
+    limiter.requests.level = 0.0
+    return limiter
+
+
+async def _admission_order(limiter, calls):
+    """Queue `calls` ([(label, priority, user)]) in order, then free one request at a time."""
+    order = []
+
+    async def call(label, priority, user):
+        await limiter.acquire(10, priority, user)
+        order.append(label)
+
+    tasks = []
+    for label, priority, user in calls:
+        tasks.append(asyncio.create_task(call(label, priority, user)))
+        await asyncio.sleep(0)
+    for _ in calls:
+        limiter.requests.level = 1.0
+        limiter._pump()
+        await asyncio.sleep(0)
+    await asyncio.gather(*tasks)
+    return order
+
+
+def test_higher_priority_is_admitted_first():
+    order = asyncio.run(_admission_order(_blocked_limiter(), [
+        ("title", PRIORITY_BACKGROUND, "a"),
+        ("extract", PRIORITY_PIPELINE, "a"),
+        ("answer", PRIORITY_INTERACTIVE, "a"),
+    ]))
+    assert order == ["answer", "extract", "title"]
+
+
+def test_users_are_interleaved_within_a_priority():
+    order = asyncio.run(_admission_order(_blocked_limiter(), [
+        ("a1", PRIORITY_PIPELINE, "a"),
+        ("a2", PRIORITY_PIPELINE, "a"),
+        ("a3", PRIORITY_PIPELINE, "a"),
+        ("b1", PRIORITY_PIPELINE, "b"),
+        ("b2", PRIORITY_PIPELINE, "b"),
+    ]))
+    assert order == ["a1", "b1", "a2", "b2", "a3"]
+
+
+def test_priority_wins_over_fairness():
+    order = asyncio.run(_admission_order(_blocked_limiter(), [
+        ("a1", PRIORITY_BACKGROUND, "a"),
+        ("b1", PRIORITY_PIPELINE, "b"),
+        ("b2", PRIORITY_PIPELINE, "b"),
+    ]))
+    assert order == ["b1", "b2", "a1"]
+
+
+def test_cancelled_waiters_are_skipped():
+    async def scenario():
+        limiter = _blocked_limiter()
+        first = asyncio.create_task(limiter.acquire(10, PRIORITY_PIPELINE, "a"))
+        second = asyncio.create_task(limiter.acquire(10, PRIORITY_PIPELINE, "b"))
+        await asyncio.sleep(0)
+        first.cancel()
+        await asyncio.sleep(0)
+        limiter.requests.level = 1.0
+        limiter._pump()
+        await asyncio.wait_for(second, 1)
+        assert limiter.queued() == 0
+
+    asyncio.run(scenario())
+
+
+def test_token_bucket_limits_admission():
+    async def scenario():
+        limiter = ModelLimiter("test-model")
+        limiter.tokens = _Bucket(100)
+        await asyncio.wait_for(limiter.acquire(80, PRIORITY_PIPELINE, "a"), 1)
+        waiting = asyncio.create_task(limiter.acquire(80, PRIORITY_PIPELINE, "a"))
+        await asyncio.sleep(0)
+        assert not waiting.done()
+        # The first call used less than estimated: the difference is returned.
+        limiter.settle(80, 20)
+        await asyncio.wait_for(waiting, 1)
+
+    asyncio.run(scenario())
+
+
+def test_pause_holds_admissions():
+    async def scenario():
+        limiter = ModelLimiter("test-model")
+        limiter.pause(0.2)
+        started = time.monotonic()
+        await asyncio.wait_for(limiter.acquire(10, PRIORITY_INTERACTIVE, "a"), 2)
+        assert time.monotonic() - started >= 0.15
+
+    asyncio.run(scenario())
+
+
+def test_disabled_limiter_admits_immediately(monkeypatch):
+    monkeypatch.setattr(rate_limiter, "LLM_RATE_LIMIT", False)
+    asyncio.run(asyncio.wait_for(rate_limiter.acquire("test-model", 10 ** 9), 1))
@@ -0,0 +1,138 @@
+import threading
+import time
+
+import pytest
+
+from backend import response_cache
+from backend.response_cache import ResponseCache, cache_key
+
+
+@pytest.fixture(autouse=True)
+def enabled(monkeypatch):
+    monkeypatch.setattr(response_cache, "RESPONSE_CACHE", True)
+
+
+class Counter:
+    def __init__(self, delay=0.0):
+        self.calls = 0
+        self.delay = delay
+        self.lock = threading.Lock()
+
+    def __call__(self):
+        with self.lock:
+            self.calls += 1
+            value = self.calls
+        time.sleep(self.delay)
+        return value
+
+
+def _wait_for(predicate, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.01)
+
+
+def test_miss_then_hit():
+    cache = ResponseCache("test", ttl=60, max_stale=120)
+    compute = Counter()
+    assert cache.get("k", compute) == (1, "miss")
+    assert cache.get("k", compute) == (1, "hit")
+    assert compute.calls == 1
+    assert cache.get_stats()["hits"] == 1
+
+
+def test_stale_value_is_served_while_one_refresh_runs():
+    cache = ResponseCache("test", ttl=0.05, max_stale=60)
+    compute = Counter(delay=0.1)
+    cache.get("k", compute)
+    time.sleep(0.06)
+
+    # Stale: served immediately, one background refresh for all callers.
+    started = time.monotonic()
+    assert cache.get("k", compute) == (1, "stale")
+    assert cache.get("k", compute) == (1, "stale")
+    assert time.monotonic() - started < 0.05
+
+    _wait_for(lambda: cache.get_stats()["refreshes"] == 2)
+    assert compute.calls == 2
+    assert cache.get("k", compute) == (2, "hit")
+
+
+def test_too_stale_value_is_recomputed():
+    cache = ResponseCache("test", ttl=0.01, max_stale=0.02)
+    compute = Counter()
+    cache.get("k", compute)
+    time.sleep(0.03)
+    assert cache.get("k", compute) == (2, "miss")
+
+
+def test_concurrent_misses_share_one_computation():
+    cache = ResponseCache("test", ttl=60, max_stale=120)
+    compute = Counter(delay=0.2)
+    results = []
+
+    def reader():
+        results.append(cache.get("k", compute))
+
+    threads = [threading.Thread(target=reader) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert compute.calls == 1
+    assert results == [(1, "miss")] * 8
+    stats = cache.get_stats()
+    assert stats["misses"] == 1
+    assert stats["coalesced"] == 7
+
+
+def test_errors_reach_every_waiter_and_are_not_cached():
+    cache = ResponseCache("test", ttl=60, max_stale=120)
+    failures = []
+
+    def compute():
+        time.sleep(0.1)
+        raise RuntimeError("boom")
+
+    def reader():
+        try:
+            cache.get("k", compute)
+        except RuntimeError:
+            failures.append(True)
+
+    threads = [threading.Thread(target=reader) for _ in range(3)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(failures) == 3
+    assert cache.get("k", lambda: "ok") == ("ok", "miss")
+
+
+def test_failed_refresh_keeps_serving_the_stale_value():
+    cache = ResponseCache("test", ttl=0.01, max_stale=60)
+    cache.get("k", lambda: "old")
+    time.sleep(0.02)
+
+    def failing():
+        raise RuntimeError("boom")
+
+    assert cache.get("k", failing) == ("old", "stale")
+    _wait_for(lambda: cache.get_stats()["refresh_errors"] == 1)
+    assert cache.get("k", failing)[0] == "old"
+
+
+def test_disabled_cache_always_computes(monkeypatch):
+    monkeypatch.setattr(response_cache, "RESPONSE_CACHE", False)
+    cache = ResponseCache("test", ttl=60, max_stale=120)
+    compute = Counter()
+    cache.get("k", compute)
+    assert cache.get("k", compute) == (2, "miss")
+
+
+def test_cache_key_ignores_parameter_order():
+    assert cache_key("dash", {"days": 7, "a": 1}) == cache_key("dash", {"a": 1, "days": "7"})
+    assert cache_key("dash", {"days": 7}) != cache_key("dash", {"days": 30})
@@ -0,0 +1,100 @@
+from pathlib import Path
+
+from backend.chat.corpus import get_pathway
+from backend.chat.retrieval import BlockIndex, parse_blocks, select_relevant_blocks, tokenize
+
+MARKDOWN = """# Test pathway
+#L1
+Heart failure pathway
+#L2
+Definition and scope
+#L3
+Breathlessness on lying flat is called orthopnoea
+#L4
+and is common in heart failure
+#L5
+Check for pedal oedema
+#L6
+Furosemide 40 mg once daily for congestion
+#L7
+Review electrolytes after starting diuretics
+#L8
+Refer when the ejection fraction is below 40 percent
+#I1
+Flowchart of diuretic titration by weight
+#T1
+| Drug | Dose |
+| Furosemide | 40 mg |
+#L9
+Counsel on salt restriction
+"""
+
+
+def _entry(disease, content):
+    return {"disease": disease, "content": content, "hash": str(hash(content)),
+            "path": Path(__file__).parent / f"{disease}.md"}
+
+
+def test_parse_blocks_keeps_ids_and_order():
+    blocks = parse_blocks(MARKDOWN)
+    assert [b["id"] for b in blocks] == ["L1", "L2", "L3", "L4", "L5", "L6", "L7", "L8", "I1", "T1", "L9"]
+    assert blocks[9]["type"] == "T"
+    assert "Furosemide | 40 mg" in blocks[9]["text"]
+
+
+def test_tokenize_strips_stopwords_and_plurals():
+    assert tokenize("What are the doses of diuretics?") == ["dose", "diuretic"]
+
+
+def test_top_k_ranks_matching_blocks_first():
+    index = BlockIndex(MARKDOWN)
+    hits = index.top_k("furosemide dose", k=3)
+    ids = [index.blocks[i]["id"] for i, _ in hits]
+    assert set(ids) == {"L6", "T1"}
+    assert all(score > 0 for _, score in hits)
+
+
+def test_top_k_skips_blocks_without_any_term():
+    index = BlockIndex(MARKDOWN)
+    assert index.top_k("asthma inhaler") == []
+
+
+def test_expand_adds_line_neighbours_and_header():
+    index = BlockIndex(MARKDOWN)
+    position = [b["id"] for b in index.blocks].index("L6")
+    ids = [index.blocks[i]["id"] for i in index.expand([position], neighbours=1)]
+    assert ids == ["L1", "L2", "L5", "L6", "L7"]
+
+
+def test_expand_does_not_cross_into_non_line_blocks():
+    index = BlockIndex(MARKDOWN)
+    position = [b["id"] for b in index.blocks].index("L8")
+    ids = [index.blocks[i]["id"] for i in index.expand([position], neighbours=2)]
+    assert "I1" not in ids and "T1" not in ids
+    assert ids[-3:] == ["L6", "L7", "L8"]
+
+
+def test_render_marks_gaps():
+    index = BlockIndex(MARKDOWN)
+    rendered = index.render([0, 1, 5])
+    assert rendered.startswith("#L1\nHeart failure pathway\n#L2")
+    assert "\n...\n#L6\n" in rendered
+
+
+def test_select_relevant_blocks_keeps_original_ids():
+    selected = select_relevant_blocks("orthopnoea", _entry("test_select", MARKDOWN), top_k=1, neighbours=1)
+    assert "#L3\nBreathlessness on lying flat is called orthopnoea" in selected
+    assert "#L4" in selected
+    assert "#L9" not in selected
+
+
+def test_select_relevant_blocks_falls_back_to_full_markdown():
+    entry = _entry("test_fallback", MARKDOWN)
+    assert select_relevant_blocks("asthma inhaler", entry) == MARKDOWN
+
+
+def test_real_pathway_selection_is_smaller_than_the_pathway():
+    entry = get_pathway("heart_failure")
+    selected = select_relevant_blocks("furosemide dose", entry)
+    assert 0 < len(selected) < len(entry["content"])
+    assert "#L" in selected
@@ -0,0 +1,62 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from backend.chat import llm_gateway, main, telemetry
+
+PROMPT = [{"role": "user", "content": "x" * 400}]
+
+
+class _Completions:
+    """Stands in for client.chat.completions; the first call takes `first_delay` seconds"""
+
+    def __init__(self, first_delay):
+        self.first_delay = first_delay
+        self.calls = 0
+
+    async def create(self, **kwargs):
+        self.calls += 1
+        await asyncio.sleep(self.first_delay if self.calls == 1 else 0)
+        return SimpleNamespace(
+            usage=SimpleNamespace(prompt_tokens=110, completion_tokens=5, total_tokens=115),
+            choices=[SimpleNamespace(message=SimpleNamespace(content="ok"))],
+        )
+
+
+def _fake_client(monkeypatch, first_delay):
+    llm_gateway.get_loop()
+    completions = _Completions(first_delay)
+    monkeypatch.setattr(llm_gateway, "_client", SimpleNamespace(chat=SimpleNamespace(completions=completions)))
+    return completions
+
+
+def _call(stage):
+    return lambda: llm_gateway.acall_model(main.PATHWAY_MODEL, PROMPT, stage=stage)
+
+
+def test_losing_hedge_copy_is_recorded_as_cancelled(monkeypatch):
+    completions = _fake_client(monkeypatch, first_delay=5)
+    trace = telemetry.start_trace()
+    assert llm_gateway.run(main.hedged(_call("extract:test"), 0.05, "test")) == "ok"
+    assert completions.calls == 2
+    calls = sorted(trace["calls"], key=lambda c: c.get("cancelled", False))
+    assert [c.get("cancelled", False) for c in calls] == [False, True]
+    assert calls[0]["total_tokens"] == 115
+    assert calls[1]["prompt_tokens"] == calls[1]["total_tokens"] > 0
+    assert calls[1]["completion_tokens"] == 0
+
+
+@pytest.mark.parametrize("first_delay, cancelled", [(0, False), (5, True)])
+def test_settle_records_background_calls_in_the_trace(monkeypatch, first_delay, cancelled):
+    _fake_client(monkeypatch, first_delay)
+    monkeypatch.setattr(main, "SHADOW_SETTLE_TIMEOUT", 0.1)
+    trace = telemetry.start_trace()
+
+    async def start_shadow():
+        telemetry.add_pending(asyncio.create_task(_call("classify")()))
+
+    llm_gateway.run(start_shadow())
+    main.settle_background_calls(trace)
+    assert [c["stage"] for c in trace["calls"]] == ["classify"]
+    assert trace["calls"][0].get("cancelled", False) is cancelled
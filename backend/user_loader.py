@@ -0,0 +1,91 @@
+from .database import get_db
+from bson import ObjectId
+from dotenv import load_dotenv
+from flask import g, has_app_context
+import os
+import threading
+import time
+
+# Batched lookup of the users referenced by a list (conversation owners,
+# notification creators, reviewers, ...), for display only: name and email.
+#
+#     users = load_users(conv["user_id"] for conv in conv_list)
+#     name = users.get(conv["user_id"], {}).get("name")
+#
+# All ids of a page are fetched with one {"_id": {"$in": [...]}} query.
+# Results are memoized on flask.g for the rest of the request, and kept in a
+# small process-wide cache for USER_CACHE_TTL seconds so hot names (admins,
+# reviewers) rarely hit the database. Authorization checks must not use this:
+# a changed role or status would only be seen after the TTL.
+
+load_dotenv()
+
+USER_CACHE_TTL = float(os.getenv("USER_CACHE_TTL", "60"))
+USER_CACHE_MAX_ENTRIES = 10000
+USER_FIELDS = {"name": 1, "email": 1}
+
+_cache = {}   # ObjectId -> (user or None, expires_at)
+_cache_lock = threading.Lock()
+
+def _request_memo():
+    if not has_app_context():
+        return {}
+    if "user_loader" not in g:
+        g.user_loader = {}
+    return g.user_loader
+
+def load_users(user_ids):
+    """
+    {ObjectId: user document (name, email)} for `user_ids` (ObjectIds or
+    strings; invalid and unknown ids are left out), in at most one query.
+    """
+    ids = set()
+    for user_id in user_ids:
+        if user_id and ObjectId.is_valid(user_id):
+            ids.add(ObjectId(user_id))
+
+    memo = _request_memo()
+    users, missing = {}, []
+    now = time.monotonic()
+    with _cache_lock:
+        for user_id in ids:
+            if user_id in memo:
+                users[user_id] = memo[user_id]
+                continue
+            cached = _cache.get(user_id)
+            if cached and cached[1] > now:
+                users[user_id] = memo[user_id] = cached[0]
+            else:
+                missing.append(user_id)
+
+    if missing:
+        found = {user["_id"]: user for user in get_db()["users"].find({"_id": {"$in": missing}}, USER_FIELDS)}
+        expires_at = time.monotonic() + USER_CACHE_TTL
+        with _cache_lock:
+            if len(_cache) + len(missing) > USER_CACHE_MAX_ENTRIES:
+                _cache.clear()
+            for user_id in missing:
+                user = found.get(user_id)
+                users[user_id] = memo[user_id] = user
+                _cache[user_id] = (user, expires_at)
+
+    return {user_id: user for user_id, user in users.items() if user is not None}
+
+def load_user(user_id):
+    """Single-user form of load_users; None if unknown"""
+    if not user_id or not ObjectId.is_valid(user_id):
+        return None
+    return load_users([user_id]).get(ObjectId(user_id))
+
+def display_name(user, default=""):
+    """User's name, falling back to their email"""
+    if not user:
+        return default
+    return user.get("name") or user.get("email") or default
+
+def forget_user(user_id):
+    """Drop a user from the caches after their name or email changed"""
+    user_id = ObjectId(user_id)
+    with _cache_lock:
+        _cache.pop(user_id, None)
+    _request_memo().pop(user_id, None)
@@ -1,4 +1,4 @@
-import { useState, useEffect, useCallback } from "react";
+import { useState, useEffect, useCallback, useRef } from "react";
 import { useNavigate } from "react-router-dom";
 import {
   FiMessageSquare,
@@ -50,6 +50,8 @@ const ConversationsManagement = ({
   const [currentTotalPages, setCurrentTotalPages] = useState(totalPages || 1);
   const [users, setUsers] = useState([]);
   const [page, setPage] = useState(currentPage || 1);
+  // Cursor that starts each page we have reached (page 1 starts at the top)
+  const pageCursors = useRef({});
 
   useEffect(() => {
     setConversations(initialConversations || []);
@@ -98,6 +100,7 @@ const ConversationsManagement = ({
         headers: { Authorization: `Bearer ${token}` },
         params: {
           page,
+          cursor: pageCursors.current[page],
           limit: 15,
           user_id: userFilter || undefined,
           date: dateFilter || undefined,
@@ -107,6 +110,9 @@ const ConversationsManagement = ({
       console.log("No. of conversations:", response.data.total);
       setConversations(response.data.conversations || []);
       setCurrentTotalPages(response.data.pages || 1);
+      if (response.data.next_cursor) {
+        pageCursors.current[page + 1] = response.data.next_cursor;
+      }
       setLoading(false);
     } catch (error) {
       console.error("Error loading conversations:", error);
@@ -117,6 +123,7 @@ const ConversationsManagement = ({
 
   // Whenever page changes, load conversations
   useEffect(() => {
+    pageCursors.current = {};
     loadConversations();
     setPage(1);
   }, [userFilter, dateFilter, debouncedSearchTerm]);
@@ -1,6 +1,7 @@
 import { useState, useEffect, useRef, useContext } from "react";
 import { useParams, useNavigate } from "react-router-dom";
 import axios from "axios";
+import { io } from "socket.io-client";
 import {
   FiMenu,
   FiThumbsUp,
@@ -36,6 +37,31 @@ const api = axios.create({
   headers: { "Content-Type": "application/json" },
 });
 
+// Read a Server-Sent Events response and call onEvent(event, data) for each
+// event (EventSource only supports GET, /chat/stream is a POST)
+async function readEventStream(response, onEvent) {
+  const reader = response.body.getReader();
+  const decoder = new TextDecoder();
+  let buffer = "";
+  while (true) {
+    const { value, done } = await reader.read();
+    if (done) break;
+    buffer += decoder.decode(value, { stream: true });
+    let boundary;
+    while ((boundary = buffer.indexOf("\n\n")) !== -1) {
+      const block = buffer.slice(0, boundary);
+      buffer = buffer.slice(boundary + 2);
+      let event = "message";
+      let data = "";
+      for (const line of block.split("\n")) {
+        if (line.startsWith("event: ")) event = line.slice(7);
+        else if (line.startsWith("data: ")) data += line.slice(6);
+      }
+      if (data) onEvent(event, JSON.parse(data));
+    }
+  }
+}
+
 export default function App() {
   const auth = useContext(AuthContext);
   const navigate = useNavigate();
@@ -45,6 +71,7 @@ export default function App() {
   const [message, setMessage] = useState("");
   const [history, setHistory] = useState([]);
   const [isLoading, setIsLoading] = useState(false);
+  const [isStreaming, setIsStreaming] = useState(false);
   const [showInfo, setShowInfo] = useState(false);
   const [sidebarOpen, setSidebarOpen] = useState(false);
   const [conversations, setConversations] = useState([]);
@@ -121,6 +148,7 @@ export default function App() {
       const token = localStorage.getItem("token");
       const response = await api.get(`/chat/conversation/${chatId}`, {
         headers: { Authorization: `Bearer ${token}` },
+        params: { format: "messages" },
       });
       console.log("***TEST***");
       const messages = response.data.messages || [];
@@ -263,6 +291,34 @@ export default function App() {
     bottomRef.current?.scrollIntoView({ behavior: "smooth" });
   }, [history]);
 
+  // Titles of new conversations are generated in the background and pushed here
+  useEffect(() => {
+    const token = localStorage.getItem("token");
+    const userId = auth?.userId;
+    if (!token || !userId) return;
+
+    const socket = io(import.meta.env.VITE_WS_URL, {
+      transports: ["websocket"],
+      auth: {
+        token: `Bearer ${token}`,
+      },
+    });
+
+    socket.on(`conversation_title_${userId}`, (data) => {
+      setConversations((prevConversations) =>
+        prevConversations.map((conv) =>
+          conv.conversation_id === data.conversation_id
+            ? { ...conv, title: data.title }
+            : conv
+        )
+      );
+    });
+
+    return () => {
+      socket.disconnect();
+    };
+  }, [auth?.userId]);
+
   // Handle new chat
   const handleNewChat = () => {
     setConvId(null);
@@ -433,7 +489,7 @@ export default function App() {
   // Send text message - FIXED
   async function sendMessage(e) {
     e.preventDefault();
-    if (!message.trim() || isLoading) return;
+    if (!message.trim() || isLoading || isStreaming) return;
 
     try {
       setIsLoading(true);
@@ -451,20 +507,58 @@ export default function App() {
         ? { message, conversation_id: convId }
         : { message };
 
-      const config = {
+      // Stream the answer: the typing indicator shows until the first delta,
+      // then the reply grows in place and is replaced by the saved message
+      const response = await fetch(`${import.meta.env.VITE_API_URL}/chat/stream`, {
+        method: "POST",
         headers: {
           "Content-Type": "application/json",
           Authorization: `Bearer ${token}`,
         },
-      };
-
-      const { data } = await api.post("/chat", payload, config);
+        body: JSON.stringify(payload),
+      });
+      if (!response.ok) {
+        throw new Error(`Chat stream failed with status ${response.status}`);
+      }
 
-      const newConvId = data.conversation_id;
+      let newConvId = null;
+      let streamed = false;
+      setIsStreaming(true);
+      await readEventStream(response, (event, data) => {
+        if (event === "conversation") {
+          newConvId = data.conversation_id;
+        } else if (event === "delta") {
+          if (!streamed) {
+            streamed = true;
+            setIsLoading(false);
+            setHistory((prev) => [
+              ...prev,
+              { role: "assistant", content: data.text, sources: {} },
+            ]);
+          } else {
+            setHistory((prev) => [
+              ...prev.slice(0, -1),
+              { ...prev[prev.length - 1], content: prev[prev.length - 1].content + data.text },
+            ]);
+          }
+        } else if (event === "done") {
+          const reply = {
+            role: "assistant",
+            content: data.reply,
+            id: data.message_id,
+            sources: data.sources,
+          };
+          setHistory((prev) => [...(streamed ? prev.slice(0, -1) : prev), reply]);
+          streamed = true;
+        } else if (event === "error") {
+          throw new Error(data.error);
+        }
+      });
 
-      // Reload messages and conversations
+      // Refresh conversations now that the turn is saved
       if (newConvId) {
-        await loadChatMessages(newConvId);
+        setConvId(newConvId);
+        localStorage.setItem("convId", newConvId);
         setConversationsLoaded(false); // Reset to allow refresh
         await loadConversations(); // Refresh conversations list
 
@@ -485,6 +579,7 @@ export default function App() {
       ]);
     } finally {
       setIsLoading(false);
+      setIsStreaming(false);
     }
   }
 
@@ -576,7 +671,7 @@ export default function App() {
                 message={message}
                 setMessage={setMessage}
                 sendMessage={sendMessage}
-                isLoading={isLoading}
+                isLoading={isLoading || isStreaming}
                 isLoadingMessages={isLoadingMessages}
               />
             </div>